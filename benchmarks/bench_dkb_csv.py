@@ -0,0 +1,68 @@
+"""
+Measures the time taken to parse a large DKB CSV export into a TransactionStore,
+compared with reading it row by row through csv.DictReader, strptime and floats:
+
+    python -m benchmarks.bench_dkb_csv
+"""
+import os
+import timeit
+from csv import DictReader
+from datetime import date, datetime
+from tempfile import TemporaryDirectory
+
+from benchmarks import synthetic
+from ynab.api import TransactionStore
+from ynab.banks.dkb_de import (
+    ACCOUNT_DATE_HEADER_NAME,
+    ACCOUNT_MEMO_HEADER_NAME,
+    AMOUNT_HEADER_NAME,
+    DATE_FORMAT_IN_CSV,
+    DKB_CSV_DELIMITER,
+    DKB_ENCODING,
+    NUMBER_LINES_TO_IGNORE_IN_CSV,
+    PAYEE_HEADER_NAME,
+    _add_transactions_from_csv,
+)
+
+SIZE = 500_000
+
+
+def _dict_reader_baseline(filepath, transaction_store):
+    with open(filepath, encoding=DKB_ENCODING) as file:
+        for _ in range(NUMBER_LINES_TO_IGNORE_IN_CSV):
+            file.readline()
+        reader = DictReader(file, delimiter=DKB_CSV_DELIMITER)
+        (payee_header,) = [h for h in reader.fieldnames if PAYEE_HEADER_NAME in h]
+        for row in reader:
+            string = row[AMOUNT_HEADER_NAME].replace(",", ".")
+            string = string.replace(".", "", string.count(".") - 1)
+            transaction_store.append(
+                transaction_date=datetime.strptime(
+                    row[ACCOUNT_DATE_HEADER_NAME], DATE_FORMAT_IN_CSV
+                ).date(),
+                payee_name=row[payee_header],
+                memo=row[ACCOUNT_MEMO_HEADER_NAME],
+                amount=float(string),
+            )
+
+
+def main():
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export.csv")
+        transactions = synthetic.transactions(SIZE, days=30, end=date(2019, 5, 6))
+        synthetic.write_dkb_export(path, transactions)
+        print(f"{SIZE} rows, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        for name, parse in [
+            ("DictReader", _dict_reader_baseline),
+            ("positional", _add_transactions_from_csv),
+        ]:
+            seconds = min(
+                timeit.repeat(
+                    lambda: parse(path, TransactionStore()), number=1, repeat=3
+                )
+            )
+            print(f"{name:<10} {seconds:>8.3f} s {SIZE / seconds:>10,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
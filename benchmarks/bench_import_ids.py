@@ -0,0 +1,58 @@
+"""
+Measures the time taken to generate a million import ids, one at a time and in bulk,
+compared with formatting every id with strftime and a Counter updated from a list:
+
+    python -m benchmarks.bench_import_ids
+"""
+import timeit
+from collections import Counter
+
+from benchmarks import synthetic
+from ynab.api import ImportIdGenerator, TransactionStore
+
+SIZE = 1_000_000
+
+
+def _strftime_baseline(dates, milliunit_amounts):
+    counter = Counter()
+    ids = []
+    for d, milliunit_amount in zip(dates, milliunit_amounts):
+        id_without_occurrence = f"YNAB:{milliunit_amount}:{d.strftime('%Y-%m-%d')}"
+        counter.update([id_without_occurrence])
+        ids.append(f"{id_without_occurrence}:{counter[id_without_occurrence]}")
+    return ids
+
+
+def main():
+    transactions = synthetic.transactions(SIZE, distinct_amounts=1000)
+    dates = [t.date for t in transactions]
+    milliunit_amounts = [t.milliunit_amount for t in transactions]
+    rows = [(t.date, "", "", t.milliunit_amount) for t in transactions]
+
+    def one_at_a_time():
+        generate = ImportIdGenerator().generate
+        return list(map(generate, dates, milliunit_amounts))
+
+    def store_json():
+        store = TransactionStore()
+        store.extend(rows)
+        return store.json("account")
+
+    assert one_at_a_time() == _strftime_baseline(dates, milliunit_amounts)
+    print(f"{SIZE} ids")
+    for name, function in [
+        ("strftime", lambda: _strftime_baseline(dates, milliunit_amounts)),
+        ("generate", one_at_a_time),
+        (
+            "generate_many",
+            lambda: ImportIdGenerator().generate_many(dates, milliunit_amounts),
+        ),
+        ("store only", lambda: TransactionStore().extend(rows)),
+        ("store + json", store_json),
+    ]:
+        seconds = min(timeit.repeat(function, number=1, repeat=3))
+        print(f"{name:<14} {seconds:>8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures the time taken to import ynab.main, as reported by python -X importtime, and
+lists the slowest modules it imports and the heavy dependencies among them:
+
+    python -m benchmarks.bench_import_time
+"""
+
+import subprocess
+import sys
+
+# dependencies that only the commands which download or push should import
+HEAVY_MODULES = [
+    "selenium",
+    "requests",
+    "keyring",
+    "fuzzywuzzy",
+    "yaml",
+    "cryptography",
+    "ynab.banks",
+]
+IMPORT_TIME_BUDGET_SECONDS = 0.15
+
+
+def import_times(statement="import ynab.main"):
+    """
+    Runs the statement in a new interpreter with -X importtime
+
+    :return: a dictionary from the name of every module imported to the seconds taken
+        to import it, including the modules it imported
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def heavy_modules(times):
+    """:return: those of HEAVY_MODULES that were imported, or that had a submodule
+    imported"""
+    return [
+        m for m in HEAVY_MODULES if any(n == m or n.startswith(m + ".") for n in times)
+    ]
+
+
+def main():
+    times = min((import_times() for _ in range(5)), key=lambda t: t["ynab.main"])
+    seconds = times["ynab.main"]
+    print(f"ynab.main {seconds * 1000:.1f} ms, budget {IMPORT_TIME_BUDGET_SECONDS}s")
+    for name, seconds in sorted(times.items(), key=lambda i: -i[1])[:10]:
+        print(f"{name:<40} {seconds * 1000:>8.1f} ms")
+    print(f"Heavy modules imported: {', '.join(heavy_modules(times)) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
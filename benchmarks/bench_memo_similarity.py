@@ -0,0 +1,44 @@
+"""
+Compares picking the best memo of a candidate group with fuzzywuzzy's extractOne against
+MemoSimilarity on a day of many near-identical coffee purchases:
+
+    python -m benchmarks.bench_memo_similarity
+"""
+import random
+import timeit
+
+import fuzzywuzzy.process
+
+from ynab.similarity import MemoSimilarity
+
+GROUPS = 1_000
+GROUP_SIZE = 20
+MEMOS = ["Coffee", "COFFEE SHOP", "Coffee shop London", "Coffee & cake"]
+
+
+def main():
+    rng = random.Random(0)
+    groups = [
+        (rng.choice(MEMOS), [rng.choice(MEMOS) for _ in range(GROUP_SIZE)])
+        for _ in range(GROUPS)
+    ]
+
+    def extract_one():
+        for query, choices in groups:
+            fuzzywuzzy.process.extractOne(query=query, choices=choices)
+
+    def memo_similarity():
+        similarity = MemoSimilarity()
+        for query, choices in groups:
+            similarity.best_match(query, choices)
+
+    for name, function in [
+        ("extractOne", extract_one),
+        ("MemoSimilarity", memo_similarity),
+    ]:
+        seconds = min(timeit.repeat(function, number=1, repeat=3))
+        print(f"{name:>15} {seconds:>8.3f}s for {GROUPS} groups of {GROUP_SIZE}")
+
+
+if __name__ == "__main__":
+    main()
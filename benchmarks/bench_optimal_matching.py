@@ -0,0 +1,48 @@
+"""
+Compares the default two-pass greedy transactions_difference with the one-pass optimal
+assignment on synthetic data with many duplicate amount/date pairs, and on a daily
+payment of the same amount, which forms one long group of candidates:
+
+    python -m benchmarks.bench_optimal_matching
+"""
+import timeit
+
+from benchmarks import synthetic
+from ynab.transactions import transactions_difference
+
+SIZES = [100, 1_000, 5_000]
+RECURRING_SIZES = [365, 2_000]
+DISTINCT_AMOUNTS = 10
+DAYS = 30
+
+
+def main():
+    print(
+        f"{'transactions':>12} {'data':>10} {'mode':>8} {'seconds':>10} "
+        f"{'only in a':>10} {'only in b':>10}"
+    )
+    datasets = [
+        (
+            n,
+            "random",
+            synthetic.transactions(
+                n, distinct_amounts=DISTINCT_AMOUNTS * n // 100, days=DAYS
+            ),
+        )
+        for n in SIZES
+    ]
+    datasets += [(n, "recurring", synthetic.recurring(n)) for n in RECURRING_SIZES]
+    for n, data, a in datasets:
+        b = synthetic.counterpart(a)
+        for mode, optimal in [("greedy", False), ("optimal", True)]:
+            timer = timeit.Timer(lambda: transactions_difference(a, b, optimal=optimal))
+            seconds = min(timer.repeat(number=1, repeat=3))
+            only_a, only_b = transactions_difference(a, b, optimal=optimal)
+            print(
+                f"{n:>12} {data:>10} {mode:>8} {seconds:>10.3f} "
+                f"{len(only_a):>10} {len(only_b):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measures the memory used by a TransactionStore and the time taken to fill and serialise
+it, compared with a plain list of Transaction tuples, and the peak memory of building a
+request body in one go or streaming it:
+
+    python -m benchmarks.bench_transaction_store
+"""
+import json
+import timeit
+import tracemalloc
+
+from benchmarks import synthetic
+from ynab.api import ImportIdGenerator, TransactionStore
+from ynab.transactions import Transaction
+
+SIZE = 200_000
+
+
+def _allocated_bytes(function):
+    tracemalloc.start()
+    result = function()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    transactions = synthetic.transactions(SIZE, distinct_amounts=1000)
+
+    def rows():
+        # fresh strings for every row, as a parser would produce
+        for t in transactions:
+            yield t.date, (t.memo + " ")[:-1], t.milliunit_amount
+
+    def fill():
+        store = TransactionStore()
+        for transaction_date, memo, milliunit_amount in rows():
+            store.append(transaction_date, "", memo, milliunit_amount / 1000)
+        return store
+
+    def as_list():
+        generator = ImportIdGenerator()
+        return [
+            Transaction(
+                date=transaction_date,
+                payee_name="",
+                memo=memo,
+                milliunit_amount=milliunit_amount,
+                import_id=generator.generate(transaction_date, milliunit_amount),
+            )
+            for transaction_date, memo, milliunit_amount in rows()
+        ]
+
+    store = fill()
+    print(f"{SIZE} transactions")
+    print(f"list of tuples   {_allocated_bytes(as_list) / 2 ** 20:>8.1f} MiB")
+    print(f"TransactionStore {_allocated_bytes(fill) / 2 ** 20:>8.1f} MiB")
+    print(f"append           {min(timeit.repeat(fill, number=1, repeat=3)):>8.3f} s")
+    seconds = min(timeit.repeat(lambda: store.json("account"), number=1, repeat=3))
+    print(f"json             {seconds:>8.3f} s")
+    seconds = min(timeit.repeat(lambda: _serialise(store), number=1, repeat=3))
+    print(f"json + dumps     {seconds:>8.3f} s {_peak_bytes(_serialise, store):>8.1f} MiB")
+    seconds = min(timeit.repeat(lambda: _stream(store), number=1, repeat=3))
+    print(f"iter_json        {seconds:>8.3f} s {_peak_bytes(_stream, store):>8.1f} MiB")
+
+
+def _serialise(store):
+    return json.dumps(store.json("account")).encode()
+
+
+def _stream(store):
+    for _ in store.iter_json("account"):
+        pass
+
+
+def _peak_bytes(function, store):
+    """ The peak memory allocated while serialising, as a request body would be """
+    tracemalloc.start()
+    function(store)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Measures how transactions_difference scales with the number of transactions:
+
+    python -m benchmarks.bench_transactions_difference
+"""
+import timeit
+
+from benchmarks import synthetic
+from ynab.transactions import transactions_difference
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def main():
+    print(f"{'transactions':>12} {'seconds':>10} {'us/transaction':>15}")
+    for n in SIZES:
+        a = synthetic.transactions(n)
+        b = synthetic.counterpart(a)
+        seconds = min(timeit.repeat(lambda: transactions_difference(a, b), number=1))
+        print(f"{n:>12} {seconds:>10.3f} {seconds / n * 1e6:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
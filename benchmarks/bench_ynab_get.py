@@ -0,0 +1,90 @@
+"""
+Measures the time taken to turn a response from YNAB with 50k transactions into a
+TransactionStore, compared with decoding it whole and appending each transaction
+after parsing its date with strptime:
+
+    python -m benchmarks.bench_ynab_get
+"""
+import json
+import timeit
+import uuid
+from datetime import datetime
+
+from benchmarks import synthetic
+from ynab.api import TransactionStore, _decode_transactions, _rows_from_ynab
+
+SIZE = 50_000
+
+
+def _response_body(transactions):
+    """ A response as returned by YNAB, with all the fields it returns """
+    account_id = str(uuid.uuid4())
+    return json.dumps(
+        {
+            "data": {
+                "transactions": [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "date": t.date.isoformat(),
+                        "amount": t.milliunit_amount,
+                        "memo": t.memo,
+                        "cleared": "cleared",
+                        "approved": True,
+                        "flag_color": None,
+                        "account_id": account_id,
+                        "account_name": "Current account",
+                        "payee_id": str(uuid.uuid4()),
+                        "payee_name": "Payee",
+                        "category_id": str(uuid.uuid4()),
+                        "category_name": "Groceries",
+                        "transfer_account_id": None,
+                        "transfer_transaction_id": None,
+                        "matched_transaction_id": None,
+                        "import_id": None,
+                        "deleted": False,
+                        "subtransactions": [],
+                    }
+                    for t in transactions
+                ],
+                "server_knowledge": 12345,
+            }
+        }
+    ).encode()
+
+
+def _decode_whole(body):
+    store = TransactionStore()
+    for t in json.loads(body)["data"]["transactions"]:
+        if not t["deleted"]:
+            store.append(
+                transaction_date=datetime.strptime(t["date"], "%Y-%m-%d"),
+                payee_name=t["payee_name"] or "",
+                memo=t["memo"] or "",
+                amount=int(t["amount"]) / 1000,
+            )
+    return store
+
+
+def _decode_incrementally(body):
+    transactions, _ = _decode_transactions(body.decode("utf-8"))
+    store = TransactionStore()
+    store.extend(_rows_from_ynab(t for t in transactions if not t["deleted"]))
+    return store
+
+
+def main():
+    transactions = synthetic.transactions(SIZE)
+    body = _response_body(transactions)
+    print(f"{SIZE} transactions, {len(body) / 2 ** 20:.1f} MiB")
+    for name, function in [
+        ("whole", _decode_whole),
+        ("incremental", _decode_incrementally),
+    ]:
+        amounts = [t.milliunit_amount for t in function(body).transactions]
+        wrong = sum(a != t.milliunit_amount for a, t in zip(amounts, transactions))
+        seconds = min(timeit.repeat(lambda: function(body), number=1, repeat=3))
+        print(f"{name:<12} {seconds:>8.3f} s {wrong:>6} amounts off by a milliunit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Times the hot paths of a run over a grid of synthetic datasets, varying their size, the
+fraction of transactions that share an amount and the number of days they are spread
+over. Each time is also divided by that of a fixed calibration loop run in the same
+process, so that results from different machines can be compared. Results are written
+as JSON and their ratios compared with those of a stored baseline, exiting with 1 if
+any case is slower relative to the calibration loop than in the baseline by more than
+the tolerance:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --sizes 1000 1000000 --baseline benchmarks/baseline.json
+
+A new baseline is made by copying the results over it. The ratios still vary somewhat
+between machines and Python versions, as the cases don't all scale alike with the
+calibration loop, so a regression reported against a baseline from another machine is
+worth confirming against a baseline made locally first.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from collections import namedtuple
+from tempfile import TemporaryDirectory
+
+from benchmarks import synthetic
+from ynab.api import ImportIdGenerator, TransactionStore
+from ynab.banks.dkb_de import _add_transactions_from_csv
+from ynab.transactions import pretty_format_transactions, transactions_difference
+
+DEFAULT_SIZES = [1_000, 10_000]
+DEFAULT_DUPLICATE_RATIOS = [0.0, 0.9]
+DEFAULT_DATE_SPREADS = [30, 365]
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_REPEAT = 3
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+CALIBRATION_ITERATIONS = 1_000_000
+
+Dataset = namedtuple("Dataset", ["size", "duplicate_ratio", "date_spread_days"])
+
+
+class _Case:
+    """
+    A function to time, given data prepared for it from the transactions of a dataset
+    outside of the timing
+    """
+
+    def __init__(self, name, prepare, run):
+        self.name = name
+        self.prepare = prepare
+        self.run = run
+
+
+def _rows(transactions):
+    return [(t.date, t.payee_name, t.memo, t.milliunit_amount) for t in transactions]
+
+
+def _filled_store(transactions):
+    store = TransactionStore()
+    store.extend(_rows(transactions))
+    return store
+
+
+def _append_all(transactions):
+    store = TransactionStore()
+    for t in transactions:
+        store.append(t.date, t.payee_name, t.memo, t.milliunit_amount / 1000)
+
+
+def _generate_all(transactions):
+    generate = ImportIdGenerator().generate
+    for t in transactions:
+        generate(t.date, t.milliunit_amount)
+
+
+def _dkb_export(transactions, directory):
+    path = os.path.join(directory, f"export_{len(transactions)}.csv")
+    synthetic.write_dkb_export(path, transactions)
+    return path
+
+
+def _cases(directory):
+    return [
+        _Case(
+            "transactions_difference",
+            lambda ts: (ts, synthetic.counterpart(ts)),
+            lambda ab: transactions_difference(*ab),
+        ),
+        _Case("TransactionStore.append", lambda ts: ts, _append_all),
+        _Case(
+            "TransactionStore.json",
+            _filled_store,
+            lambda store: store.json("account"),
+        ),
+        _Case("ImportIdGenerator.generate", lambda ts: ts, _generate_all),
+        _Case(
+            "_add_transactions_from_csv",
+            lambda ts: _dkb_export(ts, directory),
+            lambda path: _add_transactions_from_csv(path, TransactionStore()),
+        ),
+        _Case(
+            "pretty_format_transactions",
+            lambda ts: ts,
+            pretty_format_transactions,
+        ),
+    ]
+
+
+def _transactions(dataset: Dataset):
+    distinct_amounts = None
+    if dataset.duplicate_ratio:
+        distinct_amounts = max(1, round(dataset.size * (1 - dataset.duplicate_ratio)))
+    return synthetic.transactions(
+        dataset.size,
+        distinct_amounts=distinct_amounts,
+        days=dataset.date_spread_days,
+    )
+
+
+def key(case_name: str, dataset: Dataset) -> str:
+    return (
+        f"{case_name}[size={dataset.size},duplicates={dataset.duplicate_ratio},"
+        f"days={dataset.date_spread_days}]"
+    )
+
+
+def _calibration_loop():
+    total = 0
+    for i in range(CALIBRATION_ITERATIONS):
+        total += i % 7
+    return total
+
+
+def calibrate(repeat=DEFAULT_REPEAT) -> float:
+    """
+    :return: the seconds taken by a fixed loop of interpreted Python, the best of repeat
+        runs, which the times of the cases are measured against
+    """
+    return min(timeit.repeat(_calibration_loop, number=1, repeat=repeat))
+
+
+def run(datasets, case_names=None, repeat=DEFAULT_REPEAT, log=sys.stdout):
+    """
+    Times every case on every dataset, taking the best of repeat runs
+
+    :return: a dictionary from key(case, dataset) to seconds
+    """
+    results = {}
+    with TemporaryDirectory() as directory:
+        cases = [c for c in _cases(directory) if not case_names or c.name in case_names]
+        for dataset in datasets:
+            transactions = _transactions(dataset)
+            for case in cases:
+                prepared = case.prepare(transactions)
+                seconds = min(
+                    timeit.repeat(lambda: case.run(prepared), number=1, repeat=repeat)
+                )
+                results[key(case.name, dataset)] = seconds
+                print(f"{key(case.name, dataset):<75} {seconds:>9.4f} s", file=log)
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares results with a baseline, both as ratios to the calibration loop
+
+    :return: the keys of the results more than tolerance slower than the baseline,
+        with their ratio to it. Keys missing from the baseline are ignored.
+    """
+    regressions = {}
+    for k, seconds in results.items():
+        if k in baseline and seconds > baseline[k] * (1 + tolerance):
+            regressions[k] = seconds / baseline[k]
+    return regressions
+
+
+def _parse_arguments(args):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--duplicate-ratios", type=float, nargs="+", default=DEFAULT_DUPLICATE_RATIOS
+    )
+    parser.add_argument(
+        "--date-spreads", type=int, nargs="+", default=DEFAULT_DATE_SPREADS
+    )
+    parser.add_argument("--cases", nargs="+", help="only run these cases")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help=f"compare with this JSON file, defaults to {DEFAULT_BASELINE}",
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    return parser.parse_args(args)
+
+
+def main(argv=None):
+    args = _parse_arguments(sys.argv[1:] if argv is None else argv)
+    datasets = [
+        Dataset(size, duplicate_ratio, days)
+        for size in args.sizes
+        for duplicate_ratio in args.duplicate_ratios
+        for days in args.date_spreads
+    ]
+    # calibrating both before and after the cases evens out a machine still speeding
+    # up or slowing down while the suite runs
+    before = calibrate(args.repeat)
+    results = run(datasets, args.cases, args.repeat)
+    calibration_seconds = min(before, calibrate(args.repeat))
+    print(f"Calibration loop took {calibration_seconds:.4f} s")
+    ratios = {k: seconds / calibration_seconds for k, seconds in results.items()}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "calibration_seconds": calibration_seconds,
+                    "results": results,
+                    "ratios": ratios,
+                },
+                file,
+                indent=2,
+                sort_keys=True,
+            )
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} to compare with")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file).get("ratios")
+    if baseline is None:
+        print(f"No ratios to the calibration loop in {args.baseline} to compare with")
+        return 0
+    regressions = compare(ratios, baseline, args.tolerance)
+    for k, ratio in sorted(regressions.items()):
+        print(f"Regression: {k} took {ratio:.2f}x the baseline")
+    compared = sum(k in baseline for k in ratios)
+    print(f"{len(regressions)} regressions in {compared} cases compared with baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Generators of synthetic transactions for benchmarking
+"""
+import random
+from datetime import date, timedelta
+from importlib.resources import read_text
+
+from tests.banks import data
+from ynab.banks.dkb_de import (
+    DATE_FORMAT_IN_CSV,
+    DKB_CSV_DELIMITER,
+    DKB_ENCODING,
+    NUMBER_LINES_TO_IGNORE_IN_CSV,
+)
+from ynab.transactions import Transaction
+
+MEMOS = [
+    "Coffee",
+    "Supermarket",
+    "Rent",
+    "Train ticket",
+    "Restaurant",
+    "Cash withdrawal",
+    "Online shopping",
+    "Electricity bill",
+]
+
+
+def transactions(n, seed=0, distinct_amounts=None, days=365, end=date(2019, 12, 31)):
+    """
+    Returns n random transactions spread over the given number of days up to and
+    including the end date. By default amounts are mostly distinct; passing a small
+    number of distinct_amounts produces many transactions with duplicate amounts.
+    """
+    rng = random.Random(seed)
+    distinct_amounts = distinct_amounts or 100 * n
+    return [
+        Transaction(
+            date=end - timedelta(days=rng.randrange(days)),
+            payee_name="",
+            memo=f"{rng.choice(MEMOS)} {rng.randrange(10)}",
+            milliunit_amount=-10 * rng.randrange(1, distinct_amounts + 1),
+            import_id=None,
+        )
+        for _ in range(n)
+    ]
+
+
+def recurring(n, milliunit_amount=-2500, end=date(2019, 12, 31)):
+    """
+    Returns n transactions of the same amount, one a day up to and including the end
+    date, like a daily coffee paid by card
+    """
+    return [
+        Transaction(
+            date=end - timedelta(days=days),
+            payee_name="",
+            memo="Coffee",
+            milliunit_amount=milliunit_amount,
+            import_id=None,
+        )
+        for days in range(n)
+    ]
+
+
+def counterpart(transactions, seed=0, missing_fraction=0.05, max_date_offset=3):
+    """
+    Returns the transactions as they might appear on the other side of a reconciliation:
+    shuffled, with dates shifted by a few days and a fraction of them missing
+    """
+    rng = random.Random(seed)
+    kept = [t for t in transactions if rng.random() >= missing_fraction]
+    rng.shuffle(kept)
+    return [
+        t._replace(date=t.date + timedelta(rng.randint(0, max_date_offset)))
+        for t in kept
+    ]
+
+
+def write_dkb_export(path, transactions, seed=0):
+    """
+    Writes the transactions as a DKB account export: the header of the example file in
+    tests/banks/data followed by a copy of one of its rows per transaction, with the
+    transaction's date, memo and amount (which must be whole cents)
+    """
+    lines = read_text(data, "dkb_bank_example.csv", encoding=DKB_ENCODING).splitlines()
+    header = lines[: NUMBER_LINES_TO_IGNORE_IN_CSV + 1]
+    rows = [line.split(DKB_CSV_DELIMITER) for line in lines[len(header) :]]
+    rng = random.Random(seed)
+    with open(path, "w", encoding=DKB_ENCODING) as file:
+        file.write("\n".join(header) + "\n")
+        for t in transactions:
+            row = list(rng.choice(rows))
+            cents = abs(t.milliunit_amount) // 10
+            euros = f"{cents // 100:,}".replace(",", ".")
+            sign = "-" if t.milliunit_amount < 0 else ""
+            row[0] = f'"{t.date.strftime(DATE_FORMAT_IN_CSV)}"'
+            row[4] = f'"{t.memo}"'
+            row[7] = f'"{sign}{euros},{cents % 100:02}"'
+            file.write(DKB_CSV_DELIMITER.join(row) + "\n")
@@ -1,64 +1,228 @@
+import io
 import unittest
-from datetime import datetime
-from importlib.resources import path
+from datetime import date
+from importlib.resources import path, read_binary
+from tempfile import TemporaryDirectory
+from urllib.parse import parse_qs
 
-from mock import MagicMock, call
+import requests
+from cryptography.fernet import Fernet
+from mock import patch
 
 from tests.banks import data
-from ynab.api import YNAB
-from ynab.banks.dkb_de import _add_transactions_from_csv
+from tests.http_server import RecordingRequestHandler, serve
+from ynab import statements
+from ynab.api import TransactionStore
+from ynab.banks import dkb_de
+from ynab.banks.dkb_de import (
+    DKB,
+    _add_transactions_from_csv,
+    _parse_german_milliunits,
+)
+from ynab.sessions import SessionStore
 
+LOGIN_PAGE = """<form><input id="loginInputSelector" name="j_username"></form>"""
+TRANSACTIONS_PAGE = """
+<form method="post">
+  <input type="hidden" name="token" value="t0k3n">
+  <select name="slAllAccounts">
+    <option value="0">DE12 1203 0000 1234 5678 90 / Girokonto</option>
+    <option value="1">4930 **** **** 1234 / Kreditkarte</option>
+  </select>
+  <select name="slSearchPeriod">
+    <option value="0">letzten 30 Tage</option>
+    <option value="1">letzten 60 Tage</option>
+    <option value="2">letzten 90 Tage</option>
+  </select>
+</form>
+"""
 
-class Any:
-    def __eq__(self, other):
-        return True
+
+def _fields(store):
+    return [
+        (t.date, t.payee_name, t.memo, t.milliunit_amount) for t in store.transactions
+    ]
 
 
 class TestAddTransactionsFromCSV(unittest.TestCase):
     def test_add_from_bank_example_file(self):
-        ynab = MagicMock(spec=YNAB)
+        store = TransactionStore()
 
         with path(data, "dkb_bank_example.csv") as p:
-            _add_transactions_from_csv(p, ynab)
+            _add_transactions_from_csv(p, store)
 
+        first, second = _fields(store)
+        self.assertEqual(first[:2], (date(2019, 5, 6), "EC-POS EMV  0"))
+        self.assertEqual(first[3], -28200)
+        self.assertEqual(second, (date(2019, 5, 2), "HOLGER POTTS", "Auftrag", -950000))
         self.assertEqual(
-            ynab.add_transaction.call_args_list,
-            [
-                call(
-                    amount=-28.2,
-                    date=datetime(2019, 5, 6, 0, 0),
-                    memo=Any(),
-                    payee_name="EC-POS EMV  0",
-                ),
-                call(
-                    amount=-950.0,
-                    date=datetime(2019, 5, 2, 0, 0),
-                    memo="Auftrag",
-                    payee_name="HOLGER POTTS",
-                ),
-            ],
+            [t.import_id for t in store.transactions],
+            ["YNAB:-28200:2019-05-06:1", "YNAB:-950000:2019-05-02:1"],
         )
 
     def test_add_from_credit_card_example_file(self):
-        ynab = MagicMock(spec=YNAB)
+        store = TransactionStore()
 
         with path(data, "dkb_credit_card_example.csv") as p:
-            _add_transactions_from_csv(p, ynab)
+            _add_transactions_from_csv(p, store)
+
+        self.assertEqual(
+            _fields(store),
+            [
+                (date(2019, 5, 3), "", "REISEBANK FRANKFURT ATM", -45000),
+                (date(2019, 5, 3), "", "THE SHOP LONDON", -1000),
+            ],
+        )
+
+    def test_adds_in_batches(self):
+        store = TransactionStore()
+
+        with patch.object(dkb_de, "CSV_BATCH_SIZE", 1), patch.object(
+            store, "extend", wraps=store.extend
+        ) as extend:
+            with path(data, "dkb_credit_card_example.csv") as p:
+                _add_transactions_from_csv(p, store)
+
+        self.assertEqual(store.count(), 2)
+        self.assertEqual(extend.call_count, 3)
+
+    def test_skips_future_dates(self):
+        store = TransactionStore()
+        log = io.StringIO()
+
+        with patch.object(statements, "date") as mock_date:
+            mock_date.today.return_value = date(2019, 5, 4)
+            with path(data, "dkb_bank_example.csv") as p:
+                _add_transactions_from_csv(p, store, log)
+
+        self.assertIn("Skipping because it is in the future", log.getvalue())
+
+        self.assertEqual([t.payee_name for t in store.transactions], ["HOLGER POTTS"])
+
+
+class FakeDkbHandler(RecordingRequestHandler):
+    """
+    Stands in for DKB's banking, serving the example exports of the account last
+    searched for to clients with a valid session cookie
+    """
+
+    def do_GET(self):
+        self._record(body=None)
+        if "sid=valid" not in self.headers.get("Cookie", ""):
+            self._send(200, "text/html", LOGIN_PAGE.encode())
+        elif "csvExport" in self.path:
+            name = {"0": "dkb_bank_example.csv", "1": "dkb_credit_card_example.csv"}
+            export = read_binary(data, name[self.server.account])
+            self._send(200, "text/csv; charset=iso-8859-1", export)
+        else:
+            self._send(200, "text/html", TRANSACTIONS_PAGE.encode())
+
+    def do_POST(self):
+        body = parse_qs(self._read_body().decode())
+        self._record(body=body)
+        self.server.account = body["slAllAccounts"][0]
+        self._send(200, "text/html", TRANSACTIONS_PAGE.encode())
+
+
+class LoggedOutExportHandler(FakeDkbHandler):
+    """ As FakeDkbHandler, but serves the login page for the export, as happens if the
+    session ends part way """
 
+    def do_GET(self):
+        if "csvExport" in self.path:
+            self._record(body=None)
+            self._send(200, "text/html", LOGIN_PAGE.encode())
+        else:
+            super().do_GET()
+
+
+class TestFetchTransactionsHttp(unittest.TestCase):
+    def setUp(self):
+        self._directory = TemporaryDirectory()
+        self.session_store = SessionStore(self._directory.name, Fernet.generate_key())
+        self.store = TransactionStore()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _fetch(self, account_substring, cookie_value, handler=FakeDkbHandler):
+        bank = DKB(
+            {"account_substring": account_substring}, {"anmeldename": "me", "pin": "1"}
+        )
+        bank.session_store = self.session_store
+        if cookie_value:
+            cookie = {"name": "sid", "value": cookie_value, "domain": "127.0.0.1"}
+            session = {"cookies": [cookie], "origin": "", "local_storage": {}}
+            self.session_store.save(bank.session_name(), session)
+
+        with serve(handler) as (server, url):
+            with patch.object(dkb_de, "BANKING_URL", url + "banking"):
+                fetched = bank.fetch_transactions_http(requests.Session(), self.store)
+        return fetched, self.store, server.requests
+
+    def test_fetches_account(self):
+        fetched, store, requests_made = self._fetch("Girokonto", "valid")
+
+        self.assertTrue(fetched)
         self.assertEqual(
-            ynab.add_transaction.call_args_list,
+            [t.payee_name for t in store.transactions],
+            ["EC-POS EMV  0", "HOLGER POTTS"],
+        )
+        self.assertEqual(
+            [(r["method"], r["path"]) for r in requests_made],
             [
-                call(
-                    amount=-45.0,
-                    date=datetime(2019, 5, 3, 0, 0),
-                    memo="REISEBANK FRANKFURT ATM",
-                    payee_name="",
-                ),
-                call(
-                    amount=-1.0,
-                    date=datetime(2019, 5, 3, 0, 0),
-                    memo="THE SHOP LONDON",
-                    payee_name="",
-                ),
+                ("GET", "/banking/finanzstatus/kontoumsaetze?%24event=init"),
+                ("POST", "/banking/finanzstatus/kontoumsaetze?%24event=search"),
+                ("GET", "/banking/finanzstatus/kontoumsaetze?%24event=csvExport"),
             ],
         )
+        self.assertEqual(
+            requests_made[1]["body"],
+            {"token": ["t0k3n"], "slAllAccounts": ["0"], "slSearchPeriod": ["0"]},
+        )
+        # one connection is kept alive for all the requests
+        self.assertEqual(len({r["client_port"] for r in requests_made}), 1)
+
+    def test_fetches_credit_card(self):
+        fetched, store, _ = self._fetch("Kreditkarte", "valid")
+
+        self.assertTrue(fetched)
+        self.assertEqual(store.count(), 2)
+        self.assertEqual(store.transactions[0].memo, "REISEBANK FRANKFURT ATM")
+
+    def test_expired_session(self):
+        fetched, store, requests_made = self._fetch("Girokonto", "expired")
+
+        self.assertFalse(fetched)
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(len(requests_made), 1)
+        self.assertIsNone(self.session_store.load("DKB:me"))
+
+    def test_login_page_instead_of_export(self):
+        with self.assertRaises(ValueError):
+            self._fetch("Girokonto", "valid", LoggedOutExportHandler)
+        self.assertEqual(self.store.count(), 0)
+
+    def test_no_saved_session(self):
+        fetched, _, requests_made = self._fetch("Girokonto", None)
+
+        self.assertFalse(fetched)
+        self.assertEqual(requests_made, [])
+
+
+class TestParseGermanMilliunits(unittest.TestCase):
+    def test_parse(self):
+        cases = {
+            "-28,20": -28200,
+            "950,00": 950000,
+            "12.002,34": 12002340,
+            "-1.234.567,89": -1234567890,
+            "-0,05": -50,
+            "3": 3000,
+            "+7,5": 7500,
+            "-1.91": -1910,
+            "0,0015": 2,
+        }
+        for string, expected in cases.items():
+            with self.subTest(string=string):
+                self.assertEqual(_parse_german_milliunits(string), expected)
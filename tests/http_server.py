@@ -0,0 +1,97 @@
+"""
+Local HTTP servers standing in for remote services in tests
+"""
+
+import gzip
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@contextmanager
+def serve(handler_class):
+    """
+    Serves requests with the given handler on a free local port in a background thread
+
+    :return: the server and its base URL
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class RecordingRequestHandler(BaseHTTPRequestHandler):
+    """ A keep-alive request handler that records every request on the server """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding") != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()  # the CRLF ending the chunk
+            if size == 0:
+                return b"".join(chunks)
+
+    def _record(self, body):
+        self.server.requests.append(
+            {
+                "method": self.command,
+                "path": self.path,
+                "headers": dict(self.headers),
+                "client_port": self.client_address[1],
+                "body": body,
+            }
+        )
+
+    def _send(self, status_code, content_type, body: bytes, headers=()):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class JsonRequestHandler(RecordingRequestHandler):
+    """ Responds with gzipped JSON """
+
+    def do_GET(self):
+        self._record(body=None)
+        self._respond(*self.get())
+
+    def do_POST(self):
+        body = json.loads(self._read_body())
+        self._record(body=body)
+        self._respond(*self.post(body))
+
+    def get(self):
+        """ Returns the status code and JSON body for a GET """
+        raise NotImplementedError
+
+    def post(self, body):
+        """ Returns the status code and JSON body for a POST """
+        raise NotImplementedError
+
+    def _respond(self, status_code, body):
+        encoded = gzip.compress(json.dumps(body).encode())
+        self._send(
+            status_code,
+            "application/json",
+            encoded,
+            headers=[("Content-Encoding", "gzip")],
+        )
@@ -1,14 +1,19 @@
+import json
 import unittest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from tempfile import TemporaryDirectory
 from unittest import mock
+from urllib.parse import parse_qs, urlparse
 from uuid import uuid4
 
 from faker import Faker
 from mock import MagicMock
-from requests import Response
+from requests import ConnectionError, HTTPError, Response
 
-from ynab.api import YNAB, ImportIdGenerator, TransactionStore
+from tests.http_server import JsonRequestHandler, serve
+from ynab.api import YNAB, ImportIdGenerator, TransactionStore, _decode_transactions
 from ynab.secrets import Keyring
+from ynab.transactions import Transaction
 
 faker = Faker()
 
@@ -37,6 +42,21 @@ class TestApi(unittest.TestCase):
         ]
         self.assertEqual(ids, expected)
 
+    def test_import_id_generator_generate_many(self):
+        generator = ImportIdGenerator()
+        generator.generate(date(2018, 4, 13), 12345)
+        ids = generator.generate_many(
+            [date(2018, 4, 13), date(2014, 8, 1), date(2018, 4, 13)], [12345, -1, 12345]
+        )
+        self.assertEqual(
+            ids,
+            [
+                "YNAB:12345:2018-04-13:2",
+                "YNAB:-1:2014-08-01:1",
+                "YNAB:12345:2018-04-13:3",
+            ],
+        )
+
     def test_api(self):
         store = TransactionStore()
         store.append(
@@ -81,6 +101,12 @@ class TestApi(unittest.TestCase):
         }
         self.assertEqual(expected, store.json("some-account-id"))
 
+    def test_future_date_rejected(self):
+        store = TransactionStore()
+        with self.assertRaises(ValueError):
+            store.append(date.today() + timedelta(days=1), "", "", 1)
+        self.assertEqual(store.count(), 0)
+
     def test_get(self):
         account_id = str(uuid4())
 
@@ -122,8 +148,8 @@ class TestApi(unittest.TestCase):
                 }
             }
 
-            mock_response = MagicMock(spec=Response)
-            mock_response.json.return_value = ynab_response
+            mock_response = MagicMock(spec=Response, status_code=200)
+            mock_response.content = json.dumps(ynab_response).encode()
             mock_keyring = MagicMock(spec=Keyring)
             with mock.patch.object(YNAB, "secret", return_value="some_secret"):
                 with mock.patch.object(YNAB, "validate_secrets", return_value=True):
@@ -131,7 +157,9 @@ class TestApi(unittest.TestCase):
                         {"secrets_keys": {"access_token": ""}}, keyring=mock_keyring
                     )
 
-                    with mock.patch("requests.get", return_value=mock_response):
+                    with mock.patch.object(
+                        ynab.session, "request", return_value=mock_response
+                    ):
                         transactions = ynab.get("account_id", "budget_id")
                         self.assertEqual(
                             transactions.count(), 1
@@ -141,3 +169,372 @@ class TestApi(unittest.TestCase):
                         self.assertEqual(t.payee_name, payee_name or "")
                         self.assertEqual(t.memo, memo or "")
                         self.assertEqual(t.milliunit_amount, -9500)
+
+
+class TestTransactionStore(unittest.TestCase):
+    def setUp(self):
+        self.store = TransactionStore()
+        for day, payee_name in [(3, "shop"), (1, "cafe"), (2, "shop"), (1, "cafe")]:
+            self.store.append(date(2019, 1, day), payee_name, "memo", -1.5)
+
+    def test_transactions(self):
+        transactions = self.store.transactions
+        self.assertEqual(len(transactions), 4)
+        self.assertEqual(
+            transactions[1],
+            Transaction(
+                date=date(2019, 1, 1),
+                payee_name="cafe",
+                memo="memo",
+                milliunit_amount=-1500,
+                import_id="YNAB:-1500:2019-01-01:1",
+            ),
+        )
+        self.assertEqual(transactions[3].import_id, "YNAB:-1500:2019-01-01:2")
+        self.assertEqual([t.payee_name for t in transactions[1:3]], ["cafe", "shop"])
+
+    def test_strings_are_interned(self):
+        transactions = self.store.transactions
+        self.assertIs(transactions[0].payee_name, transactions[2].payee_name)
+        self.assertIs(transactions[0].memo, transactions[1].memo)
+
+    def test_from_transactions(self):
+        transactions = list(self.store.transactions)
+        store = TransactionStore(transactions)
+        self.assertEqual(list(store.transactions), transactions)
+        self.assertEqual(store.json("account"), self.store.json("account"))
+
+    def test_between(self):
+        in_range = self.store.between(date(2019, 1, 1), date(2019, 1, 2))
+        self.assertEqual(in_range.count(), 3)
+        self.assertEqual([t.date.day for t in in_range.transactions], [1, 1, 2])
+        self.assertEqual(
+            [t["import_id"] for t in in_range.json("account")["transactions"]],
+            [
+                "YNAB:-1500:2019-01-01:1",
+                "YNAB:-1500:2019-01-01:2",
+                "YNAB:-1500:2019-01-02:1",
+            ],
+        )
+        self.assertEqual(self.store.between(date(2019, 2, 1), date.today()).count(), 0)
+
+    def test_between_survives_append(self):
+        in_range = self.store.between(date(2019, 1, 3), date(2019, 1, 3))
+        self.store.append(date(2019, 1, 3), "shop", "memo", -1.5)
+        self.assertEqual(in_range.count(), 1)
+        self.assertEqual(
+            self.store.between(date(2019, 1, 3), date(2019, 1, 3)).count(), 2
+        )
+
+    def test_extend(self):
+        self.store.extend(
+            [(date(2019, 1, 1), "cafe", "memo", -1500), (date(2019, 1, 4), "", "", 7)]
+        )
+        transactions = self.store.transactions
+        self.assertEqual(len(transactions), 6)
+        self.assertEqual(transactions[4].import_id, "YNAB:-1500:2019-01-01:3")
+        self.assertEqual(transactions[5].milliunit_amount, 7)
+
+    def test_extend_with_import_ids(self):
+        rows = [(date(2019, 1, 1), "cafe", "memo", -1500)]
+        self.store.extend(rows, ["OFX:1"])
+        self.assertEqual(self.store.transactions[4].import_id, "OFX:1")
+        with self.assertRaises(ValueError):
+            self.store.extend(rows, [])
+
+    def test_explicit_and_generated_import_ids_mixed(self):
+        self.store.extend([(date(2019, 1, 1), "", "", 1)], ["OFX:1"])
+        self.store.append(date(2019, 1, 1), "cafe", "memo", -1.5)
+        self.assertEqual(
+            [t["import_id"] for t in self.store.json("account")["transactions"][3:]],
+            ["YNAB:-1500:2019-01-01:2", "OFX:1", "YNAB:-1500:2019-01-01:3"],
+        )
+
+    def test_extend_rejects_whole_batch(self):
+        future = date.today() + timedelta(days=1)
+        with self.assertRaises(ValueError):
+            self.store.extend(
+                [(date(2019, 1, 1), "cafe", "memo", -1500), (future, "", "", 1)]
+            )
+        self.assertEqual(self.store.count(), 4)
+        self.store.append(date(2019, 1, 1), "cafe", "memo", -1.5)
+        self.assertEqual(
+            self.store.transactions[4].import_id, "YNAB:-1500:2019-01-01:3"
+        )
+
+    def test_iter_json(self):
+        self.store.append(date(2019, 1, 1), 'a "quoted" café', "back\\slash", 2)
+        self.store.extend([(date(2019, 1, 2), "", "\n", 1)], ['OFX:"1"'])
+        with mock.patch("ynab.api.JSON_ROWS_PER_CHUNK", 2):
+            chunks = list(self.store.iter_json("account"))
+            in_range = self.store.between(date(2019, 1, 1), date(2019, 1, 1))
+            sliced = b"".join(in_range.iter_json("account"))
+
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(json.loads(b"".join(chunks)), self.store.json("account"))
+        self.assertEqual(json.loads(sliced), in_range.json("account"))
+        self.assertEqual(
+            json.loads(b"".join(TransactionStore().iter_json("account"))),
+            {"transactions": []},
+        )
+
+    def test_clear(self):
+        self.store.clear()
+        self.assertEqual(self.store.count(), 0)
+        self.assertEqual(self.store.json("account"), {"transactions": []})
+
+
+class TestPushInChunks(unittest.TestCase):
+    def setUp(self):
+        self.ynab = YNAB({}, {"access_token": "some_secret"})
+        self.store = TransactionStore()
+        for day in range(1, 8):
+            self.store.append(date(2019, 1, day), "payee", "memo", -day)
+
+    @staticmethod
+    def _bulk_response(request_json):
+        import_ids = [t["import_id"] for t in request_json["transactions"]]
+        response = MagicMock(spec=Response, status_code=201)
+        response.json.return_value = {
+            "data": {
+                "bulk": {
+                    "transaction_ids": import_ids[1:],
+                    "duplicate_import_ids": import_ids[:1],
+                }
+            }
+        }
+        return response
+
+    def test_chunks_are_aggregated(self):
+        def post(method, url, json, timeout):
+            return self._bulk_response(json)
+
+        with mock.patch.object(
+            self.ynab.session, "request", side_effect=post
+        ) as post_mock:
+            result = self.ynab.push_in_chunks(
+                self.store, "account_id", "budget_id", chunk_size=3
+            )
+
+        calls = post_mock.call_args_list
+        sizes = [len(c.kwargs["json"]["transactions"]) for c in calls]
+        self.assertEqual(sorted(sizes), [1, 3, 3])
+        self.assertEqual(
+            result.duplicate_import_ids,
+            [
+                "YNAB:-1000:2019-01-01:1",
+                "YNAB:-4000:2019-01-04:1",
+                "YNAB:-7000:2019-01-07:1",
+            ],
+        )
+        self.assertEqual(len(result.transaction_ids), 4)
+        self.assertEqual(result.failed_import_ids, [])
+
+    @mock.patch("time.sleep")
+    def test_only_failed_chunks_are_retried(self, _):
+        failures = {"YNAB:-4000:2019-01-04:1": 1}
+
+        def post(method, url, json, timeout):
+            first_import_id = json["transactions"][0]["import_id"]
+            if failures.get(first_import_id):
+                failures[first_import_id] -= 1
+                raise ConnectionError()
+            return self._bulk_response(json)
+
+        with mock.patch.object(
+            self.ynab.session, "request", side_effect=post
+        ) as post_mock:
+            result = self.ynab.push_in_chunks(
+                self.store, "account_id", "budget_id", chunk_size=3
+            )
+
+        self.assertEqual(post_mock.call_count, 4)
+        self.assertEqual(len(result.duplicate_import_ids), 3)
+        self.assertEqual(result.failed_import_ids, [])
+
+    @mock.patch("time.sleep")
+    def test_failures_are_reported(self, _):
+        def post(method, url, json, timeout):
+            response = MagicMock(spec=Response, status_code=400)
+            if json["transactions"][0]["import_id"] == "YNAB:-1000:2019-01-01:1":
+                raise HTTPError(response=response)
+            return self._bulk_response(json)
+
+        with mock.patch.object(
+            self.ynab.session, "request", side_effect=post
+        ) as post_mock:
+            result = self.ynab.push_in_chunks(
+                self.store, "account_id", "budget_id", chunk_size=3
+            )
+
+        self.assertEqual(post_mock.call_count, 3)  # client errors are not retried
+        self.assertEqual(len(result.failed_import_ids), 3)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(len(result.transaction_ids), 2)
+
+
+class TestDecodeTransactions(unittest.TestCase):
+    transaction = {
+        "id": "1",
+        "account_id": "a",
+        "date": "2019-11-16",
+        "amount": -9500,
+        "payee_name": None,
+        "memo": '"transactions": [], "server_knowledge": 1',
+        "deleted": False,
+        "subtransactions": [{"amount": -9500}],
+    }
+
+    def test_decode(self):
+        lean = {k: v for k, v in self.transaction.items() if k != "subtransactions"}
+        for data in [
+            {"transactions": [self.transaction] * 2, "server_knowledge": 7},
+            {"server_knowledge": 7, "transactions": [self.transaction] * 2},
+        ]:
+            for indent in [None, 2]:
+                body = json.dumps({"data": data}, indent=indent)
+                with self.subTest(body=body):
+                    self.assertEqual(_decode_transactions(body), ([lean, lean], 7))
+
+    def test_no_server_knowledge(self):
+        body = json.dumps({"data": {"transactions": []}})
+        self.assertEqual(_decode_transactions(body), ([], None))
+
+    def test_invalid(self):
+        for body in ['{"data": {}}', '{"data": {"transactions": [{"id": ]}}', ""]:
+            with self.subTest(body=body), self.assertRaises(ValueError):
+                _decode_transactions(body)
+
+
+class _StandInYnab(JsonRequestHandler):
+    def get(self):
+        transaction = {
+            "id": "ynab-id",
+            "date": "2019-11-16",
+            "amount": -9500,
+            "memo": "memo",
+            "payee_name": "payee",
+            "deleted": False,
+        }
+        return 200, {"data": {"transactions": [transaction]}}
+
+    def post(self, body):
+        import_ids = [t["import_id"] for t in body["transactions"]]
+        bulk = {"transaction_ids": import_ids, "duplicate_import_ids": []}
+        return 201, {"data": {"bulk": bulk}}
+
+
+class TestSession(unittest.TestCase):
+    def test_requests_share_a_connection(self):
+        store = TransactionStore()
+        store.append(date(2019, 11, 16), "payee", "memo", -9.5)
+
+        with serve(_StandInYnab) as (server, url):
+            ynab = YNAB({"url": url}, {"access_token": "some_secret"})
+            fetched = ynab.get("account_id", "budget_id")
+            ynab.push(store, "account_id", "budget_id")
+            result = ynab.push_in_chunks(store, "account_id", "budget_id")
+
+        self.assertEqual(
+            list(fetched.transactions),
+            [t._replace(import_id="ynab-id") for t in store.transactions],
+        )
+        self.assertEqual(result.transaction_ids, ["YNAB:-9500:2019-11-16:1"])
+        self.assertEqual(
+            [(r["method"], r["path"]) for r in server.requests],
+            [
+                (
+                    "GET",
+                    "/budgets/budget_id/accounts/account_id/transactions"
+                    f"?since_date={date.today() - timedelta(days=30)}",
+                ),
+                ("POST", "/budgets/budget_id/transactions/bulk"),
+                ("POST", "/budgets/budget_id/transactions/bulk"),
+            ],
+        )
+        self.assertEqual(server.requests[1]["headers"]["Transfer-Encoding"], "chunked")
+        self.assertEqual(server.requests[1]["body"], store.json("account_id"))
+        self.assertEqual(len({r["client_port"] for r in server.requests}), 1)
+        for request in server.requests:
+            self.assertEqual(request["headers"]["Authorization"], "Bearer some_secret")
+            self.assertEqual(request["headers"]["Accept-Encoding"], "gzip")
+
+        self.assertEqual(
+            [(t.method, t.status_code) for t in ynab.timings],
+            [("GET", 200), ("POST", 201), ("POST", 201)],
+        )
+        self.assertTrue(all(t.seconds > 0 for t in ynab.timings))
+
+
+class _StandInYnabWithDeltas(JsonRequestHandler):
+    def get(self):
+        query = parse_qs(urlparse(self.path).query)
+        today = date.today().isoformat()
+        if "last_knowledge_of_server" not in query:
+            transactions = [
+                {"id": "1", "date": today, "amount": -1000, "deleted": False},
+                {"id": "2", "date": today, "amount": -2000, "deleted": False},
+            ]
+        else:
+            transactions = [
+                {"id": "1", "date": today, "amount": -1000, "deleted": True},
+                {"id": "3", "date": today, "amount": -3000, "deleted": False},
+            ]
+        for t in transactions:
+            t.update(account_id="account_id", payee_name=None, memo=None)
+        return 200, {"data": {"transactions": transactions, "server_knowledge": 7}}
+
+
+class TestDeltaSync(unittest.TestCase):
+    def test_only_changes_are_fetched(self):
+        with TemporaryDirectory() as directory:
+            with serve(_StandInYnabWithDeltas) as (server, url):
+                ynab = YNAB({"url": url}, {"access_token": "some_secret"})
+                first = ynab.get("account_id", "budget_id", directory)
+                second = ynab.get("account_id", "budget_id", directory)
+
+        def amounts(store):
+            return [t.milliunit_amount for t in store.transactions]
+
+        self.assertEqual(amounts(first), [-1000, -2000])
+        self.assertEqual(amounts(second), [-2000, -3000])
+        self.assertEqual([t.import_id for t in second.transactions], ["2", "3"])
+        first_query, second_query = [
+            parse_qs(urlparse(r["path"]).query) for r in server.requests
+        ]
+        self.assertNotIn("last_knowledge_of_server", first_query)
+        self.assertEqual(second_query["last_knowledge_of_server"], ["7"])
+
+
+class _StandInYnabBudget(JsonRequestHandler):
+    def get(self):
+        today = date.today().isoformat()
+        transactions = [
+            {"id": "t1", "account_id": "a", "amount": -1000, "deleted": False},
+            {"id": "t2", "account_id": "b", "amount": -2000, "deleted": False},
+            {"id": "t3", "account_id": "a", "amount": -3000, "deleted": False},
+            {"id": "t4", "account_id": "b", "amount": -4000, "deleted": True},
+        ]
+        for t in transactions:
+            t.update(date=today, payee_name=None, memo=None)
+        return 200, {"data": {"transactions": transactions, "server_knowledge": 7}}
+
+
+class TestGetBudget(unittest.TestCase):
+    def test_partitioned_by_account(self):
+        with serve(_StandInYnabBudget) as (server, url):
+            ynab = YNAB({"url": url}, {"access_token": "some_secret"})
+            transaction_stores = ynab.get_budget("budget_id")
+
+        (request,) = server.requests
+        self.assertTrue(request["path"].startswith("/budgets/budget_id/transactions?"))
+        self.assertEqual(
+            {
+                account_id: [t.milliunit_amount for t in store.transactions]
+                for account_id, store in transaction_stores.items()
+            },
+            {"a": [-1000, -3000], "b": [-2000]},
+        )
+        self.assertEqual(
+            [t.import_id for t in transaction_stores["a"].transactions], ["t1", "t3"]
+        )
@@ -0,0 +1,43 @@
+import random
+import unittest
+from itertools import permutations
+
+from ynab.assignment import min_cost_assignment
+
+
+def _total(costs, pairs):
+    return sum(costs[row][column] for row, column in pairs)
+
+
+def _brute_force_minimum(costs):
+    n, m = len(costs), len(costs[0])
+    if n <= m:
+        return min(
+            sum(costs[row][column] for row, column in enumerate(columns))
+            for columns in permutations(range(m), n)
+        )
+    return min(
+        sum(costs[row][column] for column, row in enumerate(rows))
+        for rows in permutations(range(n), m)
+    )
+
+
+class TestMinCostAssignment(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(min_cost_assignment([]), [])
+        self.assertEqual(min_cost_assignment([[]]), [])
+
+    def test_square(self):
+        costs = [[4, 1, 3], [2, 0, 5], [3, 2, 2]]
+        self.assertEqual(min_cost_assignment(costs), [(0, 1), (1, 0), (2, 2)])
+
+    def test_same_as_brute_force(self):
+        rng = random.Random(0)
+        for n, m in [(1, 1), (2, 3), (3, 2), (4, 4), (5, 3), (3, 6)]:
+            for _ in range(10):
+                costs = [[rng.randrange(10) for _ in range(m)] for _ in range(n)]
+                pairs = min_cost_assignment(costs)
+                self.assertEqual(len(pairs), min(n, m))
+                self.assertEqual(len({row for row, _ in pairs}), min(n, m))
+                self.assertEqual(len({column for _, column in pairs}), min(n, m))
+                self.assertEqual(_total(costs, pairs), _brute_force_minimum(costs))
@@ -1,7 +1,11 @@
 import unittest
 
+from mock import MagicMock
+
 from ynab import bank
 
+SESSION = {"cookies": [], "origin": "https://bank.com", "local_storage": {}}
+
 
 class TestSecrets(unittest.TestCase):
     def setUp(self):
@@ -28,5 +32,56 @@ class TestSecrets(unittest.TestCase):
             self.bank.secret("foo")
 
 
+class ProbedBank(bank.Bank):
+    session_probe = ("https://bank.com", ("id", "logged-in"))
+
+    def __init__(self):
+        super().__init__({})
+        self.session_store = MagicMock()
+        self._full_log_in = MagicMock()
+
+
+class TestLogIn(unittest.TestCase):
+    def setUp(self):
+        self.bank = ProbedBank()
+        self.driver = MagicMock()
+        self.driver.session.return_value = SESSION
+
+    def test_valid_session_skips_log_in(self):
+        self.bank.session_store.load.return_value = SESSION
+        self.driver.has_element.return_value = True
+        self.bank.log_in(self.driver)
+
+        self.driver.restore_session.assert_called_once_with(SESSION)
+        self.driver.get.assert_called_once_with("https://bank.com")
+        self.driver.has_element.assert_called_once_with("id", "logged-in", 5)
+        self.bank._full_log_in.assert_not_called()
+        self.bank.session_store.save.assert_not_called()
+
+    def test_expired_session_logs_in(self):
+        self.bank.session_store.load.return_value = SESSION
+        self.driver.has_element.return_value = False
+        self.bank.log_in(self.driver)
+
+        self.bank.session_store.delete.assert_called_once_with("ProbedBank")
+        self.bank._full_log_in.assert_called_once_with(self.driver)
+        self.bank.session_store.save.assert_called_once_with("ProbedBank", SESSION)
+
+    def test_no_saved_session_logs_in(self):
+        self.bank.session_store.load.return_value = None
+        self.bank.log_in(self.driver)
+
+        self.driver.restore_session.assert_not_called()
+        self.bank._full_log_in.assert_called_once_with(self.driver)
+        self.bank.session_store.save.assert_called_once_with("ProbedBank", SESSION)
+
+    def test_no_session_store(self):
+        self.bank.session_store = None
+        self.bank.log_in(self.driver)
+
+        self.bank._full_log_in.assert_called_once_with(self.driver)
+        self.driver.session.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,88 @@
+import os
+import unittest
+from datetime import date
+from tempfile import TemporaryDirectory
+
+from ynab.cache import TransactionCache
+
+
+def _transaction(id, day, amount=-1000, deleted=False):
+    return {
+        "id": id,
+        "account_id": "account_id",
+        "date": date(2019, 1, day).isoformat(),
+        "amount": amount,
+        "payee_name": "payee",
+        "memo": None,
+        "deleted": deleted,
+    }
+
+
+class TestTransactionCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "budget_account.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_empty(self):
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        self.assertIsNone(cache.server_knowledge)
+        self.assertEqual(cache.transactions, {})
+
+    def test_merge_and_reload(self):
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        cache.merge([_transaction("a", 1), _transaction("b", 2)], server_knowledge=10)
+        cache.save()
+
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        self.assertEqual(cache.server_knowledge, 10)
+        cache.merge(
+            [
+                _transaction("a", 1, deleted=True),
+                _transaction("b", 2, amount=-2000),
+                _transaction("c", 3),
+            ],
+            server_knowledge=12,
+        )
+        cache.save()
+
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        self.assertEqual(cache.server_knowledge, 12)
+        self.assertEqual(
+            {id: t["amount"] for id, t in cache.transactions.items()},
+            {"b": -2000, "c": -1000},
+        )
+
+    def test_old_transactions_are_forgotten(self):
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        cache.merge([_transaction("a", 1), _transaction("b", 2)], server_knowledge=10)
+        cache.save()
+
+        cache = TransactionCache(self.path, date(2019, 1, 2))
+        self.assertEqual(cache.server_knowledge, 10)
+        self.assertEqual(list(cache.transactions), ["b"])
+
+    def test_transactions_moved_out_of_the_date_range_are_forgotten(self):
+        cache = TransactionCache(self.path, date(2019, 1, 2))
+        cache.merge([_transaction("a", 2), _transaction("b", 3)], server_knowledge=10)
+        cache.merge([_transaction("a", 1)], server_knowledge=11)
+
+        self.assertEqual(list(cache.transactions), ["b"])
+
+    def test_cache_with_too_short_a_date_range_is_ignored(self):
+        cache = TransactionCache(self.path, date(2019, 1, 2))
+        cache.merge([_transaction("b", 2)], server_knowledge=10)
+        cache.save()
+
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        self.assertIsNone(cache.server_knowledge)
+        self.assertEqual(cache.transactions, {})
+
+    def test_corrupt_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as file:
+            file.write("{")
+        cache = TransactionCache(self.path, date(2019, 1, 1))
+        self.assertIsNone(cache.server_knowledge)
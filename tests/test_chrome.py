@@ -0,0 +1,335 @@
+import json
+import os
+import re
+import threading
+import unittest
+from tempfile import TemporaryDirectory
+
+from mock import MagicMock, call, patch
+from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.common.by import By
+
+from ynab import chrome
+from ynab.chrome import Chrome, ChromePool, Traffic
+
+
+def _send_commands(driver):
+    return [
+        (c.args[1]["cmd"], c.args[1]["params"])
+        for c in driver.execute.call_args_list
+        if c.args[0] == "send_command"
+    ]
+
+
+def _log_entry(timestamp, method, **params):
+    message = {"message": {"method": method, "params": params}}
+    return {"timestamp": timestamp, "message": json.dumps(message)}
+
+
+class TestChrome(unittest.TestCase):
+    def test_reset(self):
+        driver = Chrome.__new__(Chrome)
+        driver.command_executor = MagicMock()
+        driver.execute = MagicMock()
+        driver.visited_origins = {"https://login.dkb.de"}
+        log = [
+            _log_entry(1000, "Page.frameNavigated", frame={"securityOrigin": origin})
+            for origin in ["https://banking.dkb.de", "https://www.dkb.de", "://"]
+        ]
+        url = "https://www.dkb.de/banking?x=1"
+        with patch.object(Chrome, "current_url", url), patch.object(
+            Chrome, "get_log", side_effect=[log, []]
+        ):
+            with patch.object(Chrome, "get") as get:
+                driver.reset("/downloads/2")
+
+        get.assert_called_once_with("about:blank")
+        self.assertEqual(driver.visited_origins, set())
+        self.assertEqual(
+            _send_commands(driver),
+            [
+                (
+                    "Storage.clearDataForOrigin",
+                    {"origin": "https://banking.dkb.de", "storageTypes": "all"},
+                ),
+                (
+                    "Storage.clearDataForOrigin",
+                    {"origin": "https://login.dkb.de", "storageTypes": "all"},
+                ),
+                (
+                    "Storage.clearDataForOrigin",
+                    {"origin": "https://www.dkb.de", "storageTypes": "all"},
+                ),
+                ("Network.clearBrowserCookies", {}),
+                ("Network.clearBrowserCache", {}),
+                (
+                    "Page.setDownloadBehavior",
+                    {"behavior": "allow", "downloadPath": "/downloads/2"},
+                ),
+            ],
+        )
+
+    def test_restore_session(self):
+        driver = Chrome.__new__(Chrome)
+        driver.command_executor = MagicMock()
+        driver.execute = MagicMock()
+        session = {
+            "cookies": [
+                {
+                    "name": "a",
+                    "value": "1",
+                    "domain": ".dkb.de",
+                    "path": "/",
+                    "expires": 1600000000.5,
+                    "session": False,
+                    "size": 2,
+                },
+                {
+                    "name": "b",
+                    "value": "2",
+                    "domain": ".dkb.de",
+                    "path": "/",
+                    "expires": -1,
+                    "session": True,
+                    "size": 2,
+                },
+            ],
+            "origin": "https://www.dkb.de",
+            "local_storage": {"token": "xyz"},
+        }
+        with patch.object(Chrome, "get") as get:
+            with patch.object(Chrome, "execute_script") as execute_script:
+                driver.restore_session(session)
+
+        self.assertEqual(
+            _send_commands(driver),
+            [
+                (
+                    "Network.setCookies",
+                    {
+                        "cookies": [
+                            {
+                                "name": "a",
+                                "value": "1",
+                                "domain": ".dkb.de",
+                                "path": "/",
+                                "expires": 1600000000.5,
+                            },
+                            {
+                                "name": "b",
+                                "value": "2",
+                                "domain": ".dkb.de",
+                                "path": "/",
+                            },
+                        ]
+                    },
+                )
+            ],
+        )
+        get.assert_called_once_with("https://www.dkb.de")
+        self.assertEqual({"token": "xyz"}, execute_script.call_args.args[1])
+
+    def _construct(self, **kwargs):
+        with patch.object(Chrome, "__init__", return_value=None) as init:
+            with patch.object(Chrome, "_send_command") as send_command:
+                Chrome.construct("/downloads/1", True, **kwargs)
+        return init.call_args.kwargs, [c.args for c in send_command.call_args_list]
+
+    def test_construct_lean(self):
+        kwargs, commands = self._construct(lean=True, blocked_domains=["ads.com"])
+
+        self.assertEqual("eager", kwargs["desired_capabilities"]["pageLoadStrategy"])
+        self.assertIn("--disable-extensions", kwargs["chrome_options"].arguments)
+        (urls,) = [p["urls"] for c, p in commands if c == "Network.setBlockedURLs"]
+        self.assertIn("*.woff2", urls)
+        self.assertIn("*.woff2?*", urls)
+        self.assertIn("*://*.google-analytics.com/*", urls)
+        self.assertIn("*://*.ads.com/*", urls)
+
+    def test_blocked_resource_patterns(self):
+        def blocked(url):
+            return any(
+                re.fullmatch(re.escape(pattern).replace(r"\*", ".*"), url)
+                for pattern in chrome.BLOCKED_RESOURCE_PATTERNS
+            )
+
+        self.assertTrue(blocked("https://bank.com/logo.png"))
+        self.assertTrue(blocked("https://bank.com/fonts/sans.woff2?v=3"))
+        self.assertFalse(blocked("https://bank.com/login.svg.html"))
+        self.assertFalse(blocked("https://bank.com/export?name=talk.mp3stream"))
+        self.assertFalse(blocked("https://bank.com/app.js?v=icon.png.bak"))
+
+    def test_construct_not_lean(self):
+        kwargs, commands = self._construct()
+
+        self.assertNotIn("pageLoadStrategy", kwargs["desired_capabilities"])
+        self.assertNotIn("--disable-extensions", kwargs["chrome_options"].arguments)
+        self.assertNotIn("Network.setBlockedURLs", [c for c, _ in commands])
+
+    def test_traffic(self):
+        driver = Chrome.__new__(Chrome)
+        driver.visited_origins = set()
+        frame = {"securityOrigin": "https://www.dkb.de"}
+        log = [
+            _log_entry(1000, "Page.frameStartedLoading", frameId="main"),
+            _log_entry(1050, "Page.frameNavigated", frame=frame),
+            _log_entry(1100, "Network.loadingFinished", encodedDataLength=2048),
+            _log_entry(1200, "Page.frameStartedLoading", frameId="ad"),
+            _log_entry(1300, "Network.loadingFinished", encodedDataLength=512),
+            _log_entry(1500, "Page.frameStoppedLoading", frameId="main"),
+            _log_entry(1600, "Page.frameStoppedLoading", frameId="other"),
+        ]
+        with patch.object(Chrome, "get_log", return_value=log) as get_log:
+            self.assertEqual(Traffic(2560, 1, 0.5), driver.traffic())
+        get_log.assert_called_once_with("performance")
+        self.assertEqual(driver.visited_origins, {"https://www.dkb.de"})
+
+
+@patch.object(chrome, "_POLL_SECONDS", 0.01)
+class TestWaits(unittest.TestCase):
+    def setUp(self):
+        self.driver = Chrome.__new__(Chrome)
+        self.driver.steps = []
+
+    def test_wait_for_clickable(self):
+        button = MagicMock()
+        button.is_displayed.return_value = True
+        attempts = []
+
+        def find_element(by, value):
+            attempts.append(value)
+            if len(attempts) == 1:
+                raise NoSuchElementException()
+            return button
+
+        with patch.object(Chrome, "find_element", side_effect=find_element) as find:
+            self.assertIs(button, self.driver.wait_for_clickable(By.ID, "submit"))
+
+        find.assert_called_with(By.ID, "submit")
+        ((description, seconds),) = self.driver.steps
+        self.assertEqual("clickable submit", description)
+        self.assertGreater(seconds, 0)
+
+    def test_has_element(self):
+        with patch.object(Chrome, "find_element", side_effect=NoSuchElementException):
+            self.assertFalse(self.driver.has_element(By.ID, "missing", timeout=0.05))
+        with patch.object(Chrome, "find_element"):
+            self.assertTrue(self.driver.has_element(By.ID, "present", timeout=0.05))
+        self.assertEqual(2, len(self.driver.steps))
+
+    def test_wait_for_network_idle(self):
+        states = [["loading", 0], ["complete", 2], ["complete", 3]]
+        states += [["complete", 3]] * 100
+        with patch.object(Chrome, "execute_script", side_effect=states) as script:
+            self.driver.wait_for_network_idle(idle_seconds=0.05)
+
+        # it only returns once the count of resources has stopped changing
+        self.assertGreater(script.call_count, 3)
+        self.assertEqual("network idle", self.driver.steps[0][0])
+
+    def test_wait_for_network_idle_times_out(self):
+        states = (["complete", i] for i in range(1000))
+        with patch.object(Chrome, "execute_script", side_effect=states):
+            with self.assertRaises(TimeoutException):
+                self.driver.wait_for_network_idle(idle_seconds=0.05, timeout=0.1)
+
+    def test_wait_for_download_started(self):
+        with TemporaryDirectory() as directory:
+            open(os.path.join(directory, "earlier.qif"), "w").close()
+            self.driver.download_directory = directory
+            path = os.path.join(directory, "export.qif.crdownload")
+            timer = threading.Timer(0.05, lambda: open(path, "w").close())
+
+            with self.driver.wait_for_download_started(timeout=5):
+                timer.start()
+
+        self.assertEqual("download started", self.driver.steps[0][0])
+
+    def test_wait_for_download_started_times_out(self):
+        with TemporaryDirectory() as directory:
+            open(os.path.join(directory, "earlier.qif"), "w").close()
+            self.driver.download_directory = directory
+
+            with self.assertRaises(TimeoutException):
+                with self.driver.wait_for_download_started(timeout=0.05):
+                    pass
+
+    def test_each_browser_has_its_own_steps(self):
+        with patch.object(webdriver.Chrome, "__init__", return_value=None):
+            first, second = Chrome(), Chrome()
+        with first._timed("element login"):
+            pass
+
+        self.assertEqual(1, len(first.steps))
+        self.assertEqual([], second.steps)
+
+
+@patch.object(Chrome, "construct")
+class TestChromePool(unittest.TestCase):
+    def test_browser_is_reused(self, construct):
+        pool = ChromePool(headless=True)
+        first = pool.acquire("/downloads/1")
+        pool.release(first)
+        second = pool.acquire("/downloads/2")
+
+        self.assertIs(first, second)
+        construct.assert_called_once_with("/downloads/1", True, False, [])
+        second.reset.assert_called_once_with("/downloads/2")
+        self.assertEqual((pool.starts, pool.reuses), (1, 1))
+
+    def test_concurrent_jobs_get_their_own_browsers(self, construct):
+        construct.side_effect = lambda *args: MagicMock()
+        pool = ChromePool(headless=False)
+        first = pool.acquire("/downloads/1")
+        second = pool.acquire("/downloads/2")
+
+        self.assertIsNot(first, second)
+        self.assertEqual(
+            construct.call_args_list,
+            [
+                call("/downloads/1", False, False, []),
+                call("/downloads/2", False, False, []),
+            ],
+        )
+
+    def test_unusable_browser_is_quit(self, construct):
+        construct.side_effect = lambda *args: MagicMock()
+        pool = ChromePool(headless=True)
+        broken = pool.acquire("/downloads/1")
+        pool.release(broken, reusable=False)
+        fresh = pool.acquire("/downloads/2")
+
+        broken.quit.assert_called_once_with()
+        self.assertIsNot(broken, fresh)
+        self.assertEqual((pool.starts, pool.reuses), (2, 0))
+
+    def test_browser_that_fails_to_reset_is_replaced(self, construct):
+        construct.side_effect = lambda *args: MagicMock()
+        pool = ChromePool(headless=True)
+        broken = pool.acquire("/downloads/1")
+        broken.reset.side_effect = WebDriverException("chrome not reachable")
+        broken.quit.side_effect = WebDriverException("chrome not reachable")
+        pool.release(broken)
+        fresh = pool.acquire("/downloads/2")
+
+        broken.quit.assert_called_once_with()
+        self.assertIsNot(broken, fresh)
+        self.assertEqual((pool.starts, pool.reuses), (2, 0))
+
+    def test_lean_browsers(self, construct):
+        pool = ChromePool(headless=True, lean=True, blocked_domains=["ads.com"])
+        pool.acquire("/downloads/1")
+        construct.assert_called_once_with("/downloads/1", True, True, ["ads.com"])
+
+    def test_close_quits_idle_browsers(self, construct):
+        pool = ChromePool(headless=True)
+        driver = pool.acquire("/downloads/1")
+        pool.release(driver)
+        pool.close()
+        driver.quit.assert_called_once_with()
+        self.assertIn("for 1 browser(s)", pool.summary())
@@ -4,6 +4,7 @@ import unittest
 import yaml
 
 from ynab import config_schema
+from ynab.bank import Bank
 
 _SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 PATH_TO_TEST_CONFIG = os.path.join(_SCRIPT_DIR, "ynab.conf")
@@ -17,3 +18,13 @@ class TestConfig(unittest.TestCase):
             as_yaml = yaml.safe_load(f)
         validated_yaml = config_schema.parse_config(as_yaml)
         self.assertEqual(as_yaml, validated_yaml)
+
+    def test_browser_blocked_domains(self):
+        with open(PATH_TO_TEST_CONFIG) as f:
+            as_yaml = yaml.safe_load(f)
+        as_yaml["browser"] = {"blocked_domains": ["ads.example.com"]}
+        self.assertEqual(as_yaml, config_schema.parse_config(as_yaml))
+
+    def test_bank_classes(self):
+        for bank_type in config_schema.BANKS:
+            self.assertTrue(issubclass(config_schema.bank_class(bank_type), Bank))
@@ -0,0 +1,59 @@
+import os
+import unittest
+from datetime import date
+from tempfile import TemporaryDirectory
+
+from ynab.api import TransactionStore
+from ynab.dedup import PushedImportIds
+
+
+class TestPushedImportIds(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "pushed.json")
+        self.store = TransactionStore()
+        for day in [1, 2, 3]:
+            self.store.append(date(2019, 1, day), "shop", "memo", -1.5)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unpushed(self):
+        pushed = PushedImportIds(self.path)
+        self.assertIs(pushed.unpushed("a", self.store), self.store)
+
+        pushed.record_pushed("a", self.store.transactions[:2])
+
+        unpushed = pushed.unpushed("a", self.store)
+        self.assertEqual(list(unpushed.transactions), [self.store.transactions[2]])
+        self.assertEqual(pushed.unpushed("b", self.store).count(), 3)
+
+    def test_persisted(self):
+        PushedImportIds(self.path).record_pushed("a", self.store.transactions)
+
+        self.assertEqual(
+            PushedImportIds(self.path).unpushed("a", self.store).count(),
+            0,
+        )
+
+    def test_ids_before_the_download_are_forgotten(self):
+        pushed = PushedImportIds(self.path)
+        pushed.record_pushed("a", self.store.transactions)
+        pushed.record_pushed("b", self.store.transactions)
+
+        later = TransactionStore(self.store.transactions[2:])
+        self.assertEqual(pushed.unpushed("a", later).count(), 0)
+        pushed.save()
+
+        self.assertEqual(
+            PushedImportIds(self.path).import_ids["a"],
+            {"YNAB:-1500:2019-01-03:1": "2019-01-03"},
+        )
+        self.assertEqual(len(PushedImportIds(self.path).import_ids["b"]), 3)
+
+    def test_corrupt_file_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as file:
+            file.write("{")
+
+        self.assertEqual(PushedImportIds(self.path).import_ids, {})
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+import unittest
+from tempfile import TemporaryDirectory
+
+from mock import patch
+
+from ynab import fileutils
+
+
+def _download(dir, name, delay, chunks=3):
+    """ Writes a file the way Chrome does, into a partial file that is renamed once
+    complete """
+    time.sleep(delay)
+    partial = os.path.join(dir, name + ".crdownload")
+    with open(partial, "w") as file:
+        for _ in range(chunks):
+            file.write("some data\n")
+            file.flush()
+            time.sleep(0.05)
+    os.rename(partial, os.path.join(dir, name))
+
+
+class TestWaitForFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.dir = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _start_download(self, name, delay=0.1, chunks=3):
+        thread = threading.Thread(
+            target=_download, args=(self.dir, name, delay, chunks)
+        )
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def test_waits_for_complete_file(self):
+        self._start_download("export.csv")
+        (path,) = fileutils.wait_for_file(self.dir, ".csv")
+        self.assertEqual(path, os.path.join(self.dir, "export.csv"))
+        with open(path) as file:
+            self.assertEqual(file.read(), "some data\n" * 3)
+        self.assertGreater(fileutils.wait_seconds(self.dir), 0)
+
+    def test_prefix(self):
+        self._start_download("other.qif")
+        self._start_download("5253_statement.qif", delay=0.2)
+        (path,) = fileutils.wait_for_file_with_prefix(self.dir, ".qif", "5253")
+        self.assertEqual(path, os.path.join(self.dir, "5253_statement.qif"))
+
+    def test_waits_for_count_files(self):
+        self._start_download("5253_1.qif", delay=0.05)
+        # still partial for a second, long after the first one is complete
+        self._start_download("5253_2.qif", delay=0.05, chunks=20)
+        paths = fileutils.wait_for_file_with_prefix(self.dir, ".qif", "5253", count=2)
+        self.assertEqual(
+            paths, [os.path.join(self.dir, n) for n in ["5253_1.qif", "5253_2.qif"]]
+        )
+
+    def test_empty_file_is_not_complete(self):
+        open(os.path.join(self.dir, "export.csv"), "w").close()
+        with patch.object(fileutils, "_WAIT_FOR_FILE_DOWNLOAD_SECONDS", 0.5):
+            with self.assertRaises(TimeoutError):
+                fileutils.wait_for_file(self.dir, ".csv")
+
+    @patch.object(fileutils, "_InotifyWatcher", side_effect=OSError)
+    def test_polling_fallback(self, _):
+        self._start_download("export.ofx")
+        (path,) = fileutils.wait_for_file(self.dir, ".ofx")
+        self.assertEqual(path, os.path.join(self.dir, "export.ofx"))
+
+    def test_timeout(self):
+        with patch.object(fileutils, "_WAIT_FOR_FILE_DOWNLOAD_SECONDS", 0.2):
+            with self.assertRaises(TimeoutError):
+                fileutils.wait_for_file(self.dir, ".csv")
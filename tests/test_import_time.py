@@ -0,0 +1,26 @@
+import unittest
+
+from benchmarks.bench_import_time import (
+    IMPORT_TIME_BUDGET_SECONDS,
+    heavy_modules,
+    import_times,
+)
+
+
+class TestImportTime(unittest.TestCase):
+    """Tests that starting the command line tool stays fast"""
+
+    def test_version_imports_no_heavy_modules(self):
+        times = import_times("import ynab.main; ynab.main.main(['--version'])")
+        self.assertEqual([], heavy_modules(times))
+
+    def test_import_within_budget(self):
+        # the best of a few runs, as a busy machine only ever makes an import slower
+        seconds = min(import_times()["ynab.main"] for _ in range(3))
+        self.assertLess(seconds, IMPORT_TIME_BUDGET_SECONDS)
+
+    def test_bank_modules_import_heavy_modules(self):
+        times = import_times(
+            "from ynab import config_schema; config_schema.bank_class('dkb')"
+        )
+        self.assertIn("selenium", heavy_modules(times))
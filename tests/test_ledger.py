@@ -0,0 +1,72 @@
+import unittest
+from datetime import date
+
+from ynab.api import TransactionStore
+from ynab.ledger import Ledger
+
+
+class TestLedger(unittest.TestCase):
+    def setUp(self):
+        self.ledger = Ledger(":memory:")
+        self.store = TransactionStore()
+        for day, amount in [(3, -1.5), (1, -2.0), (2, 4.0), (1, -2.0)]:
+            self.store.append(date(2019, 1, day), "shop", "memo", amount)
+
+    def tearDown(self):
+        self.ledger.close()
+
+    def test_pushed_between(self):
+        self.ledger.record_pushed("a", self.store.transactions)
+        self.ledger.record_pushed("b", self.store.transactions[:1])
+
+        in_range = self.ledger.pushed("a").between(date(2019, 1, 1), date(2019, 1, 2))
+        self.assertEqual(
+            list(in_range.transactions),
+            [self.store.transactions[i] for i in [1, 3, 2]],
+        )
+        self.assertEqual(
+            self.ledger.pushed("b").import_ids(date(2019, 1, 1), date(2019, 1, 31)),
+            {"YNAB:-1500:2019-01-03:1"},
+        )
+        self.assertEqual(
+            self.ledger.fetched("a").between(date(2019, 1, 1), date.max).count(), 0
+        )
+
+    def test_record_pushed_twice(self):
+        self.ledger.record_pushed("a", self.store.transactions)
+        self.ledger.record_pushed("a", self.store.transactions)
+
+        self.assertEqual(
+            self.ledger.pushed("a").between(date(2019, 1, 1), date.max).count(), 4
+        )
+
+    def test_unpushed(self):
+        self.ledger.record_pushed("a", self.store.transactions[:2])
+
+        unpushed = self.ledger.unpushed("a", self.store)
+        self.assertEqual(list(unpushed.transactions), list(self.store.transactions[2:]))
+        self.assertEqual(self.ledger.unpushed("b", self.store).count(), 4)
+        empty = TransactionStore()
+        self.assertIs(self.ledger.unpushed("a", empty), empty)
+
+    def test_record_fetched_replaces_since_date(self):
+        self.ledger.record_fetched("a", self.store.transactions, date(2019, 1, 1))
+        self.ledger.record_fetched("a", self.store.transactions[:1], date(2019, 1, 2))
+
+        fetched = self.ledger.fetched("a").between(date(2019, 1, 1), date.max)
+        self.assertEqual(
+            [(t.date.day, t.milliunit_amount) for t in fetched.transactions],
+            [(1, -2000), (1, -2000), (3, -1500)],
+        )
+
+    def test_record_fetched_keyed_by_ynab_id(self):
+        fetched = TransactionStore()
+        fetched.extend(
+            [(date(2019, 1, 1), "shop", "memo", -2000)] * 2, ["ynab-1", "ynab-2"]
+        )
+        self.ledger.record_fetched("a", fetched.transactions, date(2019, 1, 1))
+
+        self.assertEqual(
+            self.ledger.fetched("a").import_ids(date(2019, 1, 1), date.max),
+            {"ynab-1", "ynab-2"},
+        )
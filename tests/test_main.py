@@ -1,12 +1,20 @@
+import io
+import os
 import unittest
-from tempfile import NamedTemporaryFile
+from contextlib import redirect_stdout
+from datetime import date
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 
 import yaml
-from mock import patch
+from mock import MagicMock, patch
 from schema import SchemaError
+from selenium.common.exceptions import WebDriverException
 
 from tests.test_config_schema import PATH_TO_TEST_CONFIG
-from ynab import main
+from ynab import config_schema, main
+from ynab.api import YNAB, TransactionStore
+from ynab.bank import Bank
+from ynab.chrome import Traffic
 
 
 def Any(cls):
@@ -22,28 +30,221 @@ class MockSchemaError(SchemaError):
         SchemaError.__init__(self, None)
 
 
+def _fake_chrome(*args):
+    driver = MagicMock()
+    driver.traffic.return_value = Traffic(3 * 2 ** 20, 2, 1.5)
+    driver.steps = [("element login", 0.25), ("clickable submit", 0.5)]
+    return driver
+
+
+class FakeBank(Bank):
+    full_name = "Fake Bank"
+
+    def __init__(self, config, secrets):
+        super().__init__(secrets)
+        self.amount = config["amount"]
+        self.full_name = f"Fake Bank {self.amount}"
+
+    def fetch_transactions(self, driver, transaction_store, dir):
+        if self.amount is None:
+            raise RuntimeError("Bank is down")
+        transaction_store.append(date.today(), "payee", "memo", self.amount)
+        print(f"Fetched from {self.full_name}", file=self.log)
+
+
+def _fake_bank_config(account_id, amount):
+    return {
+        "type": "natwest",
+        "amount": amount,
+        "target": {"budget_id": "budget_id", "account_id": account_id},
+    }
+
+
 class TestMain(unittest.TestCase):
     @staticmethod
     def _run_main_with_no_banks(extra_config={}):
+        TestMain._run_main({"banks": [], **extra_config})
+
+    @staticmethod
+    def _run_main(config_changes, args=()):
+        """ Returns the exit code of main """
         with open(PATH_TO_TEST_CONFIG) as f:
-            no_bank_config = yaml.safe_load(f)
-        no_bank_config["banks"] = []
-        no_bank_config.update(extra_config)
+            config = yaml.safe_load(f)
+        config.update(config_changes)
 
         with NamedTemporaryFile("w") as f:
-            yaml.dump(no_bank_config, stream=f)
+            yaml.dump(config, stream=f)
             f.flush()
             with patch("keyring.get_password"):
-                main.main([f.name])
+                return main.main([f.name, *args])
 
     def test_no_banks_is_a_no_op(self):
         self._run_main_with_no_banks()
 
+    @patch("sys.stderr", MagicMock())
+    def test_parallel_must_be_positive(self):
+        for value in ["0", "-1"]:
+            with self.subTest(value=value), self.assertRaises(SystemExit):
+                main._parse_arguments(["--parallel", value])
+        self.assertEqual(main._parse_arguments(["--parallel", "2"]).parallel, 2)
+
     @patch("ynab.config_schema.parse_config", side_effect=MockSchemaError)
     def test_schema_error_aborts_main(self, _):
         with self.assertRaises(SchemaError):
             self._run_main_with_no_banks()
 
+    @patch("ynab.chrome.Chrome.construct", MagicMock(side_effect=_fake_chrome))
+    @patch.dict(config_schema.BANKS, {"natwest": FakeBank})
+    @patch("ynab.transactions.pretty_format_transactions")
+    @patch.object(YNAB, "get_budget")
+    @patch.object(YNAB, "push")
+    def test_budget_fetched_once_for_all_banks(self, push, get_budget, pretty_format):
+        on_ynab = TransactionStore()
+        on_ynab.append(date.today(), "payee", "memo", -1)
+        get_budget.return_value = {"a": on_ynab}
+        banks = [_fake_bank_config("a", -1), _fake_bank_config("b", -2)]
+
+        with TemporaryDirectory() as directory:
+            with patch.object(main, "TEMPORARY_DIRECTORY_PARENT", directory):
+                self._run_main({"banks": banks})
+
+        self.assertEqual(push.call_count, 2)
+        get_budget.assert_called_once_with("budget_id", None)
+        # only the transaction of the second bank is missing from YNAB
+        (missing,), _ = pretty_format.call_args
+        self.assertEqual([t.milliunit_amount for t in missing], [-2000])
+
+    @patch("ynab.chrome.Chrome.construct", MagicMock(side_effect=_fake_chrome))
+    @patch.dict(config_schema.BANKS, {"natwest": FakeBank})
+    @patch.object(YNAB, "get_budget", MagicMock(return_value={}))
+    @patch.object(YNAB, "push")
+    def test_parallel_failures_are_isolated(self, push):
+        amounts = [1, None, 3]
+        banks = [_fake_bank_config(str(i), amount) for i, amount in enumerate(amounts)]
+        output = io.StringIO()
+
+        with TemporaryDirectory() as directory, redirect_stdout(output):
+            with patch.object(main, "TEMPORARY_DIRECTORY_PARENT", directory):
+                exit_code = self._run_main({"banks": banks}, ["--parallel", "3"])
+
+        self.assertEqual(exit_code, 1)
+        pushed_account_ids = [c.args[1] for c in push.call_args_list]
+        self.assertEqual(pushed_account_ids, ["0", "2"])
+        lines = output.getvalue().splitlines()
+        downloads = [line for line in lines if line.startswith("Downloading")]
+        self.assertEqual(
+            downloads,
+            [
+                "Downloading transactions from Fake Bank 1",
+                "Downloading transactions from Fake Bank None",
+                "Downloading transactions from Fake Bank 3",
+            ],
+        )
+        self.assertIn("RuntimeError: Bank is down", lines)
+        # what each bank reports is kept with the rest of its output
+        self.assertEqual(
+            lines.index("Fetched from Fake Bank 3"),
+            lines.index("Downloading transactions from Fake Bank 3") + 1,
+        )
+        self.assertIn("Skipping mismatch check for Fake Bank None as it failed", lines)
+        # the traffic of each bank that downloaded is reported
+        traffic = "Transferred 3.00 MiB in 2 page loads taking 1.5s"
+        self.assertEqual(lines.count(traffic), 2)
+        self.assertEqual(lines.count("Waited 0.8s in 2 steps:"), 2)
+        self.assertEqual(lines.count("    0.50s clickable submit"), 2)
+
+    @patch("ynab.chrome.Chrome.construct", MagicMock(side_effect=_fake_chrome))
+    @patch.dict(config_schema.BANKS, {"natwest": FakeBank})
+    @patch("ynab.transactions.pretty_format_transactions", MagicMock())
+    @patch.object(YNAB, "get_budget", MagicMock(return_value={}))
+    @patch.object(YNAB, "push")
+    def test_ledger_skips_already_pushed(self, push):
+        banks = [_fake_bank_config("a", -1)]
+
+        with TemporaryDirectory() as directory:
+            ledger = os.path.join(directory, "ledger.sqlite")
+            with patch.object(main, "TEMPORARY_DIRECTORY_PARENT", directory):
+                for _ in range(2):
+                    self._run_main({"banks": banks}, ["--ledger", ledger])
+
+        self.assertEqual(push.call_count, 1)
+        (store, account_id, _), _ = push.call_args
+        self.assertEqual((store.count(), account_id), (1, "a"))
+
+    @patch("ynab.chrome.Chrome.construct", MagicMock(side_effect=_fake_chrome))
+    @patch.dict(config_schema.BANKS, {"natwest": FakeBank})
+    @patch("ynab.transactions.pretty_format_transactions", MagicMock())
+    @patch.object(YNAB, "get_budget", MagicMock(return_value={}))
+    @patch.object(YNAB, "push")
+    def test_pushed_ids_suppresses_already_pushed(self, push):
+        banks = [_fake_bank_config("a", -1), _fake_bank_config("b", -2)]
+        output = io.StringIO()
+
+        with TemporaryDirectory() as directory, redirect_stdout(output):
+            args = ["--pushed-ids", os.path.join(directory, "pushed.json")]
+            with patch.object(main, "TEMPORARY_DIRECTORY_PARENT", directory):
+                self._run_main({"banks": banks[:1]}, args)
+                self._run_main({"banks": banks}, args)
+
+        self.assertEqual([c.args[1] for c in push.call_args_list], ["a", "b"])
+        lines = output.getvalue().splitlines()
+        self.assertIn("Suppressed 1 transactions that were already pushed", lines)
+
+
+class TestDownload(unittest.TestCase):
+    def _download(self, fetched_over_http):
+        bank = MagicMock(supports_http=True, full_name="Fake Bank")
+        if isinstance(fetched_over_http, Exception):
+            bank.fetch_transactions_http.side_effect = fetched_over_http
+        else:
+            bank.fetch_transactions_http.return_value = fetched_over_http
+        browser_pool = MagicMock()
+        browser_pool.acquire.side_effect = _fake_chrome
+        with TemporaryDirectory() as directory:
+            with patch.object(main, "TEMPORARY_DIRECTORY_PARENT", directory):
+                download = main._download(
+                    main.Target(bank, "budget", "account"),
+                    browser_pool,
+                    no_cleanup=False,
+                    http_adapter=MagicMock(),
+                )
+        self.assertIsNone(download.error)
+        return bank, browser_pool
+
+    def test_fetched_over_http_without_browser(self):
+        bank, browser_pool = self._download(fetched_over_http=True)
+        browser_pool.acquire.assert_not_called()
+        bank.fetch_transactions.assert_not_called()
+
+    def test_falls_back_to_browser(self):
+        bank, browser_pool = self._download(fetched_over_http=False)
+        browser_pool.acquire.assert_called_once()
+        bank.fetch_transactions.assert_called_once()
+
+    def test_falls_back_to_browser_if_http_export_is_not_one(self):
+        bank, browser_pool = self._download(
+            fetched_over_http=ValueError("Expected 'Kreditkarte' or 'Kontonummer'")
+        )
+        browser_pool.acquire.assert_called_once()
+        bank.fetch_transactions.assert_called_once()
+
+    def test_browser_that_fails_to_start_is_reported(self):
+        bank = MagicMock(supports_http=False, full_name="Fake Bank")
+        browser_pool = MagicMock()
+        browser_pool.acquire.side_effect = WebDriverException("chrome not found")
+        with TemporaryDirectory() as directory:
+            with patch.object(main, "TEMPORARY_DIRECTORY_PARENT", directory):
+                download = main._download(
+                    main.Target(bank, "budget", "account"),
+                    browser_pool,
+                    no_cleanup=False,
+                    http_adapter=MagicMock(),
+                )
+
+        self.assertIn("chrome not found", download.log)
+        bank.fetch_transactions.assert_not_called()
+        browser_pool.release.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,136 @@
+import io
+import os
+import unittest
+from datetime import date
+from importlib.resources import path
+from tempfile import TemporaryDirectory
+
+from mock import patch
+
+from tests.banks import data
+from ynab import ofx, statements
+from ynab.api import TransactionStore
+from ynab.ofx import (
+    OfxTransaction,
+    add_transactions_from_ofx,
+    import_id,
+    parse_milliunits,
+    read_transactions,
+)
+
+
+class TestReadTransactions(unittest.TestCase):
+    def test_sgml(self):
+        with path(data, "natwest_example.ofx") as p:
+            transactions = list(read_transactions(p))
+
+        self.assertEqual(
+            transactions,
+            [
+                OfxTransaction(
+                    date=date(2019, 5, 6),
+                    payee_name="TESCO STORES 2431",
+                    memo="CARD PAYMENT & CASHBACK",
+                    milliunit_amount=-28200,
+                    fitid="20190506N1",
+                ),
+                OfxTransaction(
+                    date=date(2019, 5, 2),
+                    payee_name="ACME LTD SALARY",
+                    memo="",
+                    milliunit_amount=1250000,
+                    fitid="20190502N1",
+                ),
+            ],
+        )
+
+    def test_xml(self):
+        with path(data, "amex_example.qfx") as p:
+            transactions = list(read_transactions(p))
+
+        self.assertEqual(
+            [(t.date, t.payee_name, t.memo, t.milliunit_amount) for t in transactions],
+            [
+                (date(2019, 5, 3), "CAFÉ NERO", "LONDON", -45000),
+                (date(2019, 5, 4), "PAYMENT RECEIVED - THANK YOU", "", 1500),
+            ],
+        )
+
+    def test_tags_split_across_chunks(self):
+        for name in ["natwest_example.ofx", "amex_example.qfx"]:
+            with path(data, name) as p:
+                expected = list(read_transactions(p))
+                for size in [1, 2, 7, 100]:
+                    with self.subTest(name=name, size=size), patch.object(
+                        ofx, "READ_CHUNK_CHARACTERS", size
+                    ):
+                        self.assertEqual(list(read_transactions(p)), expected)
+
+    def test_missing_amount(self):
+        with path(data, "natwest_example.ofx") as p:
+            original = p.read_text()
+        with TemporaryDirectory() as directory:
+            broken = os.path.join(directory, "broken.ofx")
+            with open(broken, "w") as file:
+                file.write(original.replace("<TRNAMT>-28.20", ""))
+            with self.assertRaises(ValueError):
+                list(read_transactions(broken))
+
+
+class TestAddTransactionsFromOfx(unittest.TestCase):
+    def test_import_ids_from_fitids(self):
+        store = TransactionStore()
+
+        with path(data, "amex_example.qfx") as p:
+            add_transactions_from_ofx(p, store)
+
+        self.assertEqual(
+            [t.import_id for t in store.transactions],
+            [
+                import_id("AT191230047000010034567891234567891234"),
+                "OFX:AT191240047000010034",
+            ],
+        )
+
+    def test_skips_future_dates(self):
+        store = TransactionStore()
+        log = io.StringIO()
+
+        with patch.object(statements, "date") as mock_date:
+            mock_date.side_effect = date
+            mock_date.today.return_value = date(2019, 5, 3)
+            with path(data, "natwest_example.ofx") as p:
+                add_transactions_from_ofx(p, store, log)
+
+        self.assertIn("Skipping because it is in the future", log.getvalue())
+
+        self.assertEqual(
+            [t.payee_name for t in store.transactions], ["ACME LTD SALARY"]
+        )
+
+
+class TestImportId(unittest.TestCase):
+    def test_short_fitid(self):
+        self.assertEqual(import_id("20190506N1"), "OFX:20190506N1")
+
+    def test_long_fitid_is_hashed(self):
+        fitid = "AT191230047000010034567891234567891234"
+        self.assertEqual(len(import_id(fitid)), ofx.CHARACTER_LIMIT_FOR_IMPORT_ID)
+        self.assertEqual(import_id(fitid), import_id(fitid))
+        self.assertNotEqual(import_id(fitid), import_id(fitid + "5"))
+
+
+class TestParseMilliunits(unittest.TestCase):
+    def test_parse(self):
+        cases = {
+            "-28.20": -28200,
+            "1250.00": 1250000,
+            "1.5": 1500,
+            "-0.05": -50,
+            " 3 ": 3000,
+            "+7,25": 7250,
+            "0.0015": 2,
+        }
+        for string, expected in cases.items():
+            with self.subTest(string=string):
+                self.assertEqual(parse_milliunits(string), expected)
@@ -0,0 +1,99 @@
+import io
+import os
+import unittest
+from datetime import date
+from importlib.resources import path
+from tempfile import TemporaryDirectory
+
+from mock import patch
+
+from tests.banks import data
+from ynab import statements
+from ynab.api import TransactionStore
+from ynab.qif import (
+    QifRecord,
+    add_transactions_from_qif,
+    invert,
+    read_records,
+)
+
+
+class TestReadRecords(unittest.TestCase):
+    def test_read(self):
+        with path(data, "halifax_example.qif") as p:
+            records = list(read_records(p))
+
+        self.assertEqual(
+            records,
+            [
+                QifRecord(date(2019, 5, 3), "REISEBANK FRANKFURT ATM", "", 45000),
+                QifRecord(date(2019, 5, 3), "THE SHOP LONDON", "Ref 1234", -1001500),
+                QifRecord(date(2019, 4, 29), "PAYMENT RECEIVED", "", -250000),
+            ],
+        )
+
+    def test_last_record_without_terminator(self):
+        with TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "statement.qif")
+            with open(filepath, "w") as file:
+                file.write("!Type:Bank\nD01/02/2019\nT-3.00\n^\nD02/02/2019\nT4\n")
+            records = list(read_records(filepath))
+
+        self.assertEqual(
+            [(r.date.day, r.milliunit_amount) for r in records], [(1, -3000), (2, 4000)]
+        )
+
+    def test_date_format(self):
+        with TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "statement.qif")
+            with open(filepath, "w") as file:
+                file.write("D02/01/2019\nT1\n^\n")
+            (record,) = read_records(filepath, date_format="%m/%d/%Y")
+
+        self.assertEqual(record.date, date(2019, 2, 1))
+
+    def test_missing_amount(self):
+        with TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "statement.qif")
+            with open(filepath, "w") as file:
+                file.write("D01/02/2019\nPSHOP\n^\n")
+            with self.assertRaises(ValueError):
+                list(read_records(filepath))
+
+
+class TestInvert(unittest.TestCase):
+    def test_invert(self):
+        records = [QifRecord(date(2019, 1, 1), "", "", amount) for amount in [5, -7]]
+        self.assertEqual([r.milliunit_amount for r in invert(records)], [-5, 7])
+
+
+class TestAddTransactionsFromQif(unittest.TestCase):
+    def test_inverted(self):
+        store = TransactionStore()
+
+        with path(data, "halifax_example.qif") as p:
+            add_transactions_from_qif(p, store, invert_amounts=True)
+
+        self.assertEqual(
+            [(t.milliunit_amount, t.import_id) for t in store.transactions],
+            [
+                (-45000, "YNAB:-45000:2019-05-03:1"),
+                (1001500, "YNAB:1001500:2019-05-03:1"),
+                (250000, "YNAB:250000:2019-04-29:1"),
+            ],
+        )
+
+    def test_skips_future_dates(self):
+        store = TransactionStore()
+        log = io.StringIO()
+
+        with patch.object(statements, "date") as mock_date:
+            mock_date.today.return_value = date(2019, 5, 1)
+            with path(data, "halifax_example.qif") as p:
+                add_transactions_from_qif(p, store, log=log)
+
+        self.assertIn("Skipping because it is in the future", log.getvalue())
+
+        self.assertEqual(
+            [t.payee_name for t in store.transactions], ["PAYMENT RECEIVED"]
+        )
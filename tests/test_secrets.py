@@ -46,6 +46,20 @@ class TestKering(unittest.TestCase):
         secrets = self.call_get_secrets_from_keyring(SECRETS_KEYS_CONFIG)
         self.assertEqual(SECRETS, secrets)
 
+    @patch("keyring.set_password")
+    @patch("keyring.get_password")
+    def test_get_or_create_secret(self, get_password, set_password):
+        get_password.side_effect = lambda service_name, username: (
+            None if service_name == "foo" else SECRET_VALUE1
+        )
+        keyring = Keyring(USERNAME)
+        self.assertEqual(
+            SECRET_VALUE1, keyring.get_or_create_secret(SECRET_KEY1, lambda: "new")
+        )
+        set_password.assert_not_called()
+        self.assertEqual("new", keyring.get_or_create_secret("foo", lambda: "new"))
+        set_password.assert_called_once_with("foo", USERNAME, "new")
+
     # Helpers ##########################################################################
 
     def call_get_secrets_from_keyring(self, secrets):
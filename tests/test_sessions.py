@@ -0,0 +1,76 @@
+import os
+import stat
+import time
+import unittest
+from tempfile import TemporaryDirectory
+
+from cryptography.fernet import Fernet
+from mock import patch
+
+from ynab.secrets import Keyring
+from ynab.sessions import SESSION_KEY_SERVICE, SessionStore
+
+SESSION = {
+    "cookies": [{"name": "sid", "value": "abc", "domain": ".dkb.de", "path": "/"}],
+    "origin": "https://www.dkb.de",
+    "local_storage": {"token": "xyz"},
+}
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = TemporaryDirectory()
+        self.directory = os.path.join(self._directory.name, "sessions")
+        self.key = Fernet.generate_key()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_save_and_load(self):
+        SessionStore(self.directory, self.key).save("DKB:user", SESSION)
+        loaded = SessionStore(self.directory, self.key).load("DKB:user")
+        self.assertEqual(SESSION, loaded)
+
+    def test_missing_session(self):
+        self.assertIsNone(SessionStore(self.directory, self.key).load("DKB:user"))
+
+    def test_encrypted_and_private(self):
+        SessionStore(self.directory, self.key).save("DKB:user", SESSION)
+        (filename,) = os.listdir(self.directory)
+        self.assertNotIn("user", filename)
+        path = os.path.join(self.directory, filename)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+        with open(path, "rb") as file:
+            self.assertNotIn(b"abc", file.read())
+
+    def test_other_key_cannot_load(self):
+        SessionStore(self.directory, self.key).save("DKB:user", SESSION)
+        store = SessionStore(self.directory, Fernet.generate_key())
+        self.assertIsNone(store.load("DKB:user"))
+
+    def test_expired_session(self):
+        store = SessionStore(self.directory, self.key, max_age_seconds=3600)
+        store.save("DKB:user", SESSION)
+        with patch("time.time", return_value=time.time() + 3601):
+            self.assertIsNone(store.load("DKB:user"))
+
+    def test_delete(self):
+        store = SessionStore(self.directory, self.key)
+        store.save("DKB:user", SESSION)
+        store.delete("DKB:user")
+        store.delete("DKB:user")
+        self.assertIsNone(store.load("DKB:user"))
+
+    @patch("keyring.set_password")
+    @patch("keyring.get_password")
+    def test_key_created_once_in_keyring(self, get_password, set_password):
+        saved = {}
+        get_password.side_effect = lambda service, user: saved.get((service, user))
+        set_password.side_effect = lambda s, u, value: saved.update({(s, u): value})
+
+        SessionStore.from_keyring(self.directory, Keyring("me")).save("a", SESSION)
+        loaded = SessionStore.from_keyring(self.directory, Keyring("me")).load("a")
+
+        self.assertEqual(SESSION, loaded)
+        self.assertEqual([(SESSION_KEY_SERVICE, "me")], list(saved))
+        set_password.assert_called_once()
@@ -0,0 +1,75 @@
+import unittest
+
+import fuzzywuzzy.process
+from mock import MagicMock
+
+from ynab.similarity import (
+    MAX_SCORE,
+    Memo,
+    MemoSimilarity,
+    normalise,
+    token_set_scorer,
+    wratio_scorer,
+)
+
+
+class TestNormalise(unittest.TestCase):
+    def test_normalise(self):
+        self.assertEqual(
+            normalise("  Coffee-Shop, LONDON "),
+            Memo(text="coffee shop  london", tokens={"coffee", "shop", "london"}),
+        )
+
+    def test_none_is_empty(self):
+        self.assertEqual(normalise(None), Memo(text="", tokens=frozenset()))
+
+
+class TestScorers(unittest.TestCase):
+    def test_token_set_scorer(self):
+        score = token_set_scorer(normalise("coffee shop"), normalise("Shop: coffee!"))
+        self.assertEqual(score, MAX_SCORE)
+        score = token_set_scorer(normalise("coffee shop"), normalise("coffee bar"))
+        self.assertEqual(score, 33)
+        self.assertEqual(token_set_scorer(normalise(""), normalise("")), 0)
+
+
+class TestMemoSimilarity(unittest.TestCase):
+    def test_same_as_extract_one(self):
+        query = "This is a sentence"
+        choices = [
+            "Something completely different",
+            "This is almost a sentence",
+            "this is almost, a sentence!",
+            "",
+        ]
+        best, _ = fuzzywuzzy.process.extractOne(query=query, choices=choices)
+        index = MemoSimilarity().best_match(query, choices)
+        self.assertEqual(index, choices.index(best))
+
+    def test_scores(self):
+        similarity = MemoSimilarity()
+        scores = similarity.scores("coffee", ["coffee", "tea", "COFFEE", ""])
+        self.assertEqual(scores[0], MAX_SCORE)
+        self.assertEqual(scores[2], MAX_SCORE)
+        self.assertEqual(scores[3], 0)
+        self.assertLess(scores[1], MAX_SCORE)
+
+    def test_first_of_equal_scores_wins(self):
+        similarity = MemoSimilarity(scorer=lambda a, b: 50)
+        self.assertEqual(similarity.best_match("coffee", ["tea", "cake", "tea"]), 0)
+
+    def test_pairs_scored_once(self):
+        scorer = MagicMock(side_effect=wratio_scorer)
+        similarity = MemoSimilarity(scorer=scorer)
+        choices = ["Coffee shop", "Coffee bar"] * 50
+        for _ in range(3):
+            similarity.scores("Coffee", choices)
+            similarity.best_match("Coffee", choices)
+        self.assertEqual(scorer.call_count, 2)
+
+    def test_cache_is_bounded(self):
+        scorer = MagicMock(return_value=0)
+        similarity = MemoSimilarity(scorer=scorer, cache_size=1)
+        similarity.scores("a", ["b", "c"])
+        similarity.scores("a", ["b", "c"])
+        self.assertEqual(scorer.call_count, 4)
@@ -0,0 +1,81 @@
+import io
+import unittest
+from datetime import date
+
+from mock import patch
+
+from ynab import statements
+from ynab.api import TransactionStore
+from ynab.statements import add_in_batches, parse_date, parse_milliunits
+
+
+class TestParseMilliunits(unittest.TestCase):
+    def test_default_separators(self):
+        cases = {
+            "-28.20": -28200,
+            "1,250.00": 1250000,
+            "1.5": 1500,
+            "-0.05": -50,
+            " 3 ": 3000,
+            "+7.25": 7250,
+            "0.0015": 2,
+            "0.0014": 1,
+        }
+        for string, expected in cases.items():
+            with self.subTest(string=string):
+                self.assertEqual(parse_milliunits(string), expected)
+
+    def test_german_separators(self):
+        cases = {
+            "-28,20": -28200,
+            "-1.234.567,89": -1234567890,
+            "3": 3000,
+            "0,0015": 2,
+        }
+        for string, expected in cases.items():
+            with self.subTest(string=string):
+                self.assertEqual(parse_milliunits(string, ".", ","), expected)
+
+
+class TestParseDate(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_date("06.05.2019", "%d.%m.%Y"), date(2019, 5, 6))
+        self.assertEqual(parse_date("20190506", "%Y%m%d"), date(2019, 5, 6))
+
+
+class TestAddInBatches(unittest.TestCase):
+    rows = [
+        (date(2019, 5, 1), "ACME", "first", -1000),
+        (date(2019, 5, 3), "ACME", "second", -2000),
+        (date(2019, 5, 2), "ACME", "third", -3000),
+    ]
+
+    def test_adds_in_batches(self):
+        store = TransactionStore()
+
+        with patch.object(store, "extend", wraps=store.extend) as extend:
+            add_in_batches(store, iter(self.rows), batch_size=2)
+
+        self.assertEqual(store.count(), 3)
+        self.assertEqual(extend.call_count, 2)
+
+    def test_skips_future_dates(self):
+        store = TransactionStore()
+        log = io.StringIO()
+
+        with patch.object(statements, "date") as mock_date:
+            mock_date.today.return_value = date(2019, 5, 2)
+            add_in_batches(store, self.rows, log=log)
+
+        self.assertEqual([t.memo for t in store.transactions], ["first", "third"])
+        self.assertIn("second", log.getvalue())
+
+    def test_with_import_ids(self):
+        store = TransactionStore()
+        rows = [row + (f"OFX:{i}",) for i, row in enumerate(self.rows)]
+
+        add_in_batches(store, rows, batch_size=2, with_import_ids=True)
+
+        self.assertEqual(
+            [t.import_id for t in store.transactions], ["OFX:0", "OFX:1", "OFX:2"]
+        )
@@ -1,8 +1,12 @@
+import random
 import unittest
 from datetime import date, timedelta
 
 import factory
+import fuzzywuzzy.process
+from mock import patch
 
+from ynab import transactions
 from ynab.api import ImportIdGenerator
 from ynab.transactions import (
     MAX_COMPARE_DAYS,
@@ -69,11 +73,111 @@ class TestTransactionsDifference(unittest.TestCase):
         with self.subTest(msg="Similar first"):
             self.assert_diff([t], [t_similar, t_different], expected)
 
+    def test_same_as_pairwise_comparison(self):
+        rng = random.Random(1)
+        memos = ["coffee", "coffee shop", "rent", "groceries", "COFFEE!", ""]
+
+        def random_transaction():
+            return TransactionFactory(
+                date=date(2019, 1, 1) + timedelta(days=rng.randrange(40)),
+                milliunit_amount=rng.choice([-1001, -1000, -999, -2000, 5000, 5002]),
+                memo=rng.choice(memos),
+            )
+
+        for _ in range(20):
+            a = [random_transaction() for _ in range(rng.randrange(30))]
+            b = [random_transaction() for _ in range(rng.randrange(30))]
+            self.assert_diff(a, b, expected=_pairwise_transactions_difference(a, b))
+
     def assert_diff(self, transactions_a, transactions_b, expected):
         diff = transactions_difference(transactions_a, transactions_b)
         self.assertEqual(diff, expected)
 
 
+class TestOptimalTransactionsDifference(unittest.TestCase):
+    def test_duplicates_respected(self):
+        t = TransactionFactory()
+        self.assert_diff([t, t], [t, t, t], expected=([], [t]))
+
+    def test_tolerances(self):
+        a = TransactionFactory(milliunit_amount=1000)
+        close = a._replace(date=a.date + timedelta(days=MAX_COMPARE_DAYS))
+        too_late = a._replace(date=a.date + timedelta(days=MAX_COMPARE_DAYS + 1))
+        too_much = a._replace(milliunit_amount=1002)
+        self.assert_diff([a], [close], expected=([], []))
+        self.assert_diff([a], [too_late], expected=([a], [too_late]))
+        self.assert_diff([a], [too_much], expected=([a], [too_much]))
+
+    def test_pairs_as_many_as_possible(self):
+        # greedily pairing b1 with its most similar memo, a2, leaves a1 unpaired
+        a1 = TransactionFactory(memo="Coffee", date=date(2019, 1, 1))
+        a2 = a1._replace(memo="Cake", date=date(2019, 1, 7))
+        b1 = a1._replace(memo="Cake", date=date(2019, 1, 4))
+        b2 = a1._replace(memo="Coffee", date=date(2019, 1, 13))
+        self.assertEqual(transactions_difference([a1, a2], [b1, b2]), ([a1], []))
+        self.assert_diff([a1, a2], [b1, b2], expected=([], []))
+
+    def test_independent_of_order(self):
+        t = TransactionFactory(memo="This is a sentence", milliunit_amount=1000)
+        t_different = t._replace(memo="Something completely different")
+        t_similar = t._replace(memo="This is almost a sentence")
+        expected = ([], [t_different])
+        self.assert_diff([t], [t_different, t_similar], expected)
+        self.assert_diff([t], [t_similar, t_different], expected)
+
+    def test_prefers_closest_date(self):
+        a = TransactionFactory(memo="Coffee", date=date(2019, 1, 10))
+        far = a._replace(date=date(2019, 1, 5))
+        near = a._replace(date=date(2019, 1, 11))
+        self.assert_diff([a], [far, near], expected=([], [far]))
+
+    def test_recurring_payment_solved_in_windows(self):
+        # a daily payment of the same amount, each booked two days later by the bank
+        start = date(2019, 1, 1)
+        a = [TransactionFactory(date=start + timedelta(days)) for days in range(30)]
+        b = [t._replace(date=t.date + timedelta(days=2)) for t in a]
+        del b[10]
+
+        expected = transactions_difference(a, b, optimal=True)
+        with patch.object(transactions, "MAX_GROUP_SIZE", 4):
+            diff = transactions_difference(a, b, optimal=True)
+
+        self.assertEqual((len(diff[0]), diff[1]), (1, []))
+        self.assertEqual(diff, expected)
+
+    def assert_diff(self, transactions_a, transactions_b, expected):
+        diff = transactions_difference(transactions_a, transactions_b, optimal=True)
+        self.assertEqual(diff, expected)
+
+
+def _pairwise_transactions_difference(transactions_a, transactions_b):
+    """ The original quadratic implementation of transactions_difference """
+
+    def equal(a, b):
+        return (
+            abs(a.milliunit_amount - b.milliunit_amount) < 2
+            and abs(a.date - b.date).days <= MAX_COMPARE_DAYS
+        )
+
+    def subtract(transactions_c, transactions_d):
+        remaining = transactions_c.copy()
+        for transaction in transactions_d:
+            candidates = [t for t in remaining if equal(t, transaction)]
+            if candidates:
+                best_matching_memo, _ = fuzzywuzzy.process.extractOne(
+                    query=transaction.memo, choices=[c.memo for c in candidates],
+                )
+                remaining.remove(
+                    next(c for c in candidates if c.memo == best_matching_memo)
+                )
+        return remaining
+
+    return (
+        subtract(transactions_a, transactions_b),
+        subtract(transactions_b, transactions_a),
+    )
+
+
 class TestPrettyFormatTransactions(unittest.TestCase):
     def test(self):
         transactions = [
@@ -1,48 +1,157 @@
 """
 Module for interacting with YouNeedABudget's API
 """
-from collections import Counter
+import json
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
 
 import requests
 from requests import Response
+from requests.adapters import HTTPAdapter
 
 from ynab.bank import ObjectWithSecrets
+from ynab.cache import TransactionCache
 from ynab.transactions import Transaction
 
 DATE_FORMAT_FOR_YNAB = "%Y-%m-%d"
 CHARACTER_LIMIT_FOR_PAYEE_NAME = 50
 CHARACTER_LIMIT_FOR_MEMO = 100
 BANK_DATE_RANGE = 30
+YNAB_API_URL = "https://api.youneedabudget.com/v1/"
+DEFAULT_CONNECTION_POOL_SIZE = 10
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_PUSH_CHUNK_SIZE = 500
+DEFAULT_PUSH_WORKERS = 4
+DEFAULT_PUSH_ATTEMPTS = 3
+PUSH_RETRY_BACKOFF_SECONDS = 1
+JSON_ROWS_PER_CHUNK = 1000
+
+# the fields of the transactions fetched from YNAB that are used, by us or the cache
+YNAB_TRANSACTION_FIELDS = (
+    "id",
+    "account_id",
+    "date",
+    "amount",
+    "payee_name",
+    "memo",
+    "deleted",
+)
+_JSON_DECODER = json.JSONDecoder()
+_TRANSACTIONS_ARRAY = re.compile(r'"transactions"\s*:\s*\[')
+_ARRAY_SEPARATOR = re.compile(r"[\s,]*")
+_SERVER_KNOWLEDGE = re.compile(r'"server_knowledge"\s*:\s*(\d+)')
+
+RequestTiming = namedtuple("RequestTiming", ["method", "url", "status_code", "seconds"])
 
 
 class ImportIdGenerator:
+    """
+    Generates import ids like YNAB:-294230:2015-12-30:2, from the amount and date of a
+    transaction and the number of transactions with that amount and date so far
+    """
+
     def __init__(self):
-        self.counter = Counter()
+        self.counter = Counter()  # (date ordinal, milliunit amount) -> occurrences
 
     def generate(self, date: datetime, milliunit_amount: int) -> str:
-        iso_date = date.strftime(DATE_FORMAT_FOR_YNAB)
-        id_without_occurence = (
-            f"YNAB:{milliunit_amount}:{iso_date}"  # e.g. "YNAB:-294230:2015-12-30"
-        )
+        ordinal = date.toordinal()
+        key = ordinal, milliunit_amount
+        occurrence = self.counter[key] + 1
+        self.counter[key] = occurrence
+        return _import_id(ordinal, milliunit_amount, occurrence)
 
-        self.counter.update([id_without_occurence])
-        occurrence = self.counter[id_without_occurence]
-        assert occurrence > 0
+    def generate_many(
+        self, dates: Sequence[date], milliunit_amounts: Sequence[int]
+    ) -> List[str]:
+        ordinals = [d.toordinal() for d in dates]
+        occurrences = self.occurrences(ordinals, milliunit_amounts)
+        return list(map(_import_id, ordinals, milliunit_amounts, occurrences))
 
-        return (
-            f"{id_without_occurence}:{occurrence}"  # e.g. "YNAB:-294230:2015-12-30:1"
-        )
+    def occurrences(
+        self, ordinals: Iterable[int], milliunit_amounts: Iterable[int]
+    ) -> List[int]:
+        """
+        Counts each of the given transactions, returning the occurrence of each. The
+        ids themselves can then be formatted later, and only if they are needed.
+        """
+        counter = self.counter
+        result = []
+        for key in zip(ordinals, milliunit_amounts):
+            occurrence = counter[key] + 1
+            counter[key] = occurrence
+            result.append(occurrence)
+        return result
+
+
+class _StringTable:
+    """
+    Interns strings so that each distinct string is stored only once and can be referred
+    to by a small integer index
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._indexes = {}
+
+    def intern(self, string: str) -> int:
+        index = self._indexes.get(string)
+        if index is None:
+            index = self._indexes[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+
+class _TransactionSequence(Sequence):
+    """
+    A read-only sequence of Transaction tuples that are only created when accessed
+    """
+
+    def __init__(self, store: "TransactionStore", rows: Sequence[int]):
+        self._store = store
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _TransactionSequence(self._store, self._rows[index])
+        return self._store._transaction(self._rows[index])
 
 
 class TransactionStore:
     """
     Transactions to be uploaded to YNAB.
+
+    Transactions are stored column-wise: amounts and dates (as ordinals) in compact
+    arrays and payees and memos interned in string tables. Transaction tuples are only
+    created when accessed through the transactions property. Generated import ids are
+    stored as their occurrence and only formatted when needed.
     """
 
     def __init__(self, transactions=None):
         self.import_id_generator = ImportIdGenerator()
-        self.transactions = transactions or []
+        self.clear()
+        for t in transactions or []:
+            self._append_row(
+                t.date.toordinal(),
+                t.payee_name,
+                t.memo,
+                t.milliunit_amount,
+                t.import_id,
+            )
+
+    @property
+    def transactions(self) -> Sequence[Transaction]:
+        return _TransactionSequence(self, range(self.count()))
 
     def append(self, transaction_date: date, payee_name: str, memo: str, amount: float):
         """
@@ -51,59 +160,306 @@ class TransactionStore:
 
         :raises ValueError: if the date is in the future
         """
-        transaction_date = date(
-            transaction_date.year, transaction_date.month, transaction_date.day
-        )
         milliunit_amount = int(round(amount, 3) * 1000)
-        transaction = Transaction(
-            date=transaction_date,
-            payee_name=payee_name[:CHARACTER_LIMIT_FOR_PAYEE_NAME],
-            memo=memo[-CHARACTER_LIMIT_FOR_MEMO:],
-            milliunit_amount=milliunit_amount,
-            import_id=self.import_id_generator.generate(
-                transaction_date, milliunit_amount
-            ),
-        )
-        if transaction_date > date.today():
+        self.extend([(transaction_date, payee_name, memo, milliunit_amount)])
+
+    def extend(
+        self,
+        rows: Iterable[Tuple[date, str, str, int]],
+        import_ids: Sequence[str] = None,
+    ):
+        """
+        Inserts a batch of (date, payee name, memo, milliunit amount) entries, as
+        append does for a single entry but with the amount already in milliunits.
+        Nothing is inserted if any of the entries is rejected. Import ids are generated
+        unless given, one per entry, by a caller with stable ids of its own.
+
+        :raises ValueError: if any of the dates is in the future
+        """
+        today = date.today().toordinal()
+        intern_payee = self._payees.intern
+        intern_memo = self._memos.intern
+        ordinals = []
+        milliunit_amounts = []
+        payee_indexes = []
+        memo_indexes = []
+        for transaction_date, payee_name, memo, milliunit_amount in rows:
+            ordinal = transaction_date.toordinal()
+            if ordinal > today:
+                raise ValueError(
+                    f"The date {transaction_date} is in the future and will be "
+                    "rejected by YNAB"
+                )
+            ordinals.append(ordinal)
+            milliunit_amounts.append(milliunit_amount)
+            payee_name = payee_name[:CHARACTER_LIMIT_FOR_PAYEE_NAME]
+            payee_indexes.append(intern_payee(payee_name))
+            memo_indexes.append(intern_memo(memo[-CHARACTER_LIMIT_FOR_MEMO:]))
+
+        if import_ids is None:
+            # only count occurrences once the whole batch is accepted, so that a
+            # rejected batch leaves the counts untouched
+            occurrences = self.import_id_generator.occurrences(
+                ordinals, milliunit_amounts
+            )
+        elif len(import_ids) != len(ordinals):
             raise ValueError(
-                f"The date {date} is in the future and will be rejected by YNAB"
+                f"Got {len(import_ids)} import ids for {len(ordinals)} rows"
             )
-        self.transactions.append(transaction)
+        else:
+            occurrences = bytes(len(ordinals))
+            start = self.count()
+            self._explicit_import_ids.update(enumerate(import_ids, start))
+        self._ordinals.extend(ordinals)
+        self._milliunit_amounts.extend(milliunit_amounts)
+        self._payee_indexes.extend(payee_indexes)
+        self._memo_indexes.extend(memo_indexes)
+        self._occurrences.extend(occurrences)
+        self._by_date = None
 
     def json(self, account_id: str):
         """
         All entries as a nested list/dictionary ready to be sent to the YNAB endpoint.
         """
-        return {
-            "transactions": [
-                {
-                    "account_id": account_id,
-                    "date": t.date.strftime(DATE_FORMAT_FOR_YNAB),
-                    "amount": t.milliunit_amount,
-                    # "payee_id": None,
-                    "payee_name": t.payee_name,
-                    # "category_id": None,
-                    "memo": t.memo,
-                    "cleared": "cleared",
-                    # "approved": False,
-                    # "flag_color": "red",
-                    "import_id": t.import_id,
-                }
-                for t in self.transactions
-            ]
-        }
+        return _json(self, range(self.count()), account_id)
+
+    def iter_json(self, account_id: str) -> Iterator[bytes]:
+        """
+        All entries serialised as by json, but as a series of encoded chunks that can
+        be sent as a streamed request body without building the whole document
+        """
+        return _iter_json(self, range(self.count()), account_id)
+
+    def chunks(self, size: int) -> Iterator["TransactionSlice"]:
+        """
+        Splits the transactions, in the order they were added, into slices of at most
+        the given size
+        """
+        for start in range(0, self.count(), size):
+            yield TransactionSlice(self, range(start, min(start + size, self.count())))
+
+    def between(self, start: date, end: date) -> "TransactionSlice":
+        """
+        The transactions dated from start to end inclusive, in date order. The slice
+        shares the store's data rather than copying it.
+        """
+        rows, ordinals = self._sorted_by_date()
+        lo = bisect_left(ordinals, start.toordinal())
+        hi = bisect_right(ordinals, end.toordinal())
+        return TransactionSlice(self, memoryview(rows)[lo:hi])
 
     def clear(self):
-        self.transactions = []
+        self._ordinals = array("l")
+        self._milliunit_amounts = array("q")
+        self._payee_indexes = array("L")
+        self._memo_indexes = array("L")
+        self._occurrences = array("L")  # 0 if the import id was given explicitly
+        self._explicit_import_ids = {}  # row -> import id
+        self._payees = _StringTable()
+        self._memos = _StringTable()
+        self._by_date = None
+
+    def count(self):
+        return len(self._ordinals)
+
+    def _append_row(self, ordinal, payee_name, memo, milliunit_amount, import_id):
+        self._ordinals.append(ordinal)
+        self._milliunit_amounts.append(milliunit_amount)
+        self._payee_indexes.append(self._payees.intern(payee_name))
+        self._memo_indexes.append(self._memos.intern(memo))
+        self._explicit_import_ids[self.count() - 1] = import_id
+        self._occurrences.append(0)
+        self._by_date = None
+
+    def _transaction(self, row: int) -> Transaction:
+        return Transaction(
+            date=date.fromordinal(self._ordinals[row]),
+            payee_name=self._payees.strings[self._payee_indexes[row]],
+            memo=self._memos.strings[self._memo_indexes[row]],
+            milliunit_amount=self._milliunit_amounts[row],
+            import_id=self._import_id(row),
+        )
+
+    def _import_id(self, row: int) -> str:
+        occurrence = self._occurrences[row]
+        if occurrence == 0:
+            return self._explicit_import_ids[row]
+        return _import_id(self._ordinals[row], self._milliunit_amounts[row], occurrence)
+
+    def _sorted_by_date(self):
+        """
+        Returns the rows in date order and their corresponding date ordinals. Fresh
+        arrays are built rather than updated in place, since slices handed out earlier
+        may still be viewing the old ones.
+        """
+        if self._by_date is None:
+            rows = sorted(range(self.count()), key=self._ordinals.__getitem__)
+            ordinals = [self._ordinals[row] for row in rows]
+            self._by_date = array("L", rows), array("l", ordinals)
+        return self._by_date
+
+
+class TransactionSlice:
+    """
+    A read-only view of some of the transactions of a TransactionStore
+    """
+
+    def __init__(self, store: TransactionStore, rows: Sequence[int]):
+        self._store = store
+        self._rows = rows
+
+    @property
+    def transactions(self) -> Sequence[Transaction]:
+        return _TransactionSequence(self._store, self._rows)
+
+    def json(self, account_id: str):
+        return _json(self._store, self._rows, account_id)
+
+    def iter_json(self, account_id: str) -> Iterator[bytes]:
+        return _iter_json(self._store, self._rows, account_id)
 
     def count(self):
-        return len(self.transactions)
+        return len(self._rows)
+
+
+def _json(store: TransactionStore, rows: Iterable[int], account_id: str):
+    ordinals = store._ordinals
+    milliunit_amounts = store._milliunit_amounts
+    payees = store._payees.strings
+    payee_indexes = store._payee_indexes
+    memos = store._memos.strings
+    memo_indexes = store._memo_indexes
+    import_id = store._import_id
+    return {
+        "transactions": [
+            {
+                "account_id": account_id,
+                "date": _iso_date(ordinals[row]),
+                "amount": milliunit_amounts[row],
+                # "payee_id": None,
+                "payee_name": payees[payee_indexes[row]],
+                # "category_id": None,
+                "memo": memos[memo_indexes[row]],
+                "cleared": "cleared",
+                # "approved": False,
+                # "flag_color": "red",
+                "import_id": import_id(row),
+            }
+            for row in rows
+        ]
+    }
+
+
+def _iter_json(store: TransactionStore, rows: Iterable[int], account_id: str):
+    """
+    Yields the JSON of _json in chunks of JSON_ROWS_PER_CHUNK transactions. Fields that
+    are the same for every transaction are encoded once, as is each distinct payee and
+    memo.
+    """
+    ordinals = store._ordinals
+    milliunit_amounts = store._milliunit_amounts
+    payee_indexes = store._payee_indexes
+    memo_indexes = store._memo_indexes
+    occurrences = store._occurrences
+    explicit_import_ids = store._explicit_import_ids
+    encoded_payees = _EncodedStrings(store._payees.strings)
+    encoded_memos = _EncodedStrings(store._memos.strings)
+    row_start = '{"account_id":' + json.dumps(account_id) + ',"date":"'
+
+    yield b'{"transactions":['
+    parts = []
+    separator = ""
+    for row in rows:
+        ordinal = ordinals[row]
+        milliunit_amount = milliunit_amounts[row]
+        occurrence = occurrences[row]
+        if occurrence:
+            import_id = f'"{_import_id(ordinal, milliunit_amount, occurrence)}"'
+        else:
+            import_id = json.dumps(explicit_import_ids[row])
+        parts.append(
+            f"{separator}{row_start}{_iso_date(ordinal)}"
+            f'","amount":{milliunit_amount}'
+            f',"payee_name":{encoded_payees[payee_indexes[row]]}'
+            f',"memo":{encoded_memos[memo_indexes[row]]}'
+            f',"cleared":"cleared","import_id":{import_id}}}'
+        )
+        separator = ","
+        if len(parts) == JSON_ROWS_PER_CHUNK:
+            yield "".join(parts).encode()
+            parts = []
+    parts.append("]}")
+    yield "".join(parts).encode()
+
+
+class _EncodedStrings(dict):
+    """
+    The strings of a string table encoded as JSON, each only when first needed
+    """
+
+    def __init__(self, strings: List[str]):
+        super().__init__()
+        self._strings = strings
+
+    def __missing__(self, index: int) -> str:
+        encoded = self[index] = json.dumps(self._strings[index])
+        return encoded
+
+
+@lru_cache(maxsize=4096)
+def _iso_date(ordinal: int) -> str:
+    return date.fromordinal(ordinal).strftime(DATE_FORMAT_FOR_YNAB)
+
+
+def _import_id(ordinal: int, milliunit_amount: int, occurrence: int) -> str:
+    return f"YNAB:{milliunit_amount}:{_iso_date(ordinal)}:{occurrence}"
+
+
+class PushResult:
+    """
+    The combined responses to pushing transactions to YNAB in several chunks
+    """
+
+    def __init__(self):
+        self.transaction_ids = []
+        self.duplicate_import_ids = []
+        self.failed_import_ids = []
+        self.errors = []
+
+    def add_response(self, response: Response):
+        bulk = response.json()["data"]["bulk"]
+        self.transaction_ids.extend(bulk["transaction_ids"])
+        self.duplicate_import_ids.extend(bulk["duplicate_import_ids"])
+
+    def add_failure(self, chunk: "TransactionSlice", error: Exception):
+        self.failed_import_ids.extend(t.import_id for t in chunk.transactions)
+        self.errors.append(error)
+
+    def json(self):
+        return {
+            "transaction_ids": self.transaction_ids,
+            "duplicate_import_ids": self.duplicate_import_ids,
+            "failed_import_ids": self.failed_import_ids,
+            "errors": [str(e) for e in self.errors],
+        }
 
 
 class YNAB(ObjectWithSecrets):
-    def __init__(self, _, secrets):
+    """
+    A client for the YNAB API. Requests share a pooled, keep-alive requests.Session and
+    the time taken by each is recorded in the timings attribute.
+    """
+
+    def __init__(self, config, secrets):
         super().__init__(secrets)
         self.validate_secrets("access_token")
+        config = config or {}
+        self.url = config.get("url", YNAB_API_URL)
+        self.timeout = config.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS)
+        self.timings = []
+        self.session = self._create_session(
+            config.get("connection_pool_size", DEFAULT_CONNECTION_POOL_SIZE)
+        )
 
     def push(
         self, transaction_store: TransactionStore, account_id: str, budget_id: str
@@ -116,37 +472,196 @@ class YNAB(ObjectWithSecrets):
         :return: response from the YNAB API
         """
         url = self._url(f"/budgets/{budget_id}/transactions/bulk")
-        payload = transaction_store.json(account_id)
-        response = requests.post(url, json=payload, headers=self._request_headers())
-        response.raise_for_status()
-        return response
+        return self._request(
+            "POST",
+            url,
+            data=transaction_store.iter_json(account_id),
+            headers={"Content-Type": "application/json"},
+        )
 
-    def get(self, account_id: str, budget_id: str) -> TransactionStore:
-        transaction_store = TransactionStore()
+    def push_in_chunks(
+        self,
+        transaction_store: TransactionStore,
+        account_id: str,
+        budget_id: str,
+        chunk_size: int = DEFAULT_PUSH_CHUNK_SIZE,
+        max_workers: int = DEFAULT_PUSH_WORKERS,
+        attempts: int = DEFAULT_PUSH_ATTEMPTS,
+    ) -> PushResult:
+        """
+        Pushes transactions to YNAB in chunks of at most chunk_size, using up to
+        max_workers concurrent requests. Each chunk's payload is only built when it is
+        about to be sent. A chunk that fails with a connection error, a timeout, a rate
+        limit or a server error is retried on its own, up to attempts times in total.
+
+        :return: the aggregated responses, including any chunks that could not be
+            pushed
+        """
+        url = self._url(f"/budgets/{budget_id}/transactions/bulk")
+        result = PushResult()
+
+        def push_chunk(chunk):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return self._request("POST", url, json=chunk.json(account_id))
+                except requests.RequestException as e:
+                    if attempt == attempts or not _is_retryable(e):
+                        return e
+                    time.sleep(PUSH_RETRY_BACKOFF_SECONDS * attempt)
+
+        chunks = list(transaction_store.chunks(chunk_size))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk, outcome in zip(chunks, executor.map(push_chunk, chunks)):
+                if isinstance(outcome, Exception):
+                    result.add_failure(chunk, outcome)
+                else:
+                    result.add_response(outcome)
+        return result
+
+    def get(
+        self, account_id: str, budget_id: str, cache_directory: str = None
+    ) -> TransactionStore:
+        """
+        Fetches the account's transactions from the last BANK_DATE_RANGE days, with
+        their YNAB transaction ids in place of import ids.
+
+        If a cache directory is given, the transactions and YNAB's server_knowledge
+        are cached there, and later calls only fetch what has changed since.
+        """
         url = self._url(f"/budgets/{budget_id}/accounts/{account_id}/transactions")
+        cache_name = f"{budget_id}_{account_id}.json"
+        transaction_store = TransactionStore()
+        transactions = self._fetch(url, cache_directory, cache_name)
+        transaction_store.extend(_rows_from_ynab(transactions), _ids(transactions))
+        return transaction_store
+
+    def get_budget(
+        self, budget_id: str, cache_directory: str = None
+    ) -> Dict[str, TransactionStore]:
+        """
+        Fetches the transactions of every account in the budget from the last
+        BANK_DATE_RANGE days with a single request, optionally cached as for get.
+
+        :return: a dictionary from account id to the account's transactions. Accounts
+            without transactions are absent.
+        """
+        url = self._url(f"/budgets/{budget_id}/transactions")
+        by_account = defaultdict(list)
+        for transaction in self._fetch(url, cache_directory, f"{budget_id}.json"):
+            by_account[transaction["account_id"]].append(transaction)
+
+        transaction_stores = {}
+        for account_id, transactions in by_account.items():
+            transaction_store = transaction_stores[account_id] = TransactionStore()
+            transaction_store.extend(_rows_from_ynab(transactions), _ids(transactions))
+        return transaction_stores
+
+    def _fetch(self, url: str, cache_directory: str, cache_name: str):
+        """
+        Fetches transactions from the last BANK_DATE_RANGE days from a YNAB transactions
+        endpoint, skipping deleted ones
+        """
         since_date = date.today() - timedelta(days=BANK_DATE_RANGE)
-        response = requests.get(
-            url,
-            params={"since_date": since_date.strftime(DATE_FORMAT_FOR_YNAB)},
-            headers=self._request_headers(),
+        params = {"since_date": since_date.strftime(DATE_FORMAT_FOR_YNAB)}
+
+        cache = None
+        if cache_directory:
+            path = os.path.join(cache_directory, cache_name)
+            cache = TransactionCache(path, since_date)
+            if cache.server_knowledge is not None:
+                params["last_knowledge_of_server"] = cache.server_knowledge
+
+        response = self._request("GET", url, params=params)
+        transactions, server_knowledge = _decode_transactions(
+            response.content.decode("utf-8")
         )
-        response.raise_for_status()
-        for transaction in response.json()["data"]["transactions"]:
-            if not transaction["deleted"]:
-                transaction_store.append(
-                    transaction_date=datetime.strptime(
-                        transaction["date"], DATE_FORMAT_FOR_YNAB
-                    ),
-                    payee_name=transaction["payee_name"] or "",
-                    memo=transaction["memo"] or "",
-                    amount=int(transaction["amount"]) / 1000,
-                )
-        return transaction_store
+        if cache:
+            cache.merge(transactions, server_knowledge)
+            cache.save()
+            return [dict(t, id=id) for id, t in cache.transactions.items()]
+        return [t for t in transactions if not t["deleted"]]
 
-    @staticmethod
-    def _url(endpoint):
-        return "https://api.youneedabudget.com/v1/" + endpoint.lstrip("/")
+    def _url(self, endpoint):
+        return self.url.rstrip("/") + "/" + endpoint.lstrip("/")
 
-    def _request_headers(self):
+    def _create_session(self, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
         access_token = self.secret("access_token")
-        return {"Authorization": f"Bearer {access_token}"}
+        session.headers.update(
+            {"Authorization": f"Bearer {access_token}", "Accept-Encoding": "gzip"}
+        )
+        return session
+
+    def _request(self, method: str, url: str, **kwargs) -> Response:
+        """
+        :raises HTTPError: if one occurred
+        """
+        start = time.perf_counter()
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        seconds = time.perf_counter() - start
+        self.timings.append(RequestTiming(method, url, response.status_code, seconds))
+        response.raise_for_status()
+        return response
+
+
+def _decode_transactions(body: str):
+    """
+    Decodes the transactions of a response from a YNAB transactions endpoint one at a
+    time, keeping only the fields in YNAB_TRANSACTION_FIELDS, rather than decoding the
+    whole response at once. The body itself is still held in memory as one string; only
+    the decoded objects are not
+
+    :return: the transactions and the server_knowledge, or None if there is none
+    :raises ValueError: if the response cannot be decoded
+    """
+    match = _TRANSACTIONS_ARRAY.search(body)
+    if not match:
+        raise ValueError("No transactions in response from YNAB")
+
+    transactions = []
+    index = match.end()
+    while True:
+        index = _ARRAY_SEPARATOR.match(body, index).end()
+        if body.startswith("]", index):
+            break
+        transaction, index = _JSON_DECODER.raw_decode(body, index)
+        transactions.append({f: transaction.get(f) for f in YNAB_TRANSACTION_FIELDS})
+
+    server_knowledge = _SERVER_KNOWLEDGE.search(body, index)
+    if not server_knowledge:
+        server_knowledge = _SERVER_KNOWLEDGE.search(body, 0, match.start())
+    if server_knowledge:
+        return transactions, int(server_knowledge.group(1))
+    return transactions, None
+
+
+def _rows_from_ynab(transactions: Iterable[dict]) -> List[Tuple[date, str, str, int]]:
+    return [
+        (
+            _parse_iso_date(t["date"]),
+            t["payee_name"] or "",
+            t["memo"] or "",
+            int(t["amount"]),
+        )
+        for t in transactions
+    ]
+
+
+def _ids(transactions: Iterable[dict]) -> List[str]:
+    return [t["id"] for t in transactions]
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso_date(string: str) -> date:
+    year, month, day = string.split("-")
+    return date(int(year), int(month), int(day))
+
+
+def _is_retryable(error: requests.RequestException) -> bool:
+    if isinstance(error, requests.HTTPError):
+        status_code = error.response.status_code
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
@@ -0,0 +1,72 @@
+"""
+Solving the assignment problem: pairing up rows and columns of a cost matrix so that the
+total cost is minimal
+"""
+from typing import List, Sequence, Tuple
+
+
+def min_cost_assignment(costs: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """
+    Solves the rectangular assignment problem with the Hungarian algorithm in
+    O(n^2 m) time, where n <= m are the dimensions of the cost matrix. Every row is
+    paired with a distinct column (or every column with a distinct row, if there are
+    more rows than columns) such that the sum of the costs of the pairs is minimal.
+
+    :return: the pairs as (row, column) tuples, ordered by row
+    """
+    n = len(costs)
+    m = len(costs[0]) if n else 0
+    if n == 0 or m == 0:
+        return []
+    if n > m:
+        transposed = [list(column) for column in zip(*costs)]
+        return sorted((row, column) for column, row in _hungarian(transposed, m, n))
+    return sorted(_hungarian(costs, n, m))
+
+
+def _hungarian(costs, n, m):
+    """
+    The Hungarian algorithm with potentials for n <= m. Indexes are 1-based internally
+    with row and column 0 used as sentinels.
+    """
+    infinity = float("inf")
+    u = [0.0] * (n + 1)  # row potentials
+    v = [0.0] * (m + 1)  # column potentials
+    p = [0] * (m + 1)  # p[j] is the row assigned to column j
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [infinity] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = costs[i0 - 1]
+            ui0 = u[i0]
+            delta = infinity
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = row[j - 1] - ui0 - v[j]
+                    if reduced < minv[j]:
+                        minv[j] = reduced
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # augment along the path found
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j]]
@@ -1,5 +1,9 @@
+import sys
 import uuid
 
+# how long a restored session is given to show the session probe's element
+SESSION_PROBE_SECONDS = 5
+
 
 class ObjectWithSecrets:
     def __init__(self, secrets, *args, **kwargs):
@@ -33,9 +37,20 @@ class ObjectWithSecrets:
 
 
 class Bank(ObjectWithSecrets):
+    # the url of a page and the (By, value) locator of an element on it that is only
+    # shown when logged in, with which a restored session is checked. Banks without one
+    # always log in in full.
+    session_probe = None
+
+    # whether the bank implements _fetch_transactions_http, to fetch transactions
+    # without a browser once a session has been saved
+    supports_http = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._uuid = str(uuid.uuid4())
+        self.session_store = None
+        self.log = sys.stdout  # for progress messages, e.g. this bank's own buffer
 
     def __hash__(self):
         return hash(self.uuid())
@@ -50,3 +65,63 @@ class Bank(ObjectWithSecrets):
         """ Returns the unique UUID for this object, as a string
         """
         return self._uuid
+
+    def session_name(self) -> str:
+        """ Identifies the login whose session is saved, e.g. the bank and username """
+        return type(self).__name__
+
+    def log_in(self, driver):
+        """ Restores the session saved after the last login if the session probe finds
+        it still logged in, and otherwise logs in in full and saves the new session
+        """
+        if self.session_store is None or self.session_probe is None:
+            self._full_log_in(driver)
+            return
+
+        name = self.session_name()
+        session = self.session_store.load(name)
+        if session is not None:
+            driver.restore_session(session)
+            if self.session_valid(driver):
+                return
+            self.session_store.delete(name)
+
+        self._full_log_in(driver)
+        self.session_store.save(name, driver.session())
+
+    def session_valid(self, driver) -> bool:
+        url, locator = self.session_probe
+        driver.get(url)
+        return driver.has_element(*locator, SESSION_PROBE_SECONDS)
+
+    def fetch_transactions_http(self, http_session, transaction_store) -> bool:
+        """ Fetches transactions over plain HTTP, with the cookies of the session saved
+        after the last login set on the given requests.Session
+
+        Returns:
+            False if the bank doesn't support it or there is no valid saved session,
+            in which case fetch_transactions has to be used instead
+        """
+        if not self.supports_http or self.session_store is None:
+            return False
+        session = self.session_store.load(self.session_name())
+        if session is None:
+            return False
+        for cookie in session["cookies"]:
+            http_session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie["domain"],
+                path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False),
+            )
+        return self._fetch_transactions_http(http_session, transaction_store)
+
+    def _fetch_transactions_http(self, http_session, transaction_store) -> bool:
+        """ Fetches transactions with a logged in requests.Session, returning False if
+        it turns out to be logged out """
+        raise NotImplementedError
+
+    def _full_log_in(self, driver):
+        """ Goes to the bank's website and logs in, including any 2FA """
+        raise NotImplementedError
@@ -1,52 +1,67 @@
 import selenium.webdriver
+from selenium.webdriver.common.by import By
 
-from ynab import fileutils
+from ynab import fileutils, ofx
+from ynab.api import TransactionStore
 from ynab.bank import Bank
 
+WEBSITE = "https://www.americanexpress.com/uk/"
+
 
 class Amex(Bank):
     full_name = "American Express"
+    session_probe = (WEBSITE, (By.ID, "gb_myca_pc_statement"))
 
     def __init__(self, config, secrets):
         super().__init__(secrets)
         self.validate_secrets("password")
         self.username = config["username"]
 
+    def fetch_transactions(self, driver, transaction_store: TransactionStore, dir: str):
+        path = self.download_transactions(driver, dir)
+        ofx.add_transactions_from_ofx(path, transaction_store, self.log)
+
     def download_transactions(self, driver, dir):
         self._start_download(driver)
         return self._wait_until_download_complete(dir)
 
     def _start_download(self, driver):
-        self._go_to_website(driver)
-        self._log_in(driver)
+        self.log_in(driver)
         self._navigate_to_downloads_page(driver)
         self._initiate_download(driver)
 
     def _wait_until_download_complete(self, dir):
         return fileutils.wait_for_file(dir, ".qfx")[0]
 
+    def session_name(self):
+        return f"Amex:{self.username}"
+
+    def _full_log_in(self, driver):
+        self._go_to_website(driver)
+        self._log_in(driver)
+
     def _go_to_website(self, driver):
-        driver.get("https://www.americanexpress.com/uk/")
+        driver.get(WEBSITE)
         assert "American Express" in driver.title
 
         # bypass cookie question
-        driver.find_element_by_id("sprite-ContinueButton_EN").click()
+        driver.wait_for_clickable(By.ID, "sprite-ContinueButton_EN").click()
 
     def _log_in(self, driver):
-        user_id = driver.find_element_by_name("UserID")
+        user_id = driver.wait_for_element(By.NAME, "UserID")
         user_id.send_keys(self.username)
 
-        password = driver.find_element_by_id("Password")
+        password = driver.wait_for_element(By.ID, "Password")
         password.send_keys(self.secret("password"))
 
         # click through to log in
-        loginButton = driver.find_element_by_id("loginButton")
+        loginButton = driver.wait_for_clickable(By.ID, "loginButton")
         loginButton.click()
 
     def _navigate_to_downloads_page(self, driver):
-        tab = driver.find_element_by_id("gb_myca_pc_statement")
-        export = driver.find_element_by_id(
-            ("gb_myca_pc_statement_export_" "statement_data")
+        tab = driver.wait_for_element(By.ID, "gb_myca_pc_statement")
+        export = driver.wait_for_element(
+            By.ID, ("gb_myca_pc_statement_export_" "statement_data")
         )
 
         action = selenium.webdriver.ActionChains(driver)
@@ -55,13 +70,14 @@ class Amex(Bank):
         action.perform()
 
     def _initiate_download(self, driver):
-        driver.find_element_by_id("quicken").click()
+        driver.wait_for_clickable(By.ID, "quicken").click()
 
-        driver.find_element_by_id("select0").click()
+        driver.wait_for_clickable(By.ID, "select0").click()
 
         # get the latest two statements
-        driver.find_element_by_id("checkboxid00").click()
-        driver.find_element_by_id("checkboxid01").click()
+        driver.wait_for_clickable(By.ID, "checkboxid00").click()
+        driver.wait_for_clickable(By.ID, "checkboxid01").click()
 
         # kick off the download
-        driver.find_element_by_id("myBlueButton1").click()
+        with driver.wait_for_download_started():
+            driver.wait_for_clickable(By.ID, "myBlueButton1").click()
@@ -1,25 +1,24 @@
 # -*- coding: utf-8 -*-
+import csv
+import io
 import sys
-from csv import DictReader
-from datetime import datetime
-from pprint import pformat
+from html.parser import HTMLParser
+from typing import Iterator
 
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.expected_conditions import (
-    invisibility_of_element_located,
-)
 from selenium.webdriver.support.select import Select
-from selenium.webdriver.support.wait import WebDriverWait
 
 from ynab import fileutils
 from ynab.api import BANK_DATE_RANGE, TransactionStore
 from ynab.bank import Bank
+from ynab.statements import add_in_batches, parse_date, parse_milliunits
 
 NUMBER_LINES_TO_IGNORE_IN_CSV = 6  # DKB CSV file is preceeded by a 6-line header
 DATE_FORMAT_IN_CSV = "%d.%m.%Y"
 DKB_ENCODING = "iso-8859-1"
 DKB_CSV_DELIMITER = ";"
 DKB_2FA_TIMEOUT_SECONDS = 60
+CSV_BATCH_SIZE = 1000
 
 ACCOUNT_DATE_HEADER_NAME = "Buchungstag"
 ACCOUNT_MEMO_HEADER_NAME = "Verwendungszweck"
@@ -28,10 +27,21 @@ CREDIT_CARD_MEMO_HEADER_NAME = "Beschreibung"
 CREDIT_DATE_HEADER_NAME = "Belegdatum"
 PAYEE_HEADER_NAME = "Auftraggeber"
 
+BANKING_URL = "https://www.dkb.de/banking"
+TRANSACTIONS_MENU_XPATH = '//*[@id="menu_0.0.0-node"]/a'
+
+# the page of transactions that the browser navigates, and its events
+TRANSACTIONS_PATH = "/finanzstatus/kontoumsaetze"
+INIT_EVENT = "init"
+SEARCH_EVENT = "search"
+CSV_EXPORT_EVENT = "csvExport"
+
 
 class DKB(Bank):
 
     full_name = "DKB"
+    session_probe = (BANKING_URL, (By.XPATH, TRANSACTIONS_MENU_XPATH))
+    supports_http = True
 
     def __init__(self, config, secrets):
         assert BANK_DATE_RANGE in [30, 60, 90], "Invalid date range"
@@ -40,32 +50,71 @@ class DKB(Bank):
         self.account_substring = str(config["account_substring"])
 
     def fetch_transactions(self, driver, transaction_store: TransactionStore, dir: str):
-        self._login(driver)
-        self._wait_for_2fa(driver)
+        self.log_in(driver)
         self._navigate_to_transactions(driver)
         self._switch_to_correct_account(driver)
         self._select_time_range(driver)
         self._download_transactions(driver)
-        (csv,) = fileutils.wait_for_file(dir, ".csv")
-        _add_transactions_from_csv(csv, transaction_store)
+        (export,) = fileutils.wait_for_file(dir, ".csv")
+        _add_transactions_from_csv(export, transaction_store, self.log)
+
+    def _fetch_transactions_http(self, http_session, transaction_store):
+        """
+        Submits the same form as the browser does, choosing the account and the time
+        range by their visible text, then reads the CSV export from the response
+        """
+        url = BANKING_URL + TRANSACTIONS_PATH
+        response = http_session.get(url, params={"$event": INIT_EVENT})
+        response.raise_for_status()
+        form = _Form()
+        form.feed(response.text)
+        if "slAllAccounts" not in form.selects:
+            # logged out, so the page is the login form and the session has expired
+            self.session_store.delete(self.session_name())
+            return False
+
+        fields = dict(form.hidden)
+        fields["slAllAccounts"] = form.value_of(
+            "slAllAccounts", lambda text: self.account_substring in text
+        )
+        fields["slSearchPeriod"] = form.value_of(
+            "slSearchPeriod", lambda text: text == f"letzten {BANK_DATE_RANGE} Tage"
+        )
+        response = http_session.post(url, params={"$event": SEARCH_EVENT}, data=fields)
+        response.raise_for_status()
+
+        response = http_session.get(url, params={"$event": CSV_EXPORT_EVENT})
+        response.raise_for_status()
+        export = io.StringIO(response.content.decode(DKB_ENCODING))
+        # read the whole export first, so that nothing is added if it is not one
+        rows = list(_read_rows(export))
+        add_in_batches(transaction_store, rows, CSV_BATCH_SIZE, log=self.log)
+        return True
 
     def _select_time_range(self, driver):
-        search_period = Select(driver.find_element_by_name("slSearchPeriod"))
+        search_period = Select(driver.wait_for_element(By.NAME, "slSearchPeriod"))
         search_period.select_by_visible_text(f"letzten {BANK_DATE_RANGE} Tage")
 
-        button = driver.find_element_by_id("searchbutton")
+        button = driver.wait_for_clickable(By.ID, "searchbutton")
         button.click()
 
+    def session_name(self):
+        return f"DKB:{self.secret('anmeldename')}"
+
+    def _full_log_in(self, driver):
+        self._login(driver)
+        self._wait_for_2fa(driver)
+
     def _login(self, driver):
-        driver.get("https://www.dkb.de/banking")
+        driver.get(BANKING_URL)
 
-        login = driver.find_element_by_id("loginInputSelector")
+        login = driver.wait_for_element(By.ID, "loginInputSelector")
         login.send_keys(self.secret("anmeldename"))
 
-        pin = driver.find_element_by_id("pinInputSelector")
+        pin = driver.wait_for_element(By.ID, "pinInputSelector")
         pin.send_keys(self.secret("pin"))
 
-        button = driver.find_element_by_id("buttonlogin")
+        button = driver.wait_for_clickable(By.ID, "buttonlogin")
         button.click()
 
     def _wait_for_2fa(self, driver):
@@ -73,24 +122,24 @@ class DKB(Bank):
         xpath_of_some_2fa_page_element = (
             "//*[text()[contains(.,'Anmeldung bestätigen')]]"
         )
-        driver.find_element_by_xpath(xpath_of_some_2fa_page_element)
+        driver.wait_for_element(By.XPATH, xpath_of_some_2fa_page_element)
 
         # wait until we are off the 2fa page
-        print(f"Waiting {DKB_2FA_TIMEOUT_SECONDS} seconds for 2FA...")
-        WebDriverWait(driver, DKB_2FA_TIMEOUT_SECONDS).until(
-            invisibility_of_element_located((By.XPATH, xpath_of_some_2fa_page_element))
+        print(f"Waiting {DKB_2FA_TIMEOUT_SECONDS} seconds for 2FA...", file=self.log)
+        driver.wait_for_invisible(
+            By.XPATH, xpath_of_some_2fa_page_element, DKB_2FA_TIMEOUT_SECONDS
         )
-        print("Looks like 2FA passed")
+        print("Looks like 2FA passed", file=self.log)
 
     def _navigate_to_transactions(self, driver):
-        transactions = driver.find_element_by_xpath('//*[@id="menu_0.0.0-node"]/a')
+        transactions = driver.wait_for_clickable(By.XPATH, TRANSACTIONS_MENU_XPATH)
         transactions.click()
         # In the current view you can select an account and date range: we
         # leave it as the default account and the default time range of 'the
         # last 30 days'
 
     def _switch_to_correct_account(self, driver):
-        all_accounts = Select(driver.find_element_by_name("slAllAccounts"))
+        all_accounts = Select(driver.wait_for_element(By.NAME, "slAllAccounts"))
 
         all_texts = [option.text for option in all_accounts.options]
         try:
@@ -99,69 +148,125 @@ class DKB(Bank):
             raise ValueError("Account substring does not match or is not unique") from e
         all_accounts.select_by_visible_text(text)
 
-        update_button = driver.find_element_by_id("searchbutton")
+        update_button = driver.wait_for_clickable(By.ID, "searchbutton")
         update_button.click()
 
     def _download_transactions(self, driver):
-        button = driver.find_element_by_xpath('//span[@title="CSV-Export"]')
-        button.click()
+        button = driver.wait_for_clickable(By.XPATH, '//span[@title="CSV-Export"]')
+        with driver.wait_for_download_started():
+            button.click()
+
+
+class _Form(HTMLParser):
+    """ The hidden inputs of a page, and the options of its selects """
+
+    def __init__(self):
+        super().__init__()
+        self.hidden = {}  # name -> value
+        self.selects = {}  # name -> [(value, visible text)]
+        self._select = None
+        self._option = None
+
+    def value_of(self, select: str, matches) -> str:
+        """ The value of the only option of the select whose text matches """
+        values = [v for v, text in self.selects[select] if matches(text)]
+        if len(values) != 1:
+            raise ValueError(f"Option of {select} does not match or is not unique")
+        return values[0]
 
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "input" and attrs.get("type") == "hidden" and "name" in attrs:
+            self.hidden[attrs["name"]] = attrs.get("value", "")
+        elif tag == "select":
+            self._select = self.selects.setdefault(attrs.get("name"), [])
+        elif tag == "option" and self._select is not None:
+            self._option = [attrs.get("value", ""), ""]
+            self._select.append(self._option)
 
-def _add_transactions_from_csv(filepath: str, transaction_store: TransactionStore):
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[1] += data
+
+    def handle_endtag(self, tag):
+        if tag in ("option", "select") and self._option is not None:
+            self._option[1] = self._option[1].strip()
+            self._option = None
+        if tag == "select":
+            self._select = None
+
+
+def _add_transactions_from_csv(
+    filepath: str, transaction_store: TransactionStore, log=sys.stderr
+):
     """
     Iterate over the entries in a CSV file from DKB and add them as transactions on the
-    supplied YNAB object. Any entries with a date in the future are skipped.
+    supplied store, in batches of CSV_BATCH_SIZE. Any entries with a date in the future
+    are skipped, and reported to log.
     """
+    with open(filepath, encoding=DKB_ENCODING) as file:
+        _add_transactions_from_file(file, transaction_store, log)
 
-    def parse_german_float(string: str) -> float:
-        """
-        Parse a number like 12.002,34
-        """
-        string = string.replace(",", ".")
-        string = string.replace(".", "", string.count(".") - 1)
-        return float(string)
 
-    with open(filepath, encoding=DKB_ENCODING) as file:
-        # detect whether an account or a credit card: they are slightly different CSVs
-        first_line = file.readline()
-        if "Kreditkarte" in first_line:
-            has_payee = False
-            memo_header_name = CREDIT_CARD_MEMO_HEADER_NAME
-            date_header_name = CREDIT_DATE_HEADER_NAME
-        elif "Kontonummer" in first_line:
-            has_payee = True
-            memo_header_name = ACCOUNT_MEMO_HEADER_NAME
-            date_header_name = ACCOUNT_DATE_HEADER_NAME
-        else:
-            raise ValueError(
-                "Expected 'Kreditkarte' or 'Kontonummer' to be in the first line but "
-                f"got {first_line}"
-            )
+def _add_transactions_from_file(
+    file, transaction_store: TransactionStore, log=sys.stderr
+):
+    """ As _add_transactions_from_csv, from a file already open as text """
+    add_in_batches(transaction_store, _read_rows(file), CSV_BATCH_SIZE, log=log)
+
+
+def _read_rows(file) -> Iterator[tuple]:
+    """
+    Yields the (date, payee name, memo, milliunit amount) rows of a DKB export, from a
+    file already open as text
+
+    :raises ValueError: if the file is not a DKB export, e.g. a login page
+    """
+    # detect whether an account or a credit card: they are slightly different CSVs
+    first_line = file.readline()
+    if "Kreditkarte" in first_line:
+        has_payee = False
+        memo_header_name = CREDIT_CARD_MEMO_HEADER_NAME
+        date_header_name = CREDIT_DATE_HEADER_NAME
+    elif "Kontonummer" in first_line:
+        has_payee = True
+        memo_header_name = ACCOUNT_MEMO_HEADER_NAME
+        date_header_name = ACCOUNT_DATE_HEADER_NAME
+    else:
+        raise ValueError(
+            "Expected 'Kreditkarte' or 'Kontonummer' to be in the first line but "
+            f"got {first_line}"
+        )
+
+    # skip the other NUMBER_LINES_TO_IGNORE_IN_CSV lines
+    for _ in range(NUMBER_LINES_TO_IGNORE_IN_CSV - 1):
+        file.readline()
 
-        # skip the other NUMBER_LINES_TO_IGNORE_IN_CSV lines
-        for _ in range(NUMBER_LINES_TO_IGNORE_IN_CSV - 1):
-            file.readline()
-
-        # read the rest as CSV
-        reader = DictReader(file, delimiter=DKB_CSV_DELIMITER)
-        if has_payee:
-            (payee_header,) = [h for h in reader.fieldnames if PAYEE_HEADER_NAME in h]
-
-        # insert into ynab object
-        for row in reader:
-            payee_name = row[payee_header] if has_payee else ""
-            float_amount = parse_german_float(row[AMOUNT_HEADER_NAME])
-            date = datetime.strptime(row[date_header_name], DATE_FORMAT_IN_CSV).date()
-            memo = row[memo_header_name]
-            if date > date.today():
-                sys.stderr.write(
-                    f"Skipping because it is in the future: \n{pformat(row)}\n"
-                )
-                continue
-
-            transaction_store.append(
-                transaction_date=date,
-                payee_name=payee_name,
-                memo=memo,
-                amount=float_amount,
+    # read the rest as CSV, looking columns up by position rather than by name
+    reader = csv.reader(file, delimiter=DKB_CSV_DELIMITER)
+    header = next(reader, [])  # so that a missing header raises ValueError
+    date_column = header.index(date_header_name)
+    memo_column = header.index(memo_header_name)
+    amount_column = header.index(AMOUNT_HEADER_NAME)
+    if has_payee:
+        (payee_column,) = [i for i, h in enumerate(header) if PAYEE_HEADER_NAME in h]
+
+    for row in reader:
+        if row:
+            yield (
+                parse_date(row[date_column], DATE_FORMAT_IN_CSV),
+                row[payee_column] if has_payee else "",
+                row[memo_column],
+                _parse_german_milliunits(row[amount_column]),
             )
+
+
+def _parse_german_milliunits(string: str) -> int:
+    """
+    Parse a number like -12.002,34 into milliunits, here -12002340. As for the account
+    balance in the credit card header, a number with no comma is taken to have its full
+    stop as the decimal point.
+    """
+    if "," in string:
+        return parse_milliunits(string, thousands_separator=".", decimal_separator=",")
+    return parse_milliunits(string)
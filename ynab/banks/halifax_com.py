@@ -1,77 +1,67 @@
-import os.path
 import re
-import time
 
-from ynab import fileutils
+from selenium.webdriver.common.by import By
+
+from ynab import fileutils, qif
+from ynab.api import TransactionStore
 from ynab.bank import Bank
 
+WEBSITE = "https://www.halifax-online.co.uk"
+
 CHALLENGE_DESCRIPTION_CLASS_NAME = "inner"
+STATEMENT_LINK_ID = "lnkAccFuncs_viewStatement_des-m-sat-xx-1"
+STATEMENTS_TO_DOWNLOAD = 2  # the two latest statements
 
 
 class Halifax(Bank):
     full_name = "Halifax"
+    session_probe = (WEBSITE, (By.ID, STATEMENT_LINK_ID))
 
     def __init__(self, config, secrets):
         super().__init__(secrets)
         self.validate_secrets("password", "challenge")
         self.username = config["username"]
 
-    def download_transactions(self, driver, dir):
+    def fetch_transactions(self, driver, transaction_store: TransactionStore, dir: str):
+        """ Halifax exports card spending as positive amounts, so the sign of every
+        amount is inverted """
         self._start_download(driver)
-        paths = self._wait_until_download_complete(dir)
-
-        return self._invert_files(paths)[0]
+        for path in self._wait_until_download_complete(dir):
+            qif.add_transactions_from_qif(
+                path, transaction_store, invert_amounts=True, log=self.log
+            )
 
     def _start_download(self, driver):
-        self._go_to_website(driver)
-        self._log_in(driver)
+        self.log_in(driver)
         self._navigate_to_downloads_page(driver)
         self._initiate_download(driver)
 
     def _wait_until_download_complete(self, dir):
-        return fileutils.wait_for_file_with_prefix(dir, ".qif", "5253030007970668")
-
-    def _invert_files(self, paths):
-        """ Reads files of bank transaction from disks, inverts the sign of the
-        transaction amounts, and writes them out to another file.
-        Args:
-            paths: a list of file paths to modify
-
-        Returns: a list of the written files. For an input file a.qif, the
-            output file will be a_fixed.qif
-        """
-
-        to_return = []
-        for path in paths:
-            new_path = "_fixed".join(os.path.splitext(path))
-            print(new_path)
-            with open(new_path, "w") as new_file, open(path) as file:
-                for count, line in enumerate(file):
-                    if (count + 1) % 4 == 0:
-                        if line.startswith("T-"):
-                            new_file.write("T" + line[2:])
-                        else:
-                            new_file.write("T-" + line[1:])
-                    else:
-                        new_file.write(line)
-            to_return.append(new_path)
-
-        return to_return
+        return fileutils.wait_for_file_with_prefix(
+            dir, ".qif", "5253030007970668", count=STATEMENTS_TO_DOWNLOAD
+        )
+
+    def session_name(self):
+        return f"Halifax:{self.username}"
+
+    def _full_log_in(self, driver):
+        self._go_to_website(driver)
+        self._log_in(driver)
 
     def _go_to_website(self, driver):
-        driver.get("https://www.halifax-online.co.uk")
+        driver.get(WEBSITE)
         assert "Halifax" in driver.title
 
     def _log_in(self, driver):
         n = "frmLogin:strCustomerLogin_userID"
-        user_id = driver.find_element_by_name(n)
+        user_id = driver.wait_for_element(By.NAME, n)
         user_id.send_keys(self.username)
 
-        password = driver.find_element_by_id("frmLogin:strCustomerLogin_pwd")
+        password = driver.wait_for_element(By.ID, "frmLogin:strCustomerLogin_pwd")
         password.send_keys(self.secret("password"))
 
         # click through to log in
-        loginButton = driver.find_element_by_id("frmLogin:btnLogin2")
+        loginButton = driver.wait_for_clickable(By.ID, "frmLogin:btnLogin2")
         loginButton.click()
 
         self._complete_challenge(driver)
@@ -81,9 +71,9 @@ class Halifax(Bank):
         # then click the continue button.\nWe will never ask you to enter your
         # FULL memorable information.\nThis sign in step improves your
         # security.
-        description = driver.find_element_by_class_name(
-            CHALLENGE_DESCRIPTION_CLASS_NAME
-        ).text  # noqa
+        description = driver.wait_for_element(
+            By.CLASS_NAME, CHALLENGE_DESCRIPTION_CLASS_NAME
+        ).text
 
         description = description[:34]
         match = re.match(
@@ -101,37 +91,38 @@ class Halifax(Bank):
         m2 = "frmentermemorableinformation1:strEnterMemorableInformation_" "memInfo2"
         m3 = "frmentermemorableinformation1:strEnterMemorableInformation_" "memInfo3"
         challenge_selectors = [
-            driver.find_element_by_name(m1),
-            driver.find_element_by_name(m2),
-            driver.find_element_by_name(m3),
+            driver.wait_for_element(By.NAME, m1),
+            driver.wait_for_element(By.NAME, m2),
+            driver.wait_for_element(By.NAME, m3),
         ]
 
         for char, selector in zip(chars, challenge_selectors):
             selector.send_keys(char)
 
         id = "frmentermemorableinformation1:btnContinue"
-        driver.find_element_by_id(id).click()
+        driver.wait_for_clickable(By.ID, id).click()
 
     def _navigate_to_downloads_page(self, driver):
-        driver.find_element_by_id("lnkAccFuncs_viewStatement_des-m-sat-xx-1").click()
+        driver.wait_for_clickable(By.ID, STATEMENT_LINK_ID).click()
 
     def _initiate_download(self, driver):
-        self._get_earlier_page(driver)
-        self._get_earlier_page(driver)
+        for _ in range(STATEMENTS_TO_DOWNLOAD):
+            self._get_earlier_page(driver)
 
     def _get_earlier_page(self, driver):
-        earlier_button = driver.find_element_by_id("lnkEarlierBtnMACC")
+        earlier_button = driver.wait_for_element(By.ID, "lnkEarlierBtnMACC")
         driver.execute_script("arguments[0].scrollIntoView()", earlier_button)
         earlier_button.click()
 
-        # wait for it to load
-        time.sleep(2)
+        # wait for the earlier statement to load
+        driver.wait_for_network_idle()
 
-        driver.find_element_by_id("lnkExportStatementSSR").click()
+        driver.wait_for_clickable(By.ID, "lnkExportStatementSSR").click()
 
         # select download mechanic
-        driver.find_element_by_id("export-format").send_keys("p")
+        driver.wait_for_element(By.ID, "export-format").send_keys("p")
 
         id = "creditcardstatment:ccstmt:export-statement-form:btnExport"
-        driver.find_element_by_id(id).click()
-        driver.find_element_by_class_name("overlay-close").click()
+        with driver.wait_for_download_started():
+            driver.wait_for_clickable(By.ID, id).click()
+        driver.wait_for_clickable(By.CLASS_NAME, "overlay-close").click()
@@ -1,7 +1,11 @@
 import selenium.webdriver.support.ui as ui
+from selenium.webdriver.common.by import By
 
-from ynab import fileutils
-from ynab.bank import Bank
+from ynab import fileutils, ofx
+from ynab.api import TransactionStore
+from ynab.bank import SESSION_PROBE_SECONDS, Bank
+
+WEBSITE = "https://www.nwolb.com"
 
 # text box on first page to enter customer number
 CUSTOMER_NUMBER = "ctl00$mainContent$LI5TABA$CustomerNumber_edit"
@@ -49,29 +53,49 @@ DOWNLOAD_BUTTON = "ctl00$mainContent$SS7-LWLA_button_button"
 class Natwest(Bank):
 
     full_name = "Natwest"
+    session_probe = (WEBSITE, (By.XPATH, STATEMENTS))
 
     def __init__(self, config, secrets):
         super().__init__(secrets)
         self.validate_secrets("password", "pin")
         self.customer_number = config["customer_number"]
 
+    def fetch_transactions(self, driver, transaction_store: TransactionStore, dir: str):
+        path = self.download_transactions(driver, dir)
+        ofx.add_transactions_from_ofx(path, transaction_store, self.log)
+
     def download_transactions(self, driver, dir):
-        self._go_to_website(driver)
-        self._log_in(driver)
+        self.log_in(driver)
         self._navigate_to_downloads_page(driver)
         self._initiate_download(driver)
         return fileutils.wait_for_file(dir, ".ofx")[0]
 
+    def session_name(self):
+        return f"Natwest:{self.customer_number}"
+
+    def session_valid(self, driver):
+        """ The sidebar is inside the security frame """
+        url, locator = self.session_probe
+        driver.get(url)
+        if not driver.has_element(By.ID, SECURITY_FRAME, SESSION_PROBE_SECONDS):
+            return False
+        self._switch_to_security_frame(driver)
+        return driver.has_element(*locator, SESSION_PROBE_SECONDS)
+
+    def _full_log_in(self, driver):
+        self._go_to_website(driver)
+        self._log_in(driver)
+
     def _go_to_website(self, driver):
-        driver.get("https://www.nwolb.com")
+        driver.get(WEBSITE)
 
     def _switch_to_security_frame(self, driver):
         driver.switch_to_default_content()
-        driver.switch_to_frame(SECURITY_FRAME)
+        driver.switch_to_frame(driver.wait_for_element(By.ID, SECURITY_FRAME))
 
     def _log_in_customer_number(self, driver):
         self._switch_to_security_frame(driver)
-        search_box = driver.find_element_by_name(CUSTOMER_NUMBER)
+        search_box = driver.wait_for_element(By.NAME, CUSTOMER_NUMBER)
         search_box.send_keys(self.customer_number)
         search_box.submit()
 
@@ -95,14 +119,14 @@ class Natwest(Bank):
     def _log_in_pin_and_password(self, driver):
         # get the text asking for the pin digits and password chars
         texts_requesting_pin_digits = [
-            driver.find_element_by_id(PIN_DIGIT_1).text,
-            driver.find_element_by_id(PIN_DIGIT_2).text,
-            driver.find_element_by_id(PIN_DIGIT_3).text,
+            driver.wait_for_element(By.ID, PIN_DIGIT_1).text,
+            driver.wait_for_element(By.ID, PIN_DIGIT_2).text,
+            driver.wait_for_element(By.ID, PIN_DIGIT_3).text,
         ]
         texts_requesting_password_chars = [
-            driver.find_element_by_id(PASSWORD_CHARACTER_1).text,
-            driver.find_element_by_id(PASSWORD_CHARACTER_2).text,
-            driver.find_element_by_id(PASSWORD_CHARACTER_3).text,
+            driver.wait_for_element(By.ID, PASSWORD_CHARACTER_1).text,
+            driver.wait_for_element(By.ID, PASSWORD_CHARACTER_2).text,
+            driver.wait_for_element(By.ID, PASSWORD_CHARACTER_3).text,
         ]
 
         # extract the requested info from the secret
@@ -112,14 +136,14 @@ class Natwest(Bank):
 
         # find the text boxes on the page
         pin_text_boxes = [
-            driver.find_element_by_name(PIN_TETXBOX_1),
-            driver.find_element_by_name(PIN_TETXBOX_2),
-            driver.find_element_by_name(PIN_TETXBOX_3),
+            driver.wait_for_element(By.NAME, PIN_TETXBOX_1),
+            driver.wait_for_element(By.NAME, PIN_TETXBOX_2),
+            driver.wait_for_element(By.NAME, PIN_TETXBOX_3),
         ]
         password_text_boxes = [
-            driver.find_element_by_name(PASSWORD_TEXTBOX_1),
-            driver.find_element_by_name(PASSWORD_TEXTBOX_2),
-            driver.find_element_by_name(PASSWORD_TEXTBOX_3),
+            driver.wait_for_element(By.NAME, PASSWORD_TEXTBOX_1),
+            driver.wait_for_element(By.NAME, PASSWORD_TEXTBOX_2),
+            driver.wait_for_element(By.NAME, PASSWORD_TEXTBOX_3),
         ]
 
         # fill the text boxes
@@ -128,7 +152,7 @@ class Natwest(Bank):
         for char, box in zip(subpassword, password_text_boxes):
             box.send_keys(char)
 
-        driver.find_element_by_name(LOG_IN_BUTTON).click()
+        driver.wait_for_clickable(By.NAME, LOG_IN_BUTTON).click()
 
     def _log_in(self, driver):
         self._log_in_customer_number(driver)
@@ -136,15 +160,18 @@ class Natwest(Bank):
 
     def _navigate_to_downloads_page(self, driver):
         self._switch_to_security_frame(driver)
-        driver.find_element_by_xpath(STATEMENTS).click()
-        driver.find_element_by_id(DOWNLOAD_TRANSACTIONS_BUTTON).click()
+        driver.wait_for_clickable(By.XPATH, STATEMENTS).click()
+        driver.wait_for_clickable(By.ID, DOWNLOAD_TRANSACTIONS_BUTTON).click()
 
     def _initiate_download(self, driver):
-        period = ui.Select(driver.find_element_by_name(DOWNLOAD_PERIOD_DROPDOWN))
+        period = ui.Select(driver.wait_for_element(By.NAME, DOWNLOAD_PERIOD_DROPDOWN))
         period.select_by_visible_text("Last 1 month (4 weeks)")
 
-        format = ui.Select(driver.find_element_by_name(DOWNLOAD_FILE_TYPE_DROPDOWN))
+        format = ui.Select(
+            driver.wait_for_element(By.NAME, DOWNLOAD_FILE_TYPE_DROPDOWN)
+        )
         format.select_by_visible_text("Microsoft Money (OFX file)")
 
-        driver.find_element_by_name(NEXT_BUTTON).click()
-        driver.find_element_by_name(DOWNLOAD_BUTTON).click()
+        driver.wait_for_clickable(By.NAME, NEXT_BUTTON).click()
+        with driver.wait_for_download_started():
+            driver.wait_for_clickable(By.NAME, DOWNLOAD_BUTTON).click()
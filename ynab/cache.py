@@ -0,0 +1,79 @@
+"""
+Local caches of data fetched from YNAB, so that later runs only need to fetch changes
+"""
+import json
+import os
+from datetime import date
+
+CACHE_FORMAT_VERSION = 1
+
+
+class TransactionCache:
+    """
+    The transactions of an account or budget as last fetched from YNAB, with the
+    server_knowledge they correspond to, persisted as a JSON file. Passing the
+    server_knowledge back to YNAB as last_knowledge_of_server makes it return only the
+    transactions that were created, updated or deleted since.
+    """
+
+    def __init__(self, path: str, since_date: date):
+        self.path = path
+        self.since_date = since_date.isoformat()
+        self.server_knowledge = None
+        self.transactions = {}  # YNAB transaction id -> fields we use
+        self._load()
+
+    def merge(self, transactions, server_knowledge: int):
+        """
+        Applies the transactions of a (delta) response from YNAB to the cache
+        """
+        for t in transactions:
+            if t["deleted"] or t["date"] < self.since_date:
+                # an update may move a cached transaction out of the date range
+                self.transactions.pop(t["id"], None)
+            else:
+                self.transactions[t["id"]] = {
+                    "account_id": t["account_id"],
+                    "date": t["date"],
+                    "amount": t["amount"],
+                    "payee_name": t["payee_name"],
+                    "memo": t["memo"],
+                }
+        self.server_knowledge = server_knowledge
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(
+                {
+                    "version": CACHE_FORMAT_VERSION,
+                    "since_date": self.since_date,
+                    "server_knowledge": self.server_knowledge,
+                    "transactions": self.transactions,
+                },
+                file,
+            )
+        os.replace(temporary_path, self.path)
+
+    def _load(self):
+        """
+        Loads the cache file if there is one that covers our date range. Transactions
+        that have since dropped out of the date range are forgotten.
+        """
+        try:
+            with open(self.path) as file:
+                cached = json.load(file)
+        except (OSError, ValueError):
+            return
+        if (
+            cached.get("version") != CACHE_FORMAT_VERSION
+            or cached["since_date"] > self.since_date
+        ):
+            return
+        self.server_knowledge = cached["server_knowledge"]
+        self.transactions = {
+            id: t
+            for id, t in cached["transactions"].items()
+            if t["date"] >= self.since_date
+        }
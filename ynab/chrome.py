@@ -1,27 +1,248 @@
+import json
 import os
 import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import urlparse
 
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+from selenium.webdriver.support.expected_conditions import (
+    element_to_be_clickable,
+    invisibility_of_element_located,
+    presence_of_element_located,
+)
+from selenium.webdriver.support.wait import WebDriverWait
+
+from ynab import fileutils
+
+# how long to wait for a page to show an element, or to settle, before giving up
+DEFAULT_WAIT_SECONDS = 10
+DOWNLOAD_START_SECONDS = 30
+# the network is idle once no resource has finished loading for this long
+NETWORK_IDLE_SECONDS = 0.5
+_POLL_SECONDS = 0.1
+
+# the fields of a cookie from Network.getAllCookies that Network.setCookies accepts
+_COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite")
+
+# URL patterns of the images, media and fonts that lean browsers don't load, by the
+# extension at the end of the path, with or without a query
+BLOCKED_RESOURCE_PATTERNS = [
+    f"*.{extension}{query}"
+    for query in ["", "?*"]
+    for extension in (
+        ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp"]
+        + ["mp4", "webm", "ogg", "mp3", "wav", "m4a"]
+        + ["woff", "woff2", "ttf", "otf", "eot"]
+    )
+]
+
+# third-party analytics, advertising and tracking that lean browsers don't load, in
+# addition to any configured
+DEFAULT_BLOCKED_DOMAINS = [
+    "doubleclick.net",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "facebook.net",
+    "hotjar.com",
+    "demdex.net",
+    "omtrdc.net",
+    "adobedtm.com",
+    "optimizely.com",
+    "qualtrics.com",
+    "tealiumiq.com",
+]
+
+# features that a lean browser turns off, since none are needed to download exports
+LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--disable-sync",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+Traffic = namedtuple("Traffic", ["bytes", "page_loads", "page_load_seconds"])
 
 
 class Chrome(webdriver.Chrome):
-    """ An optionally headless Chrome with a preset download directory """
+    """ An optionally headless Chrome with a preset download directory, which records
+    its network traffic. A lean Chrome doesn't load images, media, fonts or anything
+    from the blocked domains, and stops waiting for pages once their HTML is parsed.
+
+    Rather than an implicit wait on every lookup, each step waits explicitly for what
+    it needs with the wait_for_* methods, and the time taken by each is recorded in
+    the steps attribute.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.steps = []  # (description, seconds) of each wait since the last reset
+        self.visited_origins = set()  # of the pages loaded since the last reset
 
     @classmethod
-    def construct(cls, download_directory: str, headless: bool):
+    def construct(
+        cls, download_directory: str, headless: bool, lean=False, blocked_domains=()
+    ):
         options = webdriver.chrome.options.Options()
         prefs = {"download.default_directory": download_directory}
-        options.add_experimental_option("prefs", prefs)
         options.add_argument("--window-size=1920x1080")
         if headless:
             options.add_argument("--headless")
             options.add_argument("--disable-gpu")
-        driver = cls(chrome_options=options)
+        capabilities = DesiredCapabilities.CHROME.copy()
+        capabilities["goog:loggingPrefs"] = {"performance": "ALL"}
+        if lean:
+            prefs["profile.managed_default_content_settings.images"] = 2
+            for argument in LEAN_ARGUMENTS:
+                options.add_argument(argument)
+            capabilities["pageLoadStrategy"] = "eager"
+        options.add_experimental_option("prefs", prefs)
+        driver = cls(chrome_options=options, desired_capabilities=capabilities)
         driver._enable_download_in_headless_chrome(download_directory)
-        driver.implicitly_wait(10)
+        if lean:
+            driver._block_urls(
+                BLOCKED_RESOURCE_PATTERNS
+                + [
+                    f"*://*.{domain}/*"
+                    for domain in DEFAULT_BLOCKED_DOMAINS + list(blocked_domains)
+                ]
+            )
         return driver
 
+    def wait_for_element(self, by, value, timeout=DEFAULT_WAIT_SECONDS):
+        """ Returns the element once it is on the page
+
+        Raises:
+            TimeoutException if it isn't after timeout seconds
+        """
+        with self._timed(f"element {value}"):
+            return self._wait(timeout).until(
+                presence_of_element_located((by, value)),
+                f"No element {value} after {timeout}s",
+            )
+
+    def wait_for_clickable(self, by, value, timeout=DEFAULT_WAIT_SECONDS):
+        """ Returns the element once it is visible and enabled
+
+        Raises:
+            TimeoutException if it isn't after timeout seconds
+        """
+        with self._timed(f"clickable {value}"):
+            return self._wait(timeout).until(
+                element_to_be_clickable((by, value)),
+                f"Element {value} not clickable after {timeout}s",
+            )
+
+    def wait_for_invisible(self, by, value, timeout=DEFAULT_WAIT_SECONDS):
+        """ Waits until the element is hidden or gone
+
+        Raises:
+            TimeoutException if it is still shown after timeout seconds
+        """
+        with self._timed(f"invisible {value}"):
+            self._wait(timeout).until(
+                invisibility_of_element_located((by, value)),
+                f"Element {value} still visible after {timeout}s",
+            )
+
+    def has_element(self, by, value, timeout=DEFAULT_WAIT_SECONDS) -> bool:
+        """ Whether the element is on the page within timeout seconds """
+        try:
+            self.wait_for_element(by, value, timeout)
+        except TimeoutException:
+            return False
+        return True
+
+    def wait_for_network_idle(
+        self, idle_seconds=NETWORK_IDLE_SECONDS, timeout=DEFAULT_WAIT_SECONDS
+    ):
+        """ Waits until the page has loaded and no resource has finished loading for
+        idle_seconds, e.g. after a click that fetches part of a page
+
+        Raises:
+            TimeoutException if the network is still busy after timeout seconds
+        """
+        with self._timed("network idle"):
+            start = time.monotonic()
+            state, idle_since = None, start
+            while True:
+                previous_state, state = state, self.execute_script(
+                    "return [document.readyState, "
+                    "performance.getEntriesByType('resource').length];"
+                )
+                now = time.monotonic()
+                if state != previous_state:
+                    idle_since = now
+                elif state[0] == "complete" and now - idle_since >= idle_seconds:
+                    return
+                if now - start >= timeout:
+                    raise TimeoutException(f"Network still busy after {timeout}s")
+                time.sleep(_POLL_SECONDS)
+
+    @contextmanager
+    def wait_for_download_started(self, timeout=DOWNLOAD_START_SECONDS):
+        """ Waits, after the body of the with statement, until a new file, even a
+        partial one, appears in the download directory
+
+        Raises:
+            TimeoutException if none does after timeout seconds
+        """
+        existing = os.listdir(self.download_directory)
+        yield
+        with self._timed("download started"):
+            try:
+                fileutils.wait_for_new_file(self.download_directory, existing, timeout)
+            except TimeoutError as e:
+                raise TimeoutException(str(e)) from e
+
+    def _wait(self, timeout):
+        return WebDriverWait(self, timeout, poll_frequency=_POLL_SECONDS)
+
+    @contextmanager
+    def _timed(self, description):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((description, time.perf_counter() - start))
+
+    def traffic(self) -> Traffic:
+        """ The bytes received and the pages loaded, and the time taken to load them,
+        since the last call. The origins of the pages are added to visited_origins.
+        """
+        received = 0
+        page_loads = 0
+        page_load_seconds = 0.0
+        started = {}  # frame id -> milliseconds
+        for entry in self.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            method, params = message["method"], message["params"]
+            if method == "Network.loadingFinished":
+                received += params["encodedDataLength"]
+            elif method == "Page.frameStartedLoading":
+                started[params["frameId"]] = entry["timestamp"]
+            elif method == "Page.frameNavigated":
+                origin = params["frame"].get("securityOrigin", "")
+                if origin.startswith(("http://", "https://")):
+                    self.visited_origins.add(origin)
+            elif method == "Page.frameStoppedLoading":
+                start = started.pop(params["frameId"], None)
+                if start is not None:
+                    page_loads += 1
+                    page_load_seconds += (entry["timestamp"] - start) / 1000
+        return Traffic(received, page_loads, page_load_seconds)
+
     def take_screenshot(self) -> str:
         """ Save a screenshot in a temporary directory and return its path """
 
@@ -32,16 +253,154 @@ class Chrome(webdriver.Chrome):
         self.get_screenshot_as_file(path)
         return path
 
+    def reset(self, download_directory: str):
+        """ Forget everything about the previous bank, i.e. cookies, storage and
+        cache, and download into a new directory, so that the browser can be reused.
+        Storage can only be cleared origin by origin, so it is cleared for every origin
+        that a page was loaded from since the last reset.
+        """
+        self.traffic()  # to note the origins of any pages not yet seen
+        origin = urlparse(self.current_url)
+        if origin.scheme in ("http", "https"):
+            self.visited_origins.add(f"{origin.scheme}://{origin.netloc}")
+        for visited in sorted(self.visited_origins):
+            self._send_command(
+                "Storage.clearDataForOrigin", {"origin": visited, "storageTypes": "all"}
+            )
+        self.visited_origins = set()
+        self.get("about:blank")
+        self._send_command("Network.clearBrowserCookies", {})
+        self._send_command("Network.clearBrowserCache", {})
+        self._enable_download_in_headless_chrome(download_directory)
+        self.traffic()  # so that the next bank's traffic starts from zero
+        self.steps = []
+
+    def session(self) -> dict:
+        """ The cookies of every domain, and the local storage of the current page's
+        origin, from which restore_session() can continue a logged in session
+        """
+        cookies = self._send_command("Network.getAllCookies", {})["value"]["cookies"]
+        origin = urlparse(self.current_url)
+        local_storage = {}
+        if origin.scheme in ("http", "https"):
+            local_storage = self.execute_script(
+                "return Object.assign({}, window.localStorage);"
+            )
+        return {
+            "cookies": cookies,
+            "origin": f"{origin.scheme}://{origin.netloc}",
+            "local_storage": local_storage,
+        }
+
+    def restore_session(self, session: dict):
+        """ Sets the cookies and local storage of a session from session(), leaving
+        the browser on the session's origin """
+        cookies = []
+        for cookie in session["cookies"]:
+            restored = {k: cookie[k] for k in _COOKIE_FIELDS if k in cookie}
+            if not cookie.get("session", False):
+                restored["expires"] = cookie["expires"]
+            cookies.append(restored)
+        self._send_command("Network.setCookies", {"cookies": cookies})
+        if session["local_storage"]:
+            self.get(session["origin"])
+            self.execute_script(
+                "for (const [k, v] of Object.entries(arguments[0])) "
+                "window.localStorage.setItem(k, v);",
+                session["local_storage"],
+            )
+
     def _enable_download_in_headless_chrome(self, download_dir):
         """ Workaround for a bug in Chromium. See comment #86 of the below link:
         https://bugs.chromium.org/p/chromium/issues/detail?id=696481
         """
+        self._send_command(
+            "Page.setDownloadBehavior",
+            {"behavior": "allow", "downloadPath": download_dir},
+        )
+        self.download_directory = download_dir
+
+    def _block_urls(self, patterns):
+        """ Fails every request to a URL matching any of the wildcard patterns """
+        self._send_command("Network.enable", {})
+        self._send_command("Network.setBlockedURLs", {"urls": patterns})
+
+    def _send_command(self, cmd, params):
+        """ Sends a command to the Chrome DevTools Protocol """
         self.command_executor._commands["send_command"] = (
             "POST",
             "/session/$sessionId/chromium/send_command",
         )  # noqa
-        params = {
-            "cmd": "Page.setDownloadBehavior",
-            "params": {"behavior": "allow", "downloadPath": download_dir},
-        }
-        self.execute("send_command", params)
+        return self.execute("send_command", {"cmd": cmd, "params": params})
+
+
+class ChromePool:
+    """ Keeps Chrome instances warm so that they can be reused from one bank to the
+    next rather than started afresh each time. Safe to share between threads.
+    """
+
+    def __init__(self, headless: bool, lean=False, blocked_domains=()):
+        self.headless = headless
+        self.lean = lean
+        self.blocked_domains = list(blocked_domains)
+        self.starts = 0
+        self.startup_seconds = 0.0
+        self.reuses = 0
+        self.reuse_seconds = 0.0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, download_directory: str) -> Chrome:
+        """ Returns an idle browser, reset to download into the given directory, or a
+        new browser if none are idle
+        """
+        with self._lock:
+            driver = self._idle.pop() if self._idle else None
+
+        start = time.perf_counter()
+        if driver is not None:
+            try:
+                driver.reset(download_directory)
+            except Exception:
+                # the browser died or hung while idle, so start a fresh one instead
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                driver = None
+        reused = driver is not None
+        if not reused:
+            driver = Chrome.construct(
+                download_directory, self.headless, self.lean, self.blocked_domains
+            )
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            if reused:
+                self.reuses += 1
+                self.reuse_seconds += seconds
+            else:
+                self.starts += 1
+                self.startup_seconds += seconds
+        return driver
+
+    def release(self, driver: Chrome, reusable: bool = True):
+        """ Returns a browser to the pool, or quits it if it is not fit for reuse """
+        if reusable:
+            with self._lock:
+                self._idle.append(driver)
+        else:
+            driver.quit()
+
+    def close(self):
+        """ Quits all idle browsers """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            driver.quit()
+
+    def summary(self) -> str:
+        return (
+            f"Browser startup: {self.startup_seconds:.1f}s for {self.starts} "
+            f"browser(s), reuse: {self.reuse_seconds:.1f}s for {self.reuses} reuse(s)"
+        )
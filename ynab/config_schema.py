@@ -1,23 +1,38 @@
+import importlib
+
 import yaml
 from schema import Optional, Or, Schema
 
-from ynab.banks.amex_com import Amex
-from ynab.banks.dkb_de import DKB
-from ynab.banks.halifax_com import Halifax
-from ynab.banks.hsbc_com import HSBC
-from ynab.banks.natwest_com import Natwest
-
-BANKS = {"amex": Amex, "halifax": Halifax, "hsbc": HSBC, "natwest": Natwest, "dkb": DKB}
+# the dotted path of the class of each bank type, whose module is only imported when
+# a bank of that type is configured
+BANKS = {
+    "amex": "ynab.banks.amex_com.Amex",
+    "halifax": "ynab.banks.halifax_com.Halifax",
+    "hsbc": "ynab.banks.hsbc_com.HSBC",
+    "natwest": "ynab.banks.natwest_com.Natwest",
+    "dkb": "ynab.banks.dkb_de.DKB",
+}
 _BANK_SCHEMA = {
     "type": Or(*BANKS.keys()),
     Optional("secrets_keys"): {str: str},
     "target": {"budget_id": str, "account_id": str},
     Optional(str): object,
 }
-_YNAB_SCHEMA = {"secrets_keys": {"access_token": str}}
+_YNAB_SCHEMA = {
+    "secrets_keys": {"access_token": str},
+    Optional("url"): str,
+    Optional("timeout_seconds"): Or(int, float),
+    Optional("connection_pool_size"): int,
+}
 _KEYRING_SCHEMA = {"username": str}
+_BROWSER_SCHEMA = {Optional("blocked_domains"): [str]}
 _CONFIG_SCHEMA = Schema(
-    {"banks": [_BANK_SCHEMA], "ynab": _YNAB_SCHEMA, "keyring": _KEYRING_SCHEMA}
+    {
+        "banks": [_BANK_SCHEMA],
+        "ynab": _YNAB_SCHEMA,
+        "keyring": _KEYRING_SCHEMA,
+        Optional("browser"): _BROWSER_SCHEMA,
+    }
 )
 
 
@@ -27,6 +42,16 @@ def parse_config(config):
     return _CONFIG_SCHEMA.validate(config)
 
 
+def bank_class(bank_type):
+    """ The class of a bank type, importing its module if BANKS has its dotted path
+    """
+    class_ = BANKS[bank_type]
+    if isinstance(class_, str):
+        module_name, _, class_name = class_.rpartition(".")
+        class_ = getattr(importlib.import_module(module_name), class_name)
+    return class_
+
+
 def load_config(config_file):
     with open(config_file) as conf:
         loaded_config = yaml.safe_load(conf)
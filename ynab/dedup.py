@@ -0,0 +1,79 @@
+"""
+Suppression of transactions that were already pushed to YNAB, so that each run only
+sends what is new
+"""
+import json
+import os
+from typing import Iterable
+
+from ynab.api import TransactionStore
+from ynab.transactions import Transaction
+
+PUSHED_IMPORT_IDS_FORMAT_VERSION = 1
+
+
+class PushedImportIds:
+    """
+    The import ids of the transactions pushed to each account, with their dates,
+    persisted as a JSON file. Ids dated before the earliest transaction that the bank
+    last returned for the account are forgotten, since it no longer returns anything
+    that old, so the file stays small however far back a bank's downloads go.
+
+    A set is used rather than a Bloom filter since a false positive would silently drop
+    a new transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.import_ids = {}  # account id -> import id -> ISO date
+        self._load()
+
+    def unpushed(
+        self, account_id: str, transaction_store: TransactionStore
+    ) -> TransactionStore:
+        """
+        The transactions of the store, as downloaded from the bank, whose import ids
+        have not been pushed to the account before. The ids dated before the store's
+        earliest transaction are forgotten.
+        """
+        pushed = self.import_ids.get(account_id)
+        if not pushed:
+            return transaction_store
+        transactions = transaction_store.transactions
+        if transactions:
+            earliest = min(t.date for t in transactions).isoformat()
+            self.import_ids[account_id] = pushed = {
+                import_id: iso_date
+                for import_id, iso_date in pushed.items()
+                if iso_date >= earliest
+            }
+        return TransactionStore(t for t in transactions if t.import_id not in pushed)
+
+    def record_pushed(self, account_id: str, transactions: Iterable[Transaction]):
+        pushed = self.import_ids.setdefault(account_id, {})
+        for t in transactions:
+            pushed[t.import_id] = t.date.isoformat()
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(
+                {
+                    "version": PUSHED_IMPORT_IDS_FORMAT_VERSION,
+                    "import_ids": self.import_ids,
+                },
+                file,
+            )
+        os.replace(temporary_path, self.path)
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return
+        if saved.get("version") != PUSHED_IMPORT_IDS_FORMAT_VERSION:
+            return
+        self.import_ids = saved["import_ids"]
@@ -1,29 +1,187 @@
+import ctypes
+import ctypes.util
 import glob
 import os.path
-
-from polling import poll
+import select
+import sys
+import threading
+import time
+from collections import defaultdict
 
 _WAIT_FOR_FILE_DOWNLOAD_SECONDS = 60
+
+# polling fallback: start checking quickly and back off to once a second
 _WAIT_FOR_FILE_DOWNLOAD_POLL_SECONDS = 1
+_WAIT_FOR_FILE_DOWNLOAD_FIRST_POLL_SECONDS = 0.05
+
+# a file is complete once its size has stopped changing for this long
+_SIZE_STABLE_SECONDS = 0.2
+
+# suffixes of files that browsers download into before renaming them
+_PARTIAL_DOWNLOAD_SUFFIXES = (".crdownload", ".part", ".download", ".tmp")
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+
+_wait_seconds = defaultdict(float)
+_wait_seconds_lock = threading.Lock()
 
 
 def wait_for_file(dir, file_extension):
     return _wait_for_file(dir, "*" + file_extension)
 
 
-def wait_for_file_with_prefix(dir, file_extension, file_prefix):
-    """ Waits for _WAIT_FOR_FILE_DOWNLOAD_SECONDS seconds until a
-    file exists in the given directory.  When it does, returns the
-    full file path to that file, or the first file if there are many
+def wait_for_file_with_prefix(dir, file_extension, file_prefix, count=1):
+    """ Waits for _WAIT_FOR_FILE_DOWNLOAD_SECONDS seconds until count
+    files exist in the given directory.  When they do, returns the
+    full file paths to those files, or to all of them if there are more
     """
-    return _wait_for_file(dir, file_prefix + "*" + file_extension)
+    return _wait_for_file(dir, file_prefix + "*" + file_extension, count)
+
 
+def wait_for_new_file(dir, existing, timeout):
+    """ Waits until a file that is not among the existing names appears in the
+    directory, even a partial download
+
+    Raises:
+        TimeoutError if there is no new file after timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    with _watcher(dir) as watcher:
+        while True:
+            if set(os.listdir(dir)) - set(existing):
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No download into {dir} after {timeout} seconds")
+            watcher.wait(remaining)
 
-def _wait_for_file(dir, path):
+
+def wait_seconds(dir):
+    """ Total time spent waiting for downloads into the given directory """
+    with _wait_seconds_lock:
+        return _wait_seconds.get(dir, 0.0)
+
+
+def _wait_for_file(dir, path, count=1):
+    """ Waits until at least count files matching the pattern have been completely
+    written, i.e. they are not partial downloads and their sizes have stopped changing.
+
+    Returns: the paths of all completely-written matching files, in the order they
+        were last modified
+
+    Raises:
+        TimeoutError if there are fewer such files after
+            _WAIT_FOR_FILE_DOWNLOAD_SECONDS
+    """
     g = os.path.join(dir, path)
-    poll(
-        lambda: glob.glob(g),
-        timeout=_WAIT_FOR_FILE_DOWNLOAD_SECONDS,
-        step=_WAIT_FOR_FILE_DOWNLOAD_POLL_SECONDS,
-    )
-    return glob.glob(g)
+    start = time.monotonic()
+    deadline = start + _WAIT_FOR_FILE_DOWNLOAD_SECONDS
+    sizes = {}
+    try:
+        with _watcher(dir) as watcher:
+            while True:
+                previous_sizes, sizes = sizes, _sizes(g)
+                complete = [
+                    p
+                    for p, size in sizes.items()
+                    if size and size == previous_sizes.get(p)
+                ]
+                if len(complete) >= count:
+                    return sorted(complete, key=os.path.getmtime)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"{len(complete)} of {count} downloads matching {g} complete "
+                        f"after {_WAIT_FOR_FILE_DOWNLOAD_SECONDS} seconds"
+                    )
+                # if something is there, check again soon to see if it has settled
+                if sizes:
+                    remaining = min(remaining, _SIZE_STABLE_SECONDS)
+                watcher.wait(remaining)
+    finally:
+        with _wait_seconds_lock:
+            _wait_seconds[dir] += time.monotonic() - start
+
+
+def _sizes(g):
+    """ Returns a dictionary of path to size for all files matching the glob that are
+    not partial downloads """
+    sizes = {}
+    for p in glob.glob(g):
+        if p.endswith(_PARTIAL_DOWNLOAD_SUFFIXES) or any(
+            os.path.exists(p + suffix) for suffix in _PARTIAL_DOWNLOAD_SUFFIXES
+        ):
+            continue
+        try:
+            sizes[p] = os.path.getsize(p)
+        except OSError:  # e.g. renamed since the glob
+            pass
+    return sizes
+
+
+def _watcher(dir):
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifyWatcher(dir)
+        except OSError:
+            pass
+    return _PollingWatcher()
+
+
+class _PollingWatcher:
+    """ Waits with an exponentially increasing interval, up to
+    _WAIT_FOR_FILE_DOWNLOAD_POLL_SECONDS """
+
+    def __init__(self):
+        self._step = _WAIT_FOR_FILE_DOWNLOAD_FIRST_POLL_SECONDS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(min(self._step, timeout))
+        self._step = min(self._step * 2, _WAIT_FOR_FILE_DOWNLOAD_POLL_SECONDS)
+
+
+class _InotifyWatcher:
+    """ Waits for a file in the directory to be created, closed after writing, or
+    moved into place, using Linux's inotify
+
+    Raises:
+        OSError if inotify is unavailable
+    """
+
+    def __init__(self, dir):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(dir), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {dir}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        os.close(self._fd)
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if readable:
+            # drain the events: the caller re-examines the directory anyway
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
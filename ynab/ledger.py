@@ -0,0 +1,148 @@
+"""
+A local SQLite database of the transactions pushed to and fetched from YNAB, so that
+each run can build on the history of the ones before it
+"""
+import sqlite3
+from datetime import date
+from typing import Iterable, Set
+
+from ynab.api import TransactionStore
+from ynab.transactions import Transaction
+
+PUSHED = "pushed"
+FETCHED = "fetched"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    source TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    import_id TEXT,
+    date INTEGER NOT NULL,
+    milliunit_amount INTEGER NOT NULL,
+    payee_name TEXT NOT NULL,
+    memo TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_by_import_id
+    ON transactions (source, account_id, import_id);
+CREATE INDEX IF NOT EXISTS transactions_by_account_date_amount
+    ON transactions (account_id, date, milliunit_amount);
+"""
+
+
+class Ledger:
+    """
+    Transactions keyed by source (PUSHED or FETCHED), account and import id, with dates
+    stored as ordinals and indexed together with the account and amount for range
+    queries
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+
+    def record_pushed(self, account_id: str, transactions: Iterable[Transaction]):
+        """
+        Records transactions that were pushed to YNAB. Transactions that were pushed
+        before are left as they are.
+        """
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _rows(PUSHED, account_id, transactions),
+            )
+
+    def record_fetched(
+        self, account_id: str, transactions: Iterable[Transaction], since_date: date
+    ):
+        """
+        Records the transactions fetched from YNAB for the given account, which cover
+        everything from since_date onwards and so replace those recorded before from
+        that date on. They are keyed by their YNAB transaction ids, which the stores
+        from YNAB.get and YNAB.get_budget carry as their import ids, since locally
+        generated import ids would merge distinct transactions on YNAB.
+        """
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM transactions "
+                "WHERE account_id = ? AND date >= ? AND source = ?",
+                (account_id, since_date.toordinal(), FETCHED),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _rows(FETCHED, account_id, transactions),
+            )
+
+    def unpushed(
+        self, account_id: str, transaction_store: TransactionStore
+    ) -> TransactionStore:
+        """
+        The transactions of the store that have not been pushed to the account before,
+        looked up over the range of dates that the store covers
+        """
+        transactions = transaction_store.transactions
+        if not transactions:
+            return transaction_store
+        ordinals = [t.date.toordinal() for t in transactions]
+        pushed = self.pushed(account_id).import_ids(
+            date.fromordinal(min(ordinals)), date.fromordinal(max(ordinals))
+        )
+        return TransactionStore(t for t in transactions if t.import_id not in pushed)
+
+    def pushed(self, account_id: str) -> "LedgerView":
+        return LedgerView(self._connection, PUSHED, account_id)
+
+    def fetched(self, account_id: str) -> "LedgerView":
+        return LedgerView(self._connection, FETCHED, account_id)
+
+    def close(self):
+        self._connection.close()
+
+
+class LedgerView:
+    """
+    The transactions of one account from one source, queried by date range
+    """
+
+    def __init__(self, connection: sqlite3.Connection, source: str, account_id: str):
+        self._connection = connection
+        self._source = source
+        self._account_id = account_id
+
+    def between(self, start: date, end: date) -> TransactionStore:
+        """
+        The transactions dated from start to end inclusive, in date order
+        """
+        cursor = self._connection.execute(
+            "SELECT date, payee_name, memo, milliunit_amount, import_id "
+            "FROM transactions "
+            "WHERE account_id = ? AND date BETWEEN ? AND ? AND source = ? "
+            "ORDER BY date, rowid",
+            self._parameters(start, end),
+        )
+        return TransactionStore(
+            Transaction(date.fromordinal(row[0]), *row[1:]) for row in cursor
+        )
+
+    def import_ids(self, start: date, end: date) -> Set[str]:
+        cursor = self._connection.execute(
+            "SELECT import_id FROM transactions "
+            "WHERE account_id = ? AND date BETWEEN ? AND ? AND source = ?",
+            self._parameters(start, end),
+        )
+        return {import_id for (import_id,) in cursor}
+
+    def _parameters(self, start, end):
+        return self._account_id, start.toordinal(), end.toordinal(), self._source
+
+
+def _rows(source, account_id, transactions):
+    for t in transactions:
+        yield (
+            source,
+            account_id,
+            t.import_id,
+            t.date.toordinal(),
+            t.milliunit_amount,
+            t.payee_name,
+            t.memo,
+        )
@@ -4,29 +4,31 @@ Pull down and import transaction histories into ynab.
 """
 
 import argparse
+import io
 import os
 import shutil
 import sys
 import tempfile
+import time
+import traceback
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 from pprint import pprint
+from typing import TYPE_CHECKING
 
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from ynab import __version__
 
-from ynab import __version__, config_schema
-from ynab.api import BANK_DATE_RANGE, YNAB, TransactionStore  # norc
-from ynab.chrome import Chrome
-from ynab.secrets import Keyring
-from ynab.transactions import (
-    MAX_COMPARE_DAYS,
-    pretty_format_transactions,
-    transactions_difference,
-)
+# selenium, requests, keyring and fuzzywuzzy are imported by the functions that use
+# them, so that --version and argument errors don't pay for importing them
+if TYPE_CHECKING:
+    from ynab.api import TransactionStore
+    from ynab.chrome import ChromePool
 
 DEFAULT_YNAB_CONFIGURATION = os.path.expanduser("~/.ynab.conf")
 TEMPORARY_DIRECTORY_PARENT = os.path.expanduser("~/Downloads")
 Target = namedtuple("BankTarget", ["bank", "budget_id", "account_id"])
+Download = namedtuple("Download", ["transaction_store", "log", "error"])
 
 
 def _parse_arguments(args):
@@ -41,55 +43,261 @@ def _parse_arguments(args):
     parser.add_argument(
         "--headless", action="store_true", help="Do not open a visible browser window"
     )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="Do not load images, media, fonts or third-party trackers in the browser, "
+        "nor wait for pages to finish loading them",
+    )
     parser.add_argument(
         "--no-cleanup",
         action="store_true",
         help="Do not delete downloaded transaction data",
     )
+    parser.add_argument(
+        "--parallel",
+        type=_positive_int,
+        default=1,
+        metavar="N",
+        help="Download from up to N banks at once, each in its own browser",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Push transactions to YNAB in concurrent chunks of at most this size",
+    )
+    parser.add_argument(
+        "--cache-directory",
+        type=str,
+        help="Cache transactions fetched from YNAB here and only fetch changes",
+    )
+    parser.add_argument(
+        "--pushed-ids",
+        type=str,
+        help="Record the import ids of transactions pushed to YNAB in this JSON file "
+        "and skip those already pushed",
+    )
+    parser.add_argument(
+        "--ledger",
+        type=str,
+        help="Record transactions in this SQLite database and skip those already "
+        "pushed",
+    )
+    parser.add_argument(
+        "--session-directory",
+        type=str,
+        help="Save each bank's session here after logging in, encrypted with a key in "
+        "the keyring, and restore it next time to skip the login while it is valid. "
+        "Banks that support it are then fetched over HTTP without a browser",
+    )
     parser.add_argument("-v", "--verbose", action="store_true")
     parser.add_argument("--version", action="store_true", help="Print version and exit")
     return parser.parse_args(args)
 
 
-def _construct_target(config, keyring):
+def _positive_int(string):
+    value = int(string)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def _construct_target(config, keyring, session_store=None):
+    from ynab import config_schema
+
     bank_type = config.pop("type")
-    class_ = config_schema.BANKS[bank_type]
+    class_ = config_schema.bank_class(bank_type)
     bank = class_.from_config(config, keyring)
+    bank.session_store = session_store
     budget_id = config["target"]["budget_id"]
     account_id = config["target"]["account_id"]
     return Target(bank, budget_id, account_id)
 
 
 def _fetch_transactions_from_bank(
-    bank: Target, headless: bool, no_cleanup: bool, transaction_store: TransactionStore,
+    bank: Target,
+    browser_pool: "ChromePool",
+    no_cleanup: bool,
+    transaction_store: "TransactionStore",
+    log=sys.stdout,
 ):
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    from ynab import fileutils
+
     download_directory = tempfile.mkdtemp(dir=TEMPORARY_DIRECTORY_PARENT)
-    driver = Chrome.construct(download_directory, headless)
+    driver = None
+    reusable = False
 
     try:
+        driver = browser_pool.acquire(download_directory)
         bank.fetch_transactions(driver, transaction_store, download_directory)
-    except (TimeoutException, WebDriverException) as e:
-        sys.stderr.write(f"{e}\n")
-        path = driver.take_screenshot()
-        sys.stderr.write(f"Screenshot saved to {path}\n")
+        reusable = True
+        traffic = driver.traffic()
+        print(
+            f"Transferred {traffic.bytes / 2 ** 20:.2f} MiB in {traffic.page_loads} "
+            f"page loads taking {traffic.page_load_seconds:.1f}s",
+            file=log,
+        )
+        waited = sum(seconds for _, seconds in driver.steps)
+        print(f"Waited {waited:.1f}s in {len(driver.steps)} steps:", file=log)
+        for description, seconds in driver.steps:
+            print(f"  {seconds:6.2f}s {description}", file=log)
+    except (TimeoutException, TimeoutError, WebDriverException) as e:
+        # TimeoutError from the fileutils waits for a completed download
+        print(e, file=log)
+        if driver:
+            path = driver.take_screenshot()
+            print(f"Screenshot saved to {path}", file=log)
     finally:
-        driver.quit()
+        if driver:
+            browser_pool.release(driver, reusable)
+        print(
+            f"Waited {fileutils.wait_seconds(download_directory):.1f}s for downloads",
+            file=log,
+        )
         if no_cleanup:
-            print(f"Leaving downloaded data in {download_directory}")
+            print(f"Leaving downloaded data in {download_directory}", file=log)
         else:
-            print(f"Removing temporary directory {download_directory}")
+            print(f"Removing temporary directory {download_directory}", file=log)
             if os.path.exists(download_directory):
                 shutil.rmtree(download_directory)
 
 
-def _detect_mismatches(account_id, budget_id, transaction_store, ynab):
-    ynab_transaction_store = ynab.get(account_id, budget_id)
+def _fetch_transactions_over_http(
+    bank, http_adapter, transaction_store: "TransactionStore", log=sys.stdout
+) -> bool:
+    """
+    Fetches the transactions of a bank that supports it without a browser, using its
+    saved session and a connection from the shared pool of the adapter
+
+    :return: whether the transactions were fetched
+    """
+    if not bank.supports_http or bank.session_store is None:
+        return False
+
+    import requests
+
+    http_session = requests.Session()
+    http_session.mount("https://", http_adapter)
+    http_session.mount("http://", http_adapter)
+    start = time.perf_counter()
+    try:
+        fetched = bank.fetch_transactions_http(http_session, transaction_store)
+    except (requests.RequestException, ValueError) as e:
+        # e.g. a page that is not what we expected, if the session ended part way
+        print(f"Failed to fetch over HTTP, using the browser: {e}", file=log)
+        return False
+    if fetched:
+        seconds = time.perf_counter() - start
+        print(f"Fetched over HTTP with the saved session in {seconds:.1f}s", file=log)
+    else:
+        print("No valid saved session to fetch over HTTP, using the browser", file=log)
+    return fetched
+
+
+def _download(
+    target: Target, browser_pool: "ChromePool", no_cleanup: bool, http_adapter=None
+) -> Download:
+    """
+    Fetches the transactions of one bank, collecting its output rather than printing
+    it so that banks downloading in parallel don't interleave. Any error is caught so
+    that it only affects this bank.
+    """
+    from ynab.api import TransactionStore
+
+    log = io.StringIO()
+    transaction_store = TransactionStore()
+    error = None
+    target.bank.log = log
+    print(f"Downloading transactions from {target.bank.full_name}", file=log)
+    try:
+        if not _fetch_transactions_over_http(
+            target.bank, http_adapter, transaction_store, log
+        ):
+            _fetch_transactions_from_bank(
+                target.bank, browser_pool, no_cleanup, transaction_store, log
+            )
+    except Exception as e:
+        traceback.print_exc(file=log)
+        error = e
+    return Download(transaction_store, log.getvalue(), error)
+
+
+def _push(
+    ynab, target, transaction_store, chunk_size, verbose, push_records=()
+) -> bool:
+    """
+    Pushes the bank's transactions to YNAB. Transactions that any of the push records
+    (a Ledger or PushedImportIds) has as already pushed are suppressed, and those that
+    are pushed are recorded in all of them.
+
+    :return: whether the push succeeded
+    """
+    from requests import RequestException
+
+    count = transaction_store.count()
+    for push_record in push_records:
+        transaction_store = push_record.unpushed(target.account_id, transaction_store)
+    if transaction_store.count() < count:
+        suppressed = count - transaction_store.count()
+        print(f"Suppressed {suppressed} transactions that were already pushed")
+
+    if transaction_store.count() == 0:
+        print("No transaction to push")
+        return True
+
+    print(f"Pushing {transaction_store.count()} transactions to YNAB")
+    failed_import_ids = ()
+    try:
+        if chunk_size:
+            result = ynab.push_in_chunks(
+                transaction_store, target.account_id, target.budget_id, chunk_size
+            )
+            if result.failed_import_ids:
+                sys.stderr.write(
+                    f"Failed to push {len(result.failed_import_ids)} transactions: "
+                    f"{result.errors}\n"
+                )
+            failed_import_ids = set(result.failed_import_ids)
+            response_json = result.json()
+        else:
+            response = ynab.push(transaction_store, target.account_id, target.budget_id)
+            response_json = response.json()
+    except RequestException as e:
+        sys.stderr.write(f"Failed to push to YNAB: {e}\n")
+        return False
+
+    if push_records:
+        pushed = [
+            t
+            for t in transaction_store.transactions
+            if t.import_id not in failed_import_ids
+        ]
+        for push_record in push_records:
+            push_record.record_pushed(target.account_id, pushed)
+    if verbose:
+        pprint(response_json)
+    return True
+
+
+def _detect_mismatches(transaction_store, ynab_transaction_store):
+    """
+    Compares the recent transactions of the bank and of YNAB. Either may be anything
+    with a between(start, end) method, such as a TransactionStore or a LedgerView.
+    """
+    from ynab.api import BANK_DATE_RANGE
+    from ynab.transactions import MAX_COMPARE_DAYS, transactions_difference
+
+    # ignore differences that are too old, but compare transactions from slightly
+    # earlier so that those just after the cutoff can still be paired
+    cutoff_date = date.today() - timedelta(days=BANK_DATE_RANGE - MAX_COMPARE_DAYS)
+    start = cutoff_date - timedelta(days=MAX_COMPARE_DAYS)
     only_on_ynab, only_in_bank = transactions_difference(
-        ynab_transaction_store.transactions, transaction_store.transactions
+        ynab_transaction_store.between(start, date.max).transactions,
+        transaction_store.between(start, date.max).transactions,
     )
 
-    # ignore differences that are too old
-    cutoff_date = date.today() - timedelta(days=BANK_DATE_RANGE - MAX_COMPARE_DAYS)
     only_on_ynab = [t for t in only_on_ynab if t.date > cutoff_date]
     only_in_bank = [t for t in only_in_bank if t.date > cutoff_date]
 
@@ -102,39 +310,111 @@ def main(argv=None):
         print(__version__)
         return
 
+    from ynab import config_schema
+    from ynab.api import BANK_DATE_RANGE, YNAB, TransactionStore
+    from ynab.chrome import ChromePool
+    from ynab.dedup import PushedImportIds
+    from ynab.ledger import Ledger
+    from ynab.secrets import Keyring
+    from ynab.transactions import pretty_format_transactions
+
     config = config_schema.load_config(args.configuration_file)
     keyring = Keyring(config.pop("keyring")["username"])
     ynab = YNAB.from_config(config["ynab"], keyring)
-    targets = [_construct_target(c, keyring) for c in config["banks"]]
+    session_store = None
+    http_adapter = None
+    if args.session_directory:
+        from requests.adapters import HTTPAdapter
+
+        from ynab.sessions import SessionStore
 
-    for bank, budget_id, account_id in targets:
-        print(f"Downloading transactions from {bank.full_name}")
-        transaction_store = TransactionStore()
-        _fetch_transactions_from_bank(
-            bank, args.headless, args.no_cleanup, transaction_store
+        session_store = SessionStore.from_keyring(args.session_directory, keyring)
+        http_adapter = HTTPAdapter(
+            pool_connections=args.parallel, pool_maxsize=args.parallel
         )
+    targets = [_construct_target(c, keyring, session_store) for c in config["banks"]]
+    ledger = Ledger(args.ledger) if args.ledger else None
+    push_records = [ledger] if ledger else []
+    try:
+        if args.pushed_ids:
+            push_records.append(PushedImportIds(args.pushed_ids))
 
-        if transaction_store.count() > 0:
-            print(f"Pushing {transaction_store.count()} transactions to YNAB")
-            response = ynab.push(transaction_store, account_id, budget_id)
-            if args.verbose:
-                pprint(response.json())
-        else:
-            print("No transaction to push")
+        # banks are downloaded by a pool of workers while pushes to YNAB happen here, in
+        # the order of the configuration, as each download completes
+        failed = set()
+        transaction_stores = []
+        blocked_domains = config.get("browser", {}).get("blocked_domains", [])
+        browser_pool = ChromePool(args.headless, args.lean, blocked_domains)
+        try:
+            with ThreadPoolExecutor(max_workers=args.parallel) as executor:
+                downloads = [
+                    executor.submit(
+                        _download, target, browser_pool, args.no_cleanup, http_adapter
+                    )
+                    for target in targets
+                ]
+                for target, download in zip(targets, downloads):
+                    transaction_store, log, error = download.result()
+                    transaction_stores.append(transaction_store)
+                    sys.stdout.write(log)
+                    pushed = not error and _push(
+                        ynab,
+                        target,
+                        transaction_store,
+                        args.chunk_size,
+                        args.verbose,
+                        push_records,
+                    )
+                    if not pushed:
+                        failed.add(target)
+        finally:
+            browser_pool.close()
+            if http_adapter:
+                http_adapter.close()
 
-        # check for differences between our bank data and what is on YNAB
-        print(f"Checking for mismatches")
-        only_on_ynab, only_in_bank = _detect_mismatches(
-            account_id, budget_id, transaction_store, ynab
-        )
+        # fetch everything on YNAB once, now that all of our bank data has been pushed
+        ynab_transaction_stores = {
+            budget_id: ynab.get_budget(budget_id, args.cache_directory)
+            for budget_id in {t.budget_id for t in targets}
+        }
+
+        for target, transaction_store in zip(targets, transaction_stores):
+            bank, budget_id, account_id = target
+            if target in failed:
+                print(f"Skipping mismatch check for {bank.full_name} as it failed")
+                continue
 
-        # print any differences to the console
-        if only_on_ynab:
-            print("Extraneous in YNAB:")
-            print(pretty_format_transactions(only_on_ynab))
-        if only_in_bank:
-            print("Missing from YNAB:")
-            print(pretty_format_transactions(only_in_bank))
+            # check for differences between our bank data and what is on YNAB
+            print(f"Checking for mismatches with {bank.full_name}")
+            ynab_transaction_store = ynab_transaction_stores[budget_id].get(
+                account_id, TransactionStore()
+            )
+            if ledger:
+                since_date = date.today() - timedelta(days=BANK_DATE_RANGE)
+                ledger.record_fetched(
+                    account_id, ynab_transaction_store.transactions, since_date
+                )
+                ynab_transaction_store = ledger.fetched(account_id)
+            only_on_ynab, only_in_bank = _detect_mismatches(
+                transaction_store, ynab_transaction_store
+            )
+
+            # print any differences to the console
+            if only_on_ynab:
+                print("Extraneous in YNAB:")
+                print(pretty_format_transactions(only_on_ynab))
+            if only_in_bank:
+                print("Missing from YNAB:")
+                print(pretty_format_transactions(only_in_bank))
+
+        if args.verbose:
+            print(browser_pool.summary())
+            for method, url, status_code, seconds in ynab.timings:
+                print(f"{method} {url} {status_code} {seconds:.3f}s")
+    finally:
+        if ledger:
+            ledger.close()
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+"""
+Streaming reader for OFX and QFX statement downloads, in both the SGML flavour (OFX
+1.x, where leaf elements are not closed) and the XML flavour (OFX 2.x)
+"""
+
+import hashlib
+import re
+import sys
+from collections import namedtuple
+from html import unescape
+from typing import Iterator, Tuple
+
+from ynab import statements
+from ynab.api import TransactionStore
+
+OFX_BATCH_SIZE = 1000
+OFX_DATE_FORMAT = "%Y%m%d"  # of the first eight characters of a datetime
+READ_CHUNK_CHARACTERS = 64 * 1024
+HEADER_BYTES = 1024  # enough to find the encoding in either flavour of header
+IMPORT_ID_PREFIX = "OFX:"
+CHARACTER_LIMIT_FOR_IMPORT_ID = 36
+
+# encodings named by the CHARSET header of the SGML flavour
+_SGML_CHARSETS = {"1252": "cp1252", "ISO-8859-1": "latin-1", "UTF-8": "utf-8"}
+
+OfxTransaction = namedtuple(
+    "OfxTransaction", ["date", "payee_name", "memo", "milliunit_amount", "fitid"]
+)
+
+
+def add_transactions_from_ofx(
+    filepath: str, transaction_store: TransactionStore, log=sys.stderr
+):
+    """
+    Adds the transactions of an OFX or QFX file to the supplied store, in batches of
+    OFX_BATCH_SIZE, with import ids derived from their FITIDs. Any transactions with a
+    date in the future are skipped, and reported to log.
+    """
+    rows = (
+        (t.date, t.payee_name, t.memo, t.milliunit_amount, import_id(t.fitid))
+        for t in read_transactions(filepath)
+    )
+    statements.add_in_batches(
+        transaction_store, rows, OFX_BATCH_SIZE, with_import_ids=True, log=log
+    )
+
+
+def read_transactions(filepath: str) -> Iterator[OfxTransaction]:
+    """
+    Yields the transactions (STMTTRN elements) of an OFX or QFX file one at a time,
+    reading the file in chunks rather than all at once
+
+    :raises ValueError: if a transaction lacks a date, amount or FITID
+    """
+    with open(filepath, "rb") as file:
+        encoding = _encoding(file.read(HEADER_BYTES))
+    with open(filepath, encoding=encoding, errors="replace") as file:
+        fields = None
+        for tag, text in _elements(file):
+            if tag == "STMTTRN":
+                fields = {}
+            elif tag == "/STMTTRN" and fields is not None:
+                yield _transaction(fields)
+                fields = None
+            elif fields is not None and text and tag not in fields:
+                fields[tag] = text
+
+
+def import_id(fitid: str) -> str:
+    """
+    An import id for YNAB from a FITID, which is unique within an account and stable
+    across downloads. FITIDs too long for YNAB's limit are replaced by a hash.
+    """
+    candidate = IMPORT_ID_PREFIX + fitid
+    if len(candidate) <= CHARACTER_LIMIT_FOR_IMPORT_ID:
+        return candidate
+    digest = hashlib.sha1(fitid.encode()).hexdigest()
+    return (IMPORT_ID_PREFIX + digest)[:CHARACTER_LIMIT_FOR_IMPORT_ID]
+
+
+def parse_milliunits(string: str) -> int:
+    """
+    Parse an OFX amount like -1234.56 (or -1234,56, which some banks write) into
+    milliunits, here -1234560
+    """
+    return statements.parse_milliunits(string.replace(",", "."), thousands_separator="")
+
+
+def _transaction(fields) -> OfxTransaction:
+    try:
+        return OfxTransaction(
+            date=statements.parse_date(fields["DTPOSTED"][:8], OFX_DATE_FORMAT),
+            payee_name=fields.get("NAME", ""),
+            memo=fields.get("MEMO", ""),
+            milliunit_amount=parse_milliunits(fields["TRNAMT"]),
+            fitid=fields["FITID"],
+        )
+    except KeyError as e:
+        raise ValueError(f"Transaction has no {e.args[0]}: {fields}") from e
+
+
+def _elements(file) -> Iterator[Tuple[str, str]]:
+    """
+    Yields each tag in the file, e.g. "TRNAMT" or "/STMTTRN", with the text that
+    follows it up to the next tag. Everything before the first tag (the SGML header)
+    and processing instructions (the XML header) are skipped.
+    """
+    buffer = ""
+    in_body = False
+    while True:
+        chunk = file.read(READ_CHUNK_CHARACTERS)
+        buffer += chunk
+        if not in_body:
+            start = buffer.find("<")
+            if start < 0:
+                if chunk:
+                    continue
+                return
+            buffer = buffer[start + 1 :]
+            in_body = True
+        pieces = buffer.split("<")
+        # the last piece may continue in the next chunk
+        buffer = pieces.pop() if chunk else ""
+        for piece in pieces:
+            tag, _, text = piece.partition(">")
+            if not tag.startswith(("?", "!")):
+                yield tag.strip().upper(), unescape(text.strip())
+        if not chunk:
+            return
+
+
+def _encoding(header: bytes) -> str:
+    if header.lstrip().startswith(b"<?xml"):
+        match = re.search(rb'encoding="([^"]+)"', header)
+        return match.group(1).decode("ascii") if match else "utf-8"
+    match = re.search(rb"CHARSET:\s*(\S+)", header)
+    charset = match.group(1).decode("ascii").upper() if match else ""
+    return _SGML_CHARSETS.get(charset, "cp1252")
@@ -0,0 +1,82 @@
+"""
+Streaming reader for QIF statement downloads
+"""
+import sys
+from collections import namedtuple
+from typing import Iterable, Iterator
+
+from ynab.api import TransactionStore
+from ynab.statements import add_in_batches, parse_date, parse_milliunits
+
+QIF_BATCH_SIZE = 1000
+DEFAULT_DATE_FORMAT = "%d/%m/%Y"
+QIF_ENCODING = "cp1252"
+
+QifRecord = namedtuple("QifRecord", ["date", "payee_name", "memo", "milliunit_amount"])
+
+
+def add_transactions_from_qif(
+    filepath: str,
+    transaction_store: TransactionStore,
+    invert_amounts: bool = False,
+    date_format: str = DEFAULT_DATE_FORMAT,
+    log=sys.stderr,
+):
+    """
+    Adds the records of a QIF file to the supplied store, in batches of QIF_BATCH_SIZE,
+    optionally with the sign of every amount inverted. Any records with a date in the
+    future are skipped, and reported to log.
+    """
+    records = read_records(filepath, date_format)
+    if invert_amounts:
+        records = invert(records)
+
+    add_in_batches(transaction_store, records, QIF_BATCH_SIZE, log=log)
+
+
+def read_records(
+    filepath: str, date_format: str = DEFAULT_DATE_FORMAT
+) -> Iterator[QifRecord]:
+    """
+    Yields the records of a QIF file one at a time, reading it line by line. Of each
+    record's fields only the date (D), amount (T), payee (P) and memo (M) are used; a
+    record ends with a line holding only ^. Header lines such as !Type:CCard are
+    skipped.
+
+    :raises ValueError: if a record lacks a date or amount
+    """
+    with open(filepath, encoding=QIF_ENCODING) as file:
+        fields = {}
+        for line in file:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("!"):
+                continue
+            if line.startswith("^"):
+                if fields:
+                    yield _record(fields, date_format)
+                fields = {}
+            else:
+                fields.setdefault(line[0], line[1:].strip())
+        if fields:
+            yield _record(fields, date_format)
+
+
+def invert(records: Iterable[QifRecord]) -> Iterator[QifRecord]:
+    """
+    Inverts the sign of the amounts, for banks that export credit card spending as
+    positive amounts
+    """
+    for record in records:
+        yield record._replace(milliunit_amount=-record.milliunit_amount)
+
+
+def _record(fields, date_format) -> QifRecord:
+    try:
+        return QifRecord(
+            date=parse_date(fields["D"], date_format),
+            payee_name=fields.get("P", ""),
+            memo=fields.get("M", ""),
+            milliunit_amount=parse_milliunits(fields["T"]),
+        )
+    except KeyError as e:
+        raise ValueError(f"Record has no {e.args[0]} field: {fields}") from e
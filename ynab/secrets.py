@@ -30,3 +30,13 @@ class Keyring:
                 )
             ret[secret_name] = secret_value
         return ret
+
+    def get_or_create_secret(self, service_name, create):
+        """ Returns the value of a key in the system keyring, first storing the string
+        returned by create() under it if it doesn't exist yet
+        """
+        secret_value = keyring.get_password(service_name, self.username)
+        if secret_value is None:
+            secret_value = create()
+            keyring.set_password(service_name, self.username, secret_value)
+        return secret_value
@@ -0,0 +1,74 @@
+"""
+Browser sessions saved after logging in to a bank, so that later runs can skip the
+login, and any 2FA, for as long as the bank keeps the session alive
+"""
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+SESSION_KEY_SERVICE = "ynab_session_key"
+SESSION_FORMAT_VERSION = 1
+SESSION_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+
+class SessionStore:
+    """
+    The cookies and local storage of each bank's session, each in a file encrypted
+    with a key kept in the system keyring. Sessions older than max_age_seconds, or that
+    can't be decrypted, are treated as missing.
+    """
+
+    def __init__(
+        self, directory: str, key: bytes, max_age_seconds=SESSION_MAX_AGE_SECONDS
+    ):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self._fernet = Fernet(key)
+
+    @classmethod
+    def from_keyring(cls, directory: str, keyring):
+        """ A store encrypted with the key under SESSION_KEY_SERVICE in the keyring,
+        which is generated the first time """
+        key = keyring.get_or_create_secret(
+            SESSION_KEY_SERVICE, lambda: Fernet.generate_key().decode()
+        )
+        return cls(directory, key.encode())
+
+    def load(self, name: str) -> Optional[dict]:
+        try:
+            with open(self._path(name), "rb") as file:
+                token = file.read()
+            saved = json.loads(self._fernet.decrypt(token, ttl=self.max_age_seconds))
+        except (OSError, InvalidToken, ValueError):
+            return None
+        if saved.get("version") != SESSION_FORMAT_VERSION:
+            return None
+        return saved["session"]
+
+    def save(self, name: str, session: dict):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        token = self._fernet.encrypt(
+            json.dumps({"version": SESSION_FORMAT_VERSION, "session": session}).encode()
+        )
+        path = self._path(name)
+        temporary_path = path + ".tmp"
+        # readable only by us, even before it is written
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        with open(os.open(temporary_path, flags, 0o600), "wb") as file:
+            file.write(token)
+        os.replace(temporary_path, path)
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, name: str) -> str:
+        """ The file of a session, named by a hash so as not to reveal the login """
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.session")
@@ -0,0 +1,94 @@
+"""
+Scoring how similar transaction memos are to each other
+"""
+from collections import namedtuple
+from functools import lru_cache
+from typing import Callable, List, Sequence
+
+from fuzzywuzzy import fuzz, utils
+
+MAX_SCORE = 100
+DEFAULT_CACHE_SIZE = 4096
+
+Memo = namedtuple("Memo", ["text", "tokens"])
+
+
+def normalise(memo: str) -> Memo:
+    """
+    Lower-cases the memo, replaces everything but letters and numbers with whitespace and
+    splits it into tokens, exactly as fuzzywuzzy.process does before scoring
+    """
+    text = utils.full_process(memo or "", force_ascii=True)
+    return Memo(text=text, tokens=frozenset(text.split()))
+
+
+def wratio_scorer(a: Memo, b: Memo) -> int:
+    """
+    fuzzywuzzy's weighted ratio, the scorer used by fuzzywuzzy.process.extractOne
+    """
+    return fuzz.WRatio(a.text, b.text, full_process=False)
+
+
+def token_set_scorer(a: Memo, b: Memo) -> int:
+    """
+    The percentage of distinct tokens the two memos have in common. Much cheaper than
+    wratio_scorer but blind to word order and typos.
+    """
+    if not a.tokens or not b.tokens:
+        return 0
+    return round(MAX_SCORE * len(a.tokens & b.tokens) / len(a.tokens | b.tokens))
+
+
+SCORERS = {"wratio": wratio_scorer, "token_set": token_set_scorer}
+
+
+class MemoSimilarity:
+    """
+    Scores memos against each other. Each distinct memo is normalised only once and the
+    scores of pairs of memos are remembered, both in LRU caches of the given size.
+    """
+
+    def __init__(
+        self,
+        scorer: Callable[[Memo, Memo], int] = wratio_scorer,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self._scorer = scorer
+        self._normalise = lru_cache(maxsize=cache_size)(normalise)
+        self._score = lru_cache(maxsize=cache_size)(self._score_uncached)
+
+    def score(self, query: str, choice: str) -> int:
+        """
+        A score between 0 and MAX_SCORE of how similar the two memos are
+        """
+        return self._score(query, choice)
+
+    def scores(self, query: str, choices: Sequence[str]) -> List[int]:
+        """
+        Scores a whole group of choices against the query in one call
+        """
+        distinct = {choice: self._score(query, choice) for choice in set(choices)}
+        return [distinct[choice] for choice in choices]
+
+    def best_match(self, query: str, choices: Sequence[str]) -> int:
+        """
+        Returns the index of the choice most similar to the query, preferring the first
+        of equally good choices
+        """
+        if len(set(choices)) == 1:
+            return 0
+        best_index, best_score = 0, -1
+        for i, choice in enumerate(choices):
+            score = self._score(query, choice)
+            if score > best_score:
+                best_index, best_score = i, score
+                if score == MAX_SCORE:
+                    break
+        return best_index
+
+    def _score_uncached(self, query: str, choice: str) -> int:
+        a = self._normalise(query)
+        b = self._normalise(choice)
+        if a.text and a.text == b.text:
+            return MAX_SCORE
+        return self._scorer(a, b)
@@ -0,0 +1,74 @@
+"""
+Helpers shared by the readers of downloaded bank statements
+"""
+import sys
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable
+
+from ynab.api import TransactionStore
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def parse_milliunits(
+    string: str, thousands_separator: str = ",", decimal_separator: str = "."
+) -> int:
+    """
+    Parse an amount like -1,234.56 into milliunits, here -1234560, without going via a
+    float. Amounts with more than three decimal places are rounded half up on the
+    fourth, e.g. 0.0015 becomes 2.
+    """
+    string = string.strip()
+    if thousands_separator:
+        string = string.replace(thousands_separator, "")
+    whole, point, fraction = string.rpartition(decimal_separator)
+    if not point:
+        whole, fraction = fraction, ""
+    negative = whole.startswith("-")
+    whole = whole.lstrip("+-")
+    milliunits = int(whole or "0") * 1000 + int(fraction[:3].ljust(3, "0"))
+    if fraction[3:4] >= "5":
+        milliunits += 1
+    return -milliunits if negative else milliunits
+
+
+@lru_cache(maxsize=1024)
+def parse_date(string: str, date_format: str) -> date:
+    """
+    Parse a date in the given format. A statement only spans a few dozen distinct days,
+    so the same few strings are parsed over and over.
+    """
+    return datetime.strptime(string, date_format).date()
+
+
+def add_in_batches(
+    transaction_store: TransactionStore,
+    rows: Iterable[tuple],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    with_import_ids: bool = False,
+    log=sys.stderr,
+):
+    """
+    Adds (date, payee name, memo, milliunit amount) rows to the supplied store, in
+    batches of batch_size. Rows with a date in the future are skipped, rather than
+    rejecting their whole batch, and reported to log. With with_import_ids, each row has
+    its import id as a fifth item.
+    """
+    today = date.today()
+    batch = []
+    import_ids = [] if with_import_ids else None
+    for row in rows:
+        if row[0] > today:
+            log.write(f"Skipping because it is in the future: \n{row}\n")
+            continue
+        if with_import_ids:
+            batch.append(row[:4])
+            import_ids.append(row[4])
+        else:
+            batch.append(row)
+        if len(batch) == batch_size:
+            transaction_store.extend(batch, import_ids)
+            batch = []
+            import_ids = [] if with_import_ids else None
+    transaction_store.extend(batch, import_ids)
@@ -1,56 +1,214 @@
-from collections import namedtuple
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
 from textwrap import shorten
-from typing import Iterable
+from typing import Iterable, List, Sequence, Tuple
 
-import fuzzywuzzy.process
+from ynab.assignment import min_cost_assignment
+from ynab.similarity import MAX_SCORE, MemoSimilarity
 
 Transaction = namedtuple(
     "Transaction", ["date", "payee_name", "memo", "milliunit_amount", "import_id"]
 )
 
 
-class CompareTransactions:
-    def __init__(self, transaction):
-        self.transaction = transaction
-
-    def __eq__(self, other):
-        milliunit_difference = abs(
-            self.transaction.milliunit_amount - other.transaction.milliunit_amount
-        )
-        days_difference = abs(self.transaction.date - other.transaction.date).days
-        return (
-            milliunit_difference < 2  # ignore very minor differences in milliunits
-            and days_difference <= MAX_COMPARE_DAYS
-        )
+class _AmountIndex:
+    """
+    Transactions bucketed by milliunit amount and sorted by date within each bucket, so
+    that the transactions matching a given one can be found by bisection rather than by
+    scanning every transaction
+    """
+
+    def __init__(self, transactions: Sequence[Transaction]):
+        self._buckets = defaultdict(lambda: ([], []))  # amount -> (ordinals, positions)
+        by_date = sorted(range(len(transactions)), key=lambda i: transactions[i].date)
+        for position in by_date:
+            transaction = transactions[position]
+            ordinals, positions = self._buckets[transaction.milliunit_amount]
+            ordinals.append(transaction.date.toordinal())
+            positions.append(position)
+
+    def candidates(self, transaction: Transaction) -> List[Tuple[int, int]]:
+        """
+        Finds all indexed transactions within one milliunit and MAX_COMPARE_DAYS days of
+        the given transaction, as (position, amount) pairs ordered by position
+        """
+        ordinal = transaction.date.toordinal()
+        found = []
+        for amount in _amounts_within_tolerance(transaction.milliunit_amount):
+            bucket = self._buckets.get(amount)
+            if bucket is None:
+                continue
+            ordinals, positions = bucket
+            lo = bisect_left(ordinals, ordinal - MAX_COMPARE_DAYS)
+            hi = bisect_right(ordinals, ordinal + MAX_COMPARE_DAYS)
+            found.extend((position, amount) for position in positions[lo:hi])
+        found.sort()
+        return found
+
+    def remove(self, position: int, amount: int):
+        ordinals, positions = self._buckets[amount]
+        i = positions.index(position)
+        del ordinals[i]
+        del positions[i]
+
+
+def _amounts_within_tolerance(milliunit_amount: int):
+    # ignore very minor differences in milliunits
+    return milliunit_amount - 1, milliunit_amount, milliunit_amount + 1
+
+
+def _matches(a: Transaction, b: Transaction) -> bool:
+    return (
+        abs(a.milliunit_amount - b.milliunit_amount) < 2
+        and abs(a.date.toordinal() - b.date.toordinal()) <= MAX_COMPARE_DAYS
+    )
 
 
 def transactions_difference(
-    transactions_a: Iterable[Transaction], transactions_b: Iterable[Transaction]
+    transactions_a: Iterable[Transaction],
+    transactions_b: Iterable[Transaction],
+    memo_similarity: MemoSimilarity = None,
+    optimal: bool = False,
 ):
-    def subtract(transactions_c, transactions_d):
-        remaining = transactions_c.copy()
-        for transaction in transactions_d:
-            comparable = CompareTransactions(transaction)
-            comparables = [CompareTransactions(t) for t in remaining]
-            if comparable in comparables:
-                candidates = [c for c in comparables if c == comparable]
-                best_matching_memo, _ = fuzzywuzzy.process.extractOne(
-                    query=transaction.memo,
-                    choices=[c.transaction.memo for c in candidates],
-                )
-                best_match = next(
-                    c for c in candidates if c.transaction.memo == best_matching_memo
-                )
-                remaining.remove(best_match.transaction)
-
-        return remaining
+    """
+    Pairs up transactions in the two collections with the same amount (to within a
+    milliunit) and dates no more than MAX_COMPARE_DAYS apart, and returns the
+    transactions that could not be paired as a tuple (only in a, only in b).
+
+    By default each transaction is greedily paired, in order, with the candidate with the
+    most similar memo. With optimal=True the pairing is instead the one that pairs up the
+    most transactions and, of those, minimises the total date and memo distance.
+    """
+    memo_similarity = memo_similarity or MemoSimilarity()
+    transactions_a = list(transactions_a)
+    transactions_b = list(transactions_b)
+    if optimal:
+        return _optimal_difference(transactions_a, transactions_b, memo_similarity)
+    return (
+        _greedy_subtract(transactions_a, transactions_b, memo_similarity),
+        _greedy_subtract(transactions_b, transactions_a, memo_similarity),
+    )
+
+
+def _greedy_subtract(transactions_c, transactions_d, memo_similarity):
+    index = _AmountIndex(transactions_c)
+    removed = set()
+    for transaction in transactions_d:
+        candidates = index.candidates(transaction)
+        if candidates:
+            memos = [transactions_c[position].memo for position, _ in candidates]
+            best = memo_similarity.best_match(transaction.memo, memos)
+            position, amount = candidates[best]
+            index.remove(position, amount)
+            removed.add(position)
+
+    return [t for i, t in enumerate(transactions_c) if i not in removed]
+
+
+def _optimal_difference(transactions_a, transactions_b, memo_similarity):
+    """
+    Solves an assignment problem for each group of transactions that could possibly be
+    paired with each other, and returns the transactions left unpaired. Groups of more
+    than MAX_GROUP_SIZE transactions, such as a daily payment of the same amount, are
+    solved a window of MAX_GROUP_SIZE at a time in date order, carrying the unpaired
+    transactions that could still be paired into the next window (keeping it bounded).
+    """
+    matched = (set(), set())
+    for entries in _matching_groups(transactions_a, transactions_b):
+        carried = []
+        for start in range(0, len(entries), MAX_GROUP_SIZE):
+            window = carried + entries[start : start + MAX_GROUP_SIZE]
+            positions = ([], [])
+            for _, side, position in window:
+                positions[side].append(position)
+            group_a = [transactions_a[i] for i in positions[0]]
+            group_b = [transactions_b[j] for j in positions[1]]
+            for i, j in _optimal_pairs(group_a, group_b, memo_similarity):
+                matched[0].add(positions[0][i])
+                matched[1].add(positions[1][j])
+
+            end = start + MAX_GROUP_SIZE
+            if end < len(entries):
+                horizon = entries[end][0] - MAX_COMPARE_DAYS
+                carried = [
+                    (ordinal, side, position)
+                    for ordinal, side, position in window
+                    if ordinal >= horizon and position not in matched[side]
+                ][-MAX_GROUP_SIZE:]
 
     return (
-        subtract(transactions_a, transactions_b),
-        subtract(transactions_b, transactions_a),
+        [t for i, t in enumerate(transactions_a) if i not in matched[0]],
+        [t for j, t in enumerate(transactions_b) if j not in matched[1]],
     )
 
 
+def _matching_groups(transactions_a, transactions_b):
+    """
+    Splits the transactions into groups such that transactions in different groups can
+    never be paired: first by chains of amounts each within a milliunit of the next,
+    then at gaps of more than MAX_COMPARE_DAYS between dates.
+
+    :return: an iterable of groups, each a list of (date ordinal, side, position)
+        tuples in date order, where side is 0 for a and 1 for b
+    """
+    by_amount = defaultdict(list)
+    for side, transactions in enumerate([transactions_a, transactions_b]):
+        for position, t in enumerate(transactions):
+            by_amount[t.milliunit_amount].append((t.date.toordinal(), side, position))
+
+    chain = []
+    previous_amount = None
+    for amount in sorted(by_amount):
+        if chain and amount - previous_amount > 1:
+            yield from _split_at_date_gaps(chain)
+            chain = []
+        chain.extend(by_amount[amount])
+        previous_amount = amount
+    if chain:
+        yield from _split_at_date_gaps(chain)
+
+
+def _split_at_date_gaps(entries):
+    group = []
+    sides = set()
+    previous_ordinal = None
+    for entry in sorted(entries):
+        ordinal, side, _ = entry
+        if previous_ordinal and ordinal - previous_ordinal > MAX_COMPARE_DAYS:
+            if len(sides) == 2:
+                yield group
+            group = []
+            sides = set()
+        group.append(entry)
+        sides.add(side)
+        previous_ordinal = ordinal
+    if len(sides) == 2:
+        yield group
+
+
+def _optimal_pairs(group_a, group_b, memo_similarity):
+    """
+    Pairs transactions from the two groups to maximise the number of pairs and then to
+    minimise the sum of each pair's date distance (in units of MAX_COMPARE_DAYS) and
+    memo distance (in units of MAX_SCORE), both of which are therefore between 0 and 1
+    """
+    max_pair_cost = 2.0
+    unpairable = max_pair_cost * (min(len(group_a), len(group_b)) + 1)
+
+    def cost(a, b, memo_score):
+        if not _matches(a, b):
+            return unpairable
+        days = abs(a.date.toordinal() - b.date.toordinal())
+        return days / MAX_COMPARE_DAYS + (MAX_SCORE - memo_score) / MAX_SCORE
+
+    costs = []
+    for a in group_a:
+        scores = memo_similarity.scores(a.memo, [b.memo for b in group_b])
+        costs.append([cost(a, b, score) for b, score in zip(group_b, scores)])
+    pairs = min_cost_assignment(costs)
+    return [(i, j) for i, j in pairs if costs[i][j] < unpairable]
+
+
 def pretty_format_transactions(transactions: Iterable[Transaction]):
     def truncate(width, obj, right=False):
         stringified = str(obj or "")
@@ -85,3 +243,4 @@ def pretty_format_transactions(transactions: Iterable[Transaction]):
 
 
 MAX_COMPARE_DAYS = 7
+MAX_GROUP_SIZE = 200  # transactions paired at once by the optimal assignment